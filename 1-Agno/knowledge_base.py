@@ -1,46 +1,60 @@
 import os
-import faiss
-from sentence_transformers import SentenceTransformer
+import sys
+from functools import lru_cache
 from dotenv import load_dotenv
-from agno.agent import Agent
-from agno.models.openai import OpenAIChat
-from pypdf import PdfReader
 import numpy as np
 
+# 📦 Modules partagés du dépôt (common/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.llm_gateway import get_gateway
+
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-pdf = PdfReader("1-Agno/PDF/pwc-ai-analysis.pdf")
-chunks = [page.extract_text() for page in pdf.pages if page.extract_text()]
+PDF_PATH = "1-Agno/PDF/pwc-ai-analysis.pdf"
+USE_VECTORSTORE = True
+
+# ⏳ PDF, modèle d'embedding et index chargés au premier usage (une seule fois par processus)
+@lru_cache(maxsize=1)
+def get_index():
+    """Retourne (embedder, index FAISS, chunks, texte complet) du PDF"""
+    import faiss
+    from pypdf import PdfReader
+    from sentence_transformers import SentenceTransformer
 
-all_chunks = []
-for page in chunks:
-    for paragraph in page.split('\n'):
-        clean = paragraph.strip()
-        if len(clean) > 50:
-            all_chunks.append(clean)
+    pdf = PdfReader(PDF_PATH)
+    pages = [page.extract_text() or "" for page in pdf.pages]
 
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-embeddings = embedder.encode(all_chunks, convert_to_numpy=True)
+    all_chunks = []
+    for page in pages:
+        for paragraph in page.split('\n'):
+            clean = paragraph.strip()
+            if len(clean) > 50:
+                all_chunks.append(clean)
 
-dimension = embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(embeddings)
+    embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    embeddings = embedder.encode(all_chunks, convert_to_numpy=True)
+
+    dimension = embeddings.shape[1]
+    index = faiss.IndexFlatL2(dimension)
+    index.add(embeddings)
+    return embedder, index, all_chunks, "".join(pages)
 
 # CORRECTION : Gestion des paramètres None
 def retrieve_from_vectorstore(agent, query, num_documents=3, **kwargs):
     if not query or len(query.strip()) == 0:
         return []
-    
+
     # CORRECTION : Assurer que num_documents n'est jamais None
     if num_documents is None:
         num_documents = 3
-    
+
+    embedder, index, all_chunks, _ = get_index()
     num_docs = min(num_documents, len(all_chunks))
-    
+
     query_vec = embedder.encode([query])
     D, I = index.search(np.array(query_vec), num_docs)
-    
+
     results = []
     for idx in I[0]:
         if 0 <= idx < len(all_chunks):
@@ -50,28 +64,35 @@ def retrieve_from_vectorstore(agent, query, num_documents=3, **kwargs):
             })
     return results
 
-full_text = "".join(page.extract_text() or "" for page in pdf.pages)
 def always_return_full_pdf(agent, query, num_documents=None, **kwargs):
+    full_text = get_index()[3]
     return [{"content": full_text, "meta_data": {"source": "PDF/pwc-ai-analysis.pdf"}}]
 
-USE_VECTORSTORE = True
+@lru_cache(maxsize=1)
+def get_agent():
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+    return Agent(
+        model=OpenAIChat(api_key=OPENAI_API_KEY, id="gpt-4o-mini"),
+        knowledge=None,
+        search_knowledge=True,
+        retriever=retrieve_from_vectorstore if USE_VECTORSTORE else always_return_full_pdf
+    )
+
+def main():
+    agent = get_agent()
+    print(f"Agent RAG prêt! {len(get_index()[2])} chunks chargés.")
+
+    while True:
+        prompt = input("\nQuestion: ").strip()
+        if prompt.lower() in ['quit', 'q', 'exit']:
+            break
+        if prompt:
+            try:
+                print(get_gateway().run_agent(agent, prompt))
+            except Exception as e:
+                print(f"Erreur: {e}")
+                print("Essayez une autre question.")
 
-agent = Agent(
-    model=OpenAIChat(api_key=OPENAI_API_KEY, id="gpt-4o-mini"),
-    knowledge=None,
-    search_knowledge=True,
-    retriever=retrieve_from_vectorstore if USE_VECTORSTORE else always_return_full_pdf
-)
-
-print(f"Agent RAG prêt! {len(all_chunks)} chunks chargés.")
-
-while True:
-    prompt = input("\nQuestion: ").strip()
-    if prompt.lower() in ['quit', 'q', 'exit']:
-        break
-    if prompt:
-        try:
-            agent.print_response(prompt)
-        except Exception as e:
-            print(f"Erreur: {e}")
-            print("Essayez une autre question.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
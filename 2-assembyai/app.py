@@ -7,8 +7,12 @@ from speech_to_text import AudioAgent
 # Load environment variables
 load_dotenv()
 
-# Initialize agent
-agent = AudioAgent()
+# Initialize agent once per process, shared across reruns and sessions
+@st.cache_resource
+def get_agent():
+    return AudioAgent()
+
+agent = get_agent()
 
 # Streamlit UI
 st.title("🎤 Speech to Text + GPT Summary/Explanation")
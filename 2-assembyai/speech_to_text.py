@@ -1,9 +1,15 @@
 import assemblyai as aai
 import os
+import sys
 from openai import OpenAI
 from fpdf import FPDF
 from dotenv import load_dotenv
 
+# 📦 Modules partagés du dépôt (common/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.llm_gateway import get_gateway
+from common.tracing import span
+
 class AudioAgent:
     def __init__(self):
         """Initialise l'agent avec les clés API"""
@@ -15,21 +21,21 @@ class AudioAgent:
     def transcribe_audio(self, audio_file_path):
         """Transcrit un fichier audio avec AssemblyAI"""
         config = aai.TranscriptionConfig(speech_model=aai.SpeechModel.best)
-        transcript = aai.Transcriber(config=config).transcribe(audio_file_path)
+        audio_bytes = os.path.getsize(audio_file_path) if os.path.isfile(audio_file_path) else None  # fichier local ou URL
+        with span("transcription", audio_bytes=audio_bytes) as trace:
+            transcript = aai.Transcriber(config=config).transcribe(audio_file_path)
+            trace.set(text_chars=len(transcript.text or ""))
         return transcript
     
     def process_with_gpt(self, transcript_text, choice):
         """Traite le texte avec GPT selon le choix (résumé ou explication)"""
         prompt = f"Summarize the following transcript:\n{transcript_text}" if choice == "🔍 Summarize" else f"Explain in detail the following transcript:\n{transcript_text}"
         
-        response = self.client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are an expert transcription assistant."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content.strip()
+        messages = [
+            {"role": "system", "content": "You are an expert transcription assistant."},
+            {"role": "user", "content": prompt}
+        ]
+        return get_gateway().chat_openai(self.client, "gpt-4o", messages).strip()
     
     def create_transcript_pdf(self, transcript_text):
         """Crée un PDF de la transcription"""
@@ -2,10 +2,15 @@ import asyncio
 import json
 import logging
 import os
+import sys
 from datetime import datetime, timedelta, timezone
 from neo4j import AsyncGraphDatabase
 from dotenv import load_dotenv
 
+# Shared repo modules (common/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.tracing import span
+
 # ============================
 # Real-World Use Case: Personal Fitness Tracker with Neo4j
 # ============================
@@ -66,17 +71,18 @@ class FitnessTracker:
     async def add_activity(self, activity_data):
         """Add a fitness activity to Neo4j"""
         try:
-            async with self.driver.session() as session:
-                query = """
-                MERGE (a:Activity {activity_id: $activity_id})
-                SET a.user = $user,
-                    a.activity_type = $activity_type,
-                    a.distance_km = $distance_km,
-                    a.duration_min = $duration_min,
-                    a.timestamp = $timestamp,
-                    a.created_at = datetime()
-                """
-                await session.run(query, activity_data)
+            with span("neo4j.write", query="add_activity"):
+                async with self.driver.session() as session:
+                    query = """
+                    MERGE (a:Activity {activity_id: $activity_id})
+                    SET a.user = $user,
+                        a.activity_type = $activity_type,
+                        a.distance_km = $distance_km,
+                        a.duration_min = $duration_min,
+                        a.timestamp = $timestamp,
+                        a.created_at = datetime()
+                    """
+                    await session.run(query, activity_data)
             
             logger.info(f"✅ Added activity: {activity_data['activity_type']} - {activity_data['distance_km']}km")
         except Exception as e:
@@ -88,26 +94,28 @@ class FitnessTracker:
         try:
             since_time = iso_timestamp_days_ago(days)
             
-            async with self.driver.session() as session:
-                query = """
-                MATCH (a:Activity)
-                WHERE a.user = $user AND a.timestamp >= $since_time
-                RETURN a.user as user, a.activity_type as activity_type,
-                       a.distance_km as distance_km, a.duration_min as duration_min,
-                       a.timestamp as timestamp
-                ORDER BY a.timestamp DESC
-                """
-                result = await session.run(query, {"user": user, "since_time": since_time})
-                activities = []
-                async for record in result:
-                    activities.append({
-                        "user": record["user"],
-                        "activity_type": record["activity_type"],
-                        "distance_km": record["distance_km"],
-                        "duration_min": record["duration_min"],
-                        "timestamp": record["timestamp"]
-                    })
-                return activities
+            with span("neo4j.query", query="recent_activities") as trace:
+                async with self.driver.session() as session:
+                    query = """
+                    MATCH (a:Activity)
+                    WHERE a.user = $user AND a.timestamp >= $since_time
+                    RETURN a.user as user, a.activity_type as activity_type,
+                           a.distance_km as distance_km, a.duration_min as duration_min,
+                           a.timestamp as timestamp
+                    ORDER BY a.timestamp DESC
+                    """
+                    result = await session.run(query, {"user": user, "since_time": since_time})
+                    activities = []
+                    async for record in result:
+                        activities.append({
+                            "user": record["user"],
+                            "activity_type": record["activity_type"],
+                            "distance_km": record["distance_km"],
+                            "duration_min": record["duration_min"],
+                            "timestamp": record["timestamp"]
+                        })
+                    trace.set(rows=len(activities))
+                    return activities
         except Exception as e:
             logger.error(f"❌ Query failed: {e}")
             return []
@@ -117,31 +125,33 @@ class FitnessTracker:
         try:
             since_time = iso_timestamp_days_ago(days)
             
-            async with self.driver.session() as session:
-                query = """
-                MATCH (a:Activity)
-                WHERE a.user = $user AND a.activity_type = 'running'
-                      AND a.distance_km >= $min_distance AND a.timestamp >= $since_time
-                RETURN a.user as user, a.activity_type as activity_type,
-                       a.distance_km as distance_km, a.duration_min as duration_min,
-                       a.timestamp as timestamp
-                ORDER BY a.timestamp DESC
-                """
-                result = await session.run(query, {
-                    "user": user,
-                    "min_distance": min_distance,
-                    "since_time": since_time
-                })
-                activities = []
-                async for record in result:
-                    activities.append({
-                        "user": record["user"],
-                        "activity_type": record["activity_type"],
-                        "distance_km": record["distance_km"],
-                        "duration_min": record["duration_min"],
-                        "timestamp": record["timestamp"]
+            with span("neo4j.query", query="running_over_distance") as trace:
+                async with self.driver.session() as session:
+                    query = """
+                    MATCH (a:Activity)
+                    WHERE a.user = $user AND a.activity_type = 'running'
+                          AND a.distance_km >= $min_distance AND a.timestamp >= $since_time
+                    RETURN a.user as user, a.activity_type as activity_type,
+                           a.distance_km as distance_km, a.duration_min as duration_min,
+                           a.timestamp as timestamp
+                    ORDER BY a.timestamp DESC
+                    """
+                    result = await session.run(query, {
+                        "user": user,
+                        "min_distance": min_distance,
+                        "since_time": since_time
                     })
-                return activities
+                    activities = []
+                    async for record in result:
+                        activities.append({
+                            "user": record["user"],
+                            "activity_type": record["activity_type"],
+                            "distance_km": record["distance_km"],
+                            "duration_min": record["duration_min"],
+                            "timestamp": record["timestamp"]
+                        })
+                    trace.set(rows=len(activities))
+                    return activities
         except Exception as e:
             logger.error(f"❌ Query failed: {e}")
             return []
@@ -151,30 +161,32 @@ class FitnessTracker:
         try:
             since_time = iso_timestamp_days_ago(days)
             
-            async with self.driver.session() as session:
-                query = """
-                MATCH (a:Activity)
-                WHERE a.user = $user AND a.activity_type = $activity_type AND a.timestamp >= $since_time
-                RETURN a.user as user, a.activity_type as activity_type,
-                       a.distance_km as distance_km, a.duration_min as duration_min,
-                       a.timestamp as timestamp
-                ORDER BY a.timestamp DESC
-                """
-                result = await session.run(query, {
-                    "user": user,
-                    "activity_type": activity_type,
-                    "since_time": since_time
-                })
-                activities = []
-                async for record in result:
-                    activities.append({
-                        "user": record["user"],
-                        "activity_type": record["activity_type"],
-                        "distance_km": record["distance_km"],
-                        "duration_min": record["duration_min"],
-                        "timestamp": record["timestamp"]
+            with span("neo4j.query", query="by_activity_type") as trace:
+                async with self.driver.session() as session:
+                    query = """
+                    MATCH (a:Activity)
+                    WHERE a.user = $user AND a.activity_type = $activity_type AND a.timestamp >= $since_time
+                    RETURN a.user as user, a.activity_type as activity_type,
+                           a.distance_km as distance_km, a.duration_min as duration_min,
+                           a.timestamp as timestamp
+                    ORDER BY a.timestamp DESC
+                    """
+                    result = await session.run(query, {
+                        "user": user,
+                        "activity_type": activity_type,
+                        "since_time": since_time
                     })
-                return activities
+                    activities = []
+                    async for record in result:
+                        activities.append({
+                            "user": record["user"],
+                            "activity_type": record["activity_type"],
+                            "distance_km": record["distance_km"],
+                            "duration_min": record["duration_min"],
+                            "timestamp": record["timestamp"]
+                        })
+                    trace.set(rows=len(activities))
+                    return activities
         except Exception as e:
             logger.error(f"❌ Query failed: {e}")
             return []
@@ -1,5 +1,6 @@
 import streamlit as st
-from pdf_analyzer import extract_pdf_content, analyze_question
+from pdf_analyzer import extract_pdf_content, analyze_question, analyze_questions
+from common.tracing import streamlit_debug_panel
 
 # 🖥️ Interface utilisateur
 st.set_page_config(page_title="Analyse PDF IA", layout="wide")
@@ -11,17 +12,26 @@ pdf_url = st.text_input("🔗 URL du PDF :", value="https://www.pwc.com/gx/en/is
 
 # ⚡ Traitement
 if pdf_url:
-    with st.spinner("⏳ Extraction du contenu en cours..."):
-        extracted_text, error = extract_pdf_content(pdf_url)
+    # Extraction gardée en session pour cette URL : les reruns (question, mode...) ne relancent pas Firecrawl
+    error = None
+    if st.session_state.get("pdf_extrait", (None, None))[0] != pdf_url:
+        with st.spinner("⏳ Extraction du contenu en cours..."):
+            extracted_text, error = extract_pdf_content(pdf_url)
+        if not error:
+            st.session_state.pdf_extrait = (pdf_url, extracted_text)
+    
+    if error:
+        st.error(f"❌ {error}")
+    else:
+        extracted_text = st.session_state.pdf_extrait[1]
+        # ✅ Affichage
+        st.success("✅ Contenu extrait avec succès.")
+        with st.expander("📋 Voir le contenu extrait (nettoyé)", expanded=True):
+            st.text_area("Contenu PDF", extracted_text, height=500)
         
-        if error:
-            st.error(f"❌ {error}")
-        else:
-            # ✅ Affichage
-            st.success("✅ Contenu extrait avec succès.")
-            with st.expander("📋 Voir le contenu extrait (nettoyé)", expanded=True):
-                st.text_area("Contenu PDF", extracted_text, height=500)
-            
+        mode = st.radio("Mode :", ["❓ Question unique", "📦 Lot de questions"], horizontal=True)
+        
+        if mode == "❓ Question unique":
             st.subheader("❓ Posez une question au sujet du PDF")
             question = st.text_input("Votre question :", placeholder="Ex: Quel est l'impact économique de l'IA ?")
             
@@ -33,4 +43,33 @@ if pdf_url:
                         st.error(f"❌ {error}")
                     else:
                         st.markdown("### 💬 Réponse de l'IA")
-                        st.markdown(answer)
\ No newline at end of file
+                        st.markdown(answer)
+        else:
+            st.subheader("📦 Posez plusieurs questions au sujet du PDF")
+            questions_text = st.text_area("Une question par ligne :", height=200)
+            max_concurrency = st.slider("Requêtes simultanées :", min_value=1, max_value=10, value=4)
+            questions = [q.strip() for q in questions_text.splitlines() if q.strip()]
+            
+            if questions and st.button(f"🚀 Analyser {len(questions)} questions"):
+                progress = st.progress(0.0, text="🤔 Analyse des questions en cours...")
+                done = []
+                
+                def on_result(result):
+                    done.append(result)
+                    progress.progress(len(done) / len(questions), text=f"🤔 {len(done)}/{len(questions)} questions traitées")
+                
+                batch = analyze_questions(questions, extracted_text, max_concurrency=max_concurrency, on_result=on_result)
+                progress.empty()
+                
+                st.success(f"✅ {len(batch.answered)} réponses, {len(batch.failed)} erreurs en {batch.duration:.1f} s")
+                for i, result in enumerate(batch.results, 1):
+                    with st.expander(f"{'✅' if result.ok else '❌'} Q{i} - {result.question}", expanded=not result.ok):
+                        if result.ok:
+                            st.markdown(result.answer)
+                        else:
+                            st.error(f"❌ {result.error}")
+                        st.caption(f"{result.attempts} tentative(s) - {result.duration:.1f} s")
+
+# 🐞 Détail des étapes (durées, tailles, tokens, cache) des dernières requêtes
+if st.sidebar.checkbox("🐞 Afficher les traces de debug"):
+    streamlit_debug_panel()
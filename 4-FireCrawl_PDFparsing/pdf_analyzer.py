@@ -1,77 +1,119 @@
 import re
 import os
-from firecrawl import FirecrawlApp
-from agno.agent import Agent
-from agno.models.openai import OpenAIChat
+import sys
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from textwrap import dedent
 from dotenv import load_dotenv
 
+# 📦 Modules partagés du dépôt (common/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.llm_gateway import RateLimiter, get_gateway, is_rate_limit_error
+from common.tracing import bind, span
+
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 FIRECRAWL_API_KEY = os.getenv("FIRECRAWL_API_KEY")
 
-# 🔑 Initialisation de Firecrawl
-firecrawl = FirecrawlApp(api_key=FIRECRAWL_API_KEY)
+# 🔑 Client Firecrawl et agent créés au premier usage : l'import du module reste instantané
+_firecrawl = None
+_pdf_agent = None
+
+def get_firecrawl():
+    """Retourne le client Firecrawl partagé (créé au premier appel)"""
+    global _firecrawl
+    if _firecrawl is None:
+        from firecrawl import FirecrawlApp
+        _firecrawl = FirecrawlApp(api_key=FIRECRAWL_API_KEY)
+    return _firecrawl
+
+# 📏 Taille maximale du contenu PDF transmis à l'agent
+DOCUMENT_CHAR_LIMIT = 6000
 
 # 🤖 Définition de l'agent IA
-pdf_agent = Agent(
-    model=OpenAIChat(api_key=OPENAI_API_KEY, id="gpt-4o"),
-    name="PDF Analysis Agent",
-    role="Expert en analyse de documents PDF",
-    instructions=dedent("""
-    Vous êtes un expert en analyse de documents PDF. Votre rôle est :
-    1. Répondre aux questions précises sur le document
-    2. Identifier les thèmes clés et structure logique
-    
-    Règles strictes :
-    - Pour les Q/R : citer les pages/paragraphes pertinents si possible
-    - Toujours vérifier la cohérence interne du document
-    - Maintenir un ton professionnel et neutre
-    
-    Format de réponse :
-    🎯 Réponse concise
-    💡 Contexte : [explication ou justification]
-    📄 Source : [citation ou référence précise]
-    """),
-    markdown=True
-)
+def create_pdf_agent():
+    """Crée une instance de l'agent d'analyse PDF"""
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+    return Agent(
+        # Température 0 et aucun outil : réponses déterministes, mises en cache par la passerelle
+        model=OpenAIChat(api_key=OPENAI_API_KEY, id="gpt-4o", temperature=0),
+        name="PDF Analysis Agent",
+        role="Expert en analyse de documents PDF",
+        instructions=dedent("""
+        Vous êtes un expert en analyse de documents PDF. Votre rôle est :
+        1. Répondre aux questions précises sur le document
+        2. Identifier les thèmes clés et structure logique
+        
+        Règles strictes :
+        - Pour les Q/R : citer les pages/paragraphes pertinents si possible
+        - Toujours vérifier la cohérence interne du document
+        - Maintenir un ton professionnel et neutre
+        
+        Format de réponse :
+        🎯 Réponse concise
+        💡 Contexte : [explication ou justification]
+        📄 Source : [citation ou référence précise]
+        """),
+        markdown=True
+    )
+
+def get_pdf_agent():
+    """Retourne l'agent partagé des questions uniques (créé au premier appel)"""
+    global _pdf_agent
+    if _pdf_agent is None:
+        _pdf_agent = create_pdf_agent()
+    return _pdf_agent
 
 def extract_pdf_content(pdf_url):
+    with span("pdf.extract", url=pdf_url) as trace:
+        content, error = _extract_pdf_content(pdf_url)
+        trace.set(failed=error is not None)
+        return content, error
+
+def _extract_pdf_content(pdf_url):
     try:
-        # 🔍 Extraction via Firecrawl (essai des deux méthodes possibles)
-        try:
-            # Méthode v2 (nouvelle version)
-            result = firecrawl.scrape(url=pdf_url, formats=['markdown'])
-        except AttributeError:
+        with span("pdf.fetch") as fetch:
+            # 🔍 Extraction via Firecrawl (essai des deux méthodes possibles)
             try:
-                # Méthode v1 (ancienne version)
-                result = firecrawl.scrape_url(url=pdf_url)
+                # Méthode v2 (nouvelle version)
+                result = get_firecrawl().scrape(url=pdf_url, formats=['markdown'])
             except AttributeError:
-                raise Exception("Méthode Firecrawl non trouvée. Vérifiez votre version de firecrawl-py")
-        
-        # 🔧 Accès au markdown dans result
-        markdown_text = None
-        
-        # Pour la v2 de l'API
-        if hasattr(result, 'markdown'):
-            markdown_text = result.markdown
-        # Pour la v1 de l'API ou structure différente
-        elif hasattr(result, "data") and isinstance(result.data, list) and len(result.data) > 0:
-            markdown_text = getattr(result.data[0], "markdown", None)
-        # Autre structure possible
-        elif isinstance(result, dict) and 'markdown' in result:
-            markdown_text = result['markdown']
-        
+                try:
+                    # Méthode v1 (ancienne version)
+                    result = get_firecrawl().scrape_url(url=pdf_url)
+                except AttributeError:
+                    raise Exception("Méthode Firecrawl non trouvée. Vérifiez votre version de firecrawl-py")
+
+            # 🔧 Accès au markdown dans result
+            markdown_text = None
+
+            # Pour la v2 de l'API
+            if hasattr(result, 'markdown'):
+                markdown_text = result.markdown
+            # Pour la v1 de l'API ou structure différente
+            elif hasattr(result, "data") and isinstance(result.data, list) and len(result.data) > 0:
+                markdown_text = getattr(result.data[0], "markdown", None)
+            # Autre structure possible
+            elif isinstance(result, dict) and 'markdown' in result:
+                markdown_text = result['markdown']
+            fetch.set(markdown_chars=len(markdown_text or ""))
+
         if not markdown_text:
             return None, "Aucune donnée extraite. Vérifiez que le PDF n'est pas protégé."
-        
+
         # 🧹 Nettoyage markdown
-        cleaned = re.sub(r'!\[.*?\]\(.*?\)', '', markdown_text)  # supprime les images
-        cleaned = re.sub(r'#+.*', '', cleaned, flags=re.MULTILINE)  # supprime les titres
-        cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)  # lignes vides multiples
-        extracted_text = cleaned.strip()
-        
+        with span("pdf.clean", input_chars=len(markdown_text)) as clean:
+            cleaned = re.sub(r'!\[.*?\]\(.*?\)', '', markdown_text)  # supprime les images
+            cleaned = re.sub(r'#+.*', '', cleaned, flags=re.MULTILINE)  # supprime les titres
+            cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)  # lignes vides multiples
+            extracted_text = cleaned.strip()
+            clean.set(output_chars=len(extracted_text))
+
         if not extracted_text:
             return None, "Le contenu extrait est vide après nettoyage."
         
@@ -80,10 +122,96 @@ def extract_pdf_content(pdf_url):
     except Exception as e:
         return None, f"Erreur lors de l'extraction: {e}"
 
+def build_prompt(question, pdf_content):
+    """Construit le prompt envoyé à l'agent pour une question"""
+    # Le document est placé en tête : ce préfixe reste identique d'une question
+    # à l'autre, ce qui permet au fournisseur de réutiliser son cache de prompt.
+    return f"Contenu PDF extrait :\n{pdf_content[:DOCUMENT_CHAR_LIMIT]}\n\nQuestion : {question}"
+
 def analyze_question(question, pdf_content):
-    try:
-        prompt = f"{question}\n\nContenu PDF extrait :\n{pdf_content[:6000]}"
-        answer = pdf_agent.run(prompt)
-        return answer.content, None
-    except Exception as e:
-        return None, f"Erreur lors de l'analyse: {e}"
\ No newline at end of file
+    with span("pdf.question", document_chars=len(pdf_content)):
+        try:
+            prompt = build_prompt(question, pdf_content)
+            answer = get_gateway().run_agent(get_pdf_agent(), prompt, cache=True)
+            return answer, None
+        except Exception as e:
+            return None, f"Erreur lors de l'analyse: {e}"
+
+# 📦 Analyse par lot
+@dataclass
+class QuestionResult:
+    """Résultat de l'analyse d'une question d'un lot"""
+    question: str
+    answer: str = None
+    error: str = None
+    attempts: int = 0
+    duration: float = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+@dataclass
+class BatchResult:
+    """Résultats d'un lot de questions, dans l'ordre de soumission"""
+    results: list = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def answered(self):
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.ok]
+
+def analyze_questions(questions, pdf_content, max_concurrency=4, max_retries=3,
+                      base_delay=2.0, on_result=None):
+    """Répond à une liste de questions en parallèle (parallélisme borné)
+
+    Chaque worker utilise sa propre instance d'agent. Sur une erreur 429, tous
+    les workers marquent une pause avec backoff exponentiel avant de réessayer.
+    `on_result` est appelé avec chaque `QuestionResult` dès qu'il est prêt.
+    """
+    questions = [q.strip() for q in questions if q and q.strip()]
+    batch = BatchResult(results=[QuestionResult(question=q) for q in questions])
+    if not questions:
+        return batch
+
+    limiter = RateLimiter()
+    local = threading.local()
+
+    def worker(result):
+        if not hasattr(local, "agent"):
+            local.agent = create_pdf_agent()
+        prompt = build_prompt(result.question, pdf_content)
+        start = time.perf_counter()
+        with span("pdf.question", document_chars=len(pdf_content)) as trace:
+            for attempt in range(1, max_retries + 2):
+                limiter.acquire()
+                result.attempts = attempt
+                try:
+                    # Réessais gérés ici (pause partagée entre workers) : pas de second niveau dans la passerelle
+                    result.answer = get_gateway().run_agent(local.agent, prompt, cache=True, max_retries=0)
+                    result.error = None
+                    break
+                except Exception as e:
+                    result.error = f"Erreur lors de l'analyse: {e}"
+                    if not is_rate_limit_error(e) or attempt > max_retries:
+                        break
+                    limiter.pause(base_delay * 2 ** (attempt - 1) + random.uniform(0, 1))
+            trace.set(attempts=result.attempts, failed=not result.ok)
+        result.duration = time.perf_counter() - start
+        return result
+
+    start = time.perf_counter()
+    with span("pdf.batch", questions=len(questions), max_concurrency=max_concurrency) as trace, \
+            ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        futures = [executor.submit(bind(worker), result) for result in batch.results]
+        for future in as_completed(futures):
+            result = future.result()
+            if on_result:
+                on_result(result)
+        trace.set(failed=len(batch.failed))
+    batch.duration = time.perf_counter() - start
+    return batch
@@ -0,0 +1,138 @@
+"""
+Écriture groupée dans Airtable : session HTTP partagée, lots de 10, upsert sur `ref`
+"""
+
+import time
+import random
+import threading
+from dataclasses import dataclass, field
+
+import requests
+from requests.adapters import HTTPAdapter
+
+AIRTABLE_API_URL = "https://api.airtable.com/v0"
+AIRTABLE_BATCH_SIZE = 10  # Limite Airtable : 10 enregistrements par requête
+AIRTABLE_FIELDS = ("ref", "price", "location", "description", "summary")
+
+@dataclass
+class UpsertResult:
+    """Bilan d'une écriture groupée"""
+    created: list = field(default_factory=list)
+    updated: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    skipped: int = 0  # annonces sans `ref`, non envoyées (pas de clé de fusion)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+def to_airtable_fields(record):
+    """Convertit une annonce en champs Airtable
+
+    Les champs vides ou absents sont omis : en upsert, un champ envoyé vide
+    effacerait la valeur déjà enregistrée (ex. un résumé d'une exécution précédente).
+    """
+    fields = {name: str(record[name]) for name in AIRTABLE_FIELDS if record.get(name) not in (None, "")}
+    fields["ref"] = str(record.get("ref", "") or "")
+    return fields
+
+class AirtableWriter:
+    """Client Airtable réutilisant une session HTTP avec pool de connexions
+
+    `api_url` permet de viser un serveur local de substitution.
+    """
+
+    def __init__(self, api_key, base_id, table_id, api_url=AIRTABLE_API_URL,
+                 requests_per_second=5, max_retries=5, base_delay=1.0, max_delay=60.0, timeout=30, pool_size=4):
+        self.url = f"{api_url.rstrip('/')}/{base_id}/{table_id}"
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+    def close(self):
+        self.session.close()
+
+    def _throttle(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _retry_delay(self, response, attempt):
+        """Attente avant le prochain essai : Retry-After s'il est annoncé, sinon backoff ; plafonnée à `max_delay`"""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        delay = self.base_delay * 2 ** (attempt - 1) + random.uniform(0, self.base_delay)
+        if retry_after:
+            try:
+                delay = max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        return min(delay, self.max_delay)
+
+    def _send(self, batch):
+        """Envoie un lot (≤ 10) en upsert ; réessaie sur 429 et erreurs 5xx"""
+        payload = {
+            "performUpsert": {"fieldsToMergeOn": ["ref"]},
+            "records": [{"fields": fields} for fields in batch]
+        }
+        for attempt in range(1, self.max_retries + 2):
+            self._throttle()
+            response = None
+            try:
+                response = self.session.patch(self.url, json=payload, timeout=self.timeout)
+            except requests.RequestException:
+                if attempt > self.max_retries:
+                    raise
+            else:
+                retryable = response.status_code == 429 or response.status_code >= 500
+                if not retryable or attempt > self.max_retries:
+                    return response
+            time.sleep(self._retry_delay(response, attempt))
+
+    def upsert(self, records):
+        """Crée ou met à jour les annonces (clé de fusion : `ref`) ; celles sans `ref` sont comptées dans `skipped`"""
+        result = UpsertResult()
+        # Une même ref ne doit apparaître qu'une fois : les versions suivantes complètent ou remplacent les champs
+        unique = {}
+        for record in records:
+            fields = to_airtable_fields(record)
+            if not fields["ref"]:
+                result.skipped += 1
+                continue
+            unique.setdefault(fields["ref"], {}).update(fields)
+        rows = list(unique.values())
+
+        for start in range(0, len(rows), AIRTABLE_BATCH_SIZE):
+            batch = rows[start:start + AIRTABLE_BATCH_SIZE]
+            refs = [fields["ref"] for fields in batch]
+            try:
+                response = self._send(batch)
+            except requests.RequestException as e:
+                result.errors.append({"refs": refs, "error": str(e)})
+                continue
+
+            if response.status_code != 200:
+                result.errors.append({"refs": refs, "status": response.status_code, "error": response.text})
+                continue
+
+            body = response.json()
+            created = set(body.get("createdRecords", []))
+            for item in body.get("records", []):
+                ref = item.get("fields", {}).get("ref")
+                (result.created if item.get("id") in created else result.updated).append(ref)
+        return result
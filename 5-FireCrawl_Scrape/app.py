@@ -4,7 +4,11 @@ Interface Streamlit pour l'application de scraping immobilier
 """
 
 import streamlit as st
-from scraping import scrape_and_parse, get_ai_summary, save_to_airtable
+from scraping import (
+    scrape_and_parse, crawl_listings, enrich_records, save_to_airtable, save_all_to_airtable,
+    get_summary_cache, summary_key, get_snapshot_store, CrawlStatus
+)
+from common.tracing import streamlit_debug_panel
 
 # Interface utilisateur
 st.set_page_config(page_title="Scraping Immobilier IA", layout="wide")
@@ -15,17 +19,53 @@ st.markdown("Ce projet extrait les annonces immobilières et les analyse via un
 if "records" not in st.session_state:
     st.session_state.records = []
 
+# Résumés de la session, indexés par empreinte du contenu (ref + prix + localisation + description)
 if "summaries" not in st.session_state:
     st.session_state.summaries = {}
 
 # URL cible
 url = st.text_input("URL à scraper :", value="https://www.century21.fr/annonces/achat-maison/v-bordeaux/")
 
+if "delta" not in st.session_state:
+    st.session_state.delta = None
+
+# Mode incrémental : seules les annonces nouvelles ou modifiées depuis le dernier crawl sont traitées
+incremental_mode = st.checkbox("🔁 Mode incrémental (ne traiter que les nouveautés)")
+
+# Mode crawl multi-pages
+crawl_mode = st.checkbox("🕸️ Parcourir toutes les pages de résultats")
+if crawl_mode:
+    col1, col2 = st.columns(2)
+    max_pages = col1.number_input("Nombre maximum de pages", min_value=1, max_value=500, value=20)
+    max_workers = col2.number_input("Pages récupérées en parallèle", min_value=1, max_value=10, value=4)
+
 # Scraper & analyser
 if st.button("Lancer l'extraction et l'analyse"):
     with st.spinner("🔄 Récupération des données..."):
         try:
-            st.session_state.records = scrape_and_parse(url)
+            crawl_status = CrawlStatus()
+            if crawl_mode:
+                counter = st.empty()
+                st.session_state.records = []
+                for record in crawl_listings(url, max_pages=int(max_pages), max_workers=int(max_workers),
+                                             status=crawl_status):
+                    st.session_state.records.append(record)
+                    counter.caption(f"🕸️ {len(st.session_state.records)} annonces collectées...")
+                counter.empty()
+            else:
+                # Une seule page : les annonces des autres pages ne sont pas vues, aucun retrait n'est déduit
+                st.session_state.records = scrape_and_parse(url)
+            
+            st.session_state.delta = None
+            if incremental_mode:
+                delta = get_snapshot_store().classify(url, st.session_state.records, complete=crawl_status.complete)
+                st.session_state.delta = delta
+                st.session_state.delta_source = url
+                st.session_state.records = delta.to_process
+                counts = delta.counts()
+                removed = f"{counts['removed']} retirées" if delta.complete else "retraits non calculés (crawl partiel)"
+                st.info(f"🔁 {counts['new']} nouvelles · {counts['changed']} modifiées · "
+                        f"{counts['unchanged']} inchangées · {removed} depuis le dernier crawl")
             
             if st.session_state.records:
                 st.success(f"✅ {len(st.session_state.records)} annonces trouvées !")
@@ -44,26 +84,32 @@ if st.button("Lancer l'extraction et l'analyse"):
 
 # Affichage et IA
 if st.session_state.records:
+    max_concurrency = st.sidebar.slider("Analyses IA simultanées", min_value=1, max_value=10, value=4)
+    placeholders = {}
+    
     for i, record in enumerate(st.session_state.records, 1):
         with st.expander(f"Annonce {i} - {record['ref']}"):
             st.write(f"**Prix :** {record['price']}")
             st.write(f"**Localisation :** {record['location']}")
+            if record.get('surface_m2'):
+                st.write(f"**Surface :** {record['surface_m2']:g} m²")
             st.write(f"**Description :** {record['description']}")
             
-            # Résumé IA avec cache
-            if record['ref'] not in st.session_state.summaries:
-                with st.spinner("🤖 Génération de l'analyse..."):
-                    summary = get_ai_summary(record)
-                    st.session_state.summaries[record['ref']] = summary
-            
+            # Résumé IA avec cache (rempli au fil de l'eau plus bas)
             st.markdown("### 🤖 Résumé IA")
-            st.markdown(st.session_state.summaries[record['ref']])
+            placeholder = st.empty()
+            key = summary_key(record)
+            placeholders.setdefault(key, []).append(placeholder)
+            if key in st.session_state.summaries:
+                placeholder.markdown(st.session_state.summaries[key])
+            else:
+                placeholder.info("⏳ Analyse en attente...")
             
             # Envoi à Airtable
             if st.button(f"📊 Enregistrer annonce {i} dans Airtable", key=f"btn_{i}"):
                 record_with_summary = {
                     **record,
-                    "summary": st.session_state.summaries[record['ref']]
+                    "summary": st.session_state.summaries.get(key, "")
                 }
                 
                 success, message = save_to_airtable(record_with_summary)
@@ -72,4 +118,58 @@ if st.session_state.records:
                     st.success("✅ Enregistré dans Airtable")
                 else:
                     st.error("❌ Échec Airtable")
-                    st.code(message, language="json")
\ No newline at end of file
+                    st.code(message, language="json")
+    
+    # Génération des résumés manquants en parallèle
+    pending = list({
+        summary_key(r): r for r in st.session_state.records if summary_key(r) not in st.session_state.summaries
+    }.values())
+    if pending:
+        summary_cache = get_summary_cache()
+        progress = st.progress(0.0, text="🤖 Génération des analyses...")
+        results = enrich_records(pending, max_concurrency=max_concurrency, cache=summary_cache)
+        for done, (record, summary, error) in enumerate(results, 1):
+            key = summary_key(record)
+            for placeholder in placeholders[key]:
+                if error:
+                    placeholder.error(f"❌ {error}")
+                else:
+                    placeholder.markdown(summary)
+            if not error:
+                st.session_state.summaries[key] = summary
+            progress.progress(done / len(pending), text=f"🤖 {done}/{len(pending)} analyses générées")
+        progress.empty()
+    
+    stats = get_summary_cache().stats()
+    st.sidebar.metric("Cache des résumés (taux de hit)", f"{stats['hit_rate']:.0%}")
+    st.sidebar.caption(f"{stats['hits']} hits · {stats['misses']} misses · {stats['entries']} résumés en cache")
+    
+    # Envoi groupé à Airtable
+    if st.button("💾 Enregistrer toutes les annonces dans Airtable"):
+        with st.spinner("📊 Envoi vers Airtable..."):
+            result = save_all_to_airtable([
+                {**record, "summary": st.session_state.summaries.get(summary_key(record), "")}
+                for record in st.session_state.records
+            ])
+        
+        # En mode incrémental, les annonces sauvegardées entrent dans l'instantané
+        if st.session_state.delta is not None:
+            failed_refs = {ref for error in result.errors for ref in error.get("refs", [])}
+            get_snapshot_store().commit(
+                st.session_state.delta_source,
+                [r for r in st.session_state.records
+                 if r['ref'] and r['ref'] not in failed_refs and summary_key(r) in st.session_state.summaries],
+                removed=st.session_state.delta.removed
+            )
+        
+        if result.ok:
+            st.success(f"✅ {len(result.created)} créées, {len(result.updated)} mises à jour dans Airtable")
+        else:
+            st.error(f"❌ {len(result.errors)} lot(s) en échec ({len(result.created)} créées, {len(result.updated)} mises à jour)")
+            st.json(result.errors)
+        if result.skipped:
+            st.warning(f"⚠️ {result.skipped} annonce(s) sans référence ignorée(s) : impossible de les fusionner dans Airtable")
+
+# 🐞 Détail des étapes (durées, tailles, tokens, cache) des dernières requêtes
+if st.sidebar.checkbox("🐞 Afficher les traces de debug"):
+    streamlit_debug_panel()
@@ -0,0 +1,82 @@
+"""
+Benchmark des parsers d'annonces sur des pages synthétiques volumineuses
+
+Usage : python bench_parsing.py [nombre_d_annonces ...]
+"""
+
+import sys
+import time
+import random
+import contextlib
+import io
+
+from parsing import simple_parse, alternative_parse
+
+QUARTIERS = ["Gambetta", "Pelleport", "Convention", "Vaugirard", "Bastille", "Montmartre"]
+VILLES = ["PARIS {n}E (750{n:02d})", "Paris {n}e (750{n:02d})", "BORDEAUX (33000)",
+          "LYON {n}E (6900{n})", "MERIGNAC (33700)", "Boulogne-Billancourt, porte de paris"]
+
+# Valeurs typées attendues pour quelques lignes de prix et de surface
+TYPED_CASES = [
+    ("450 000 €", "3 pièces - 60 m²", 450000, 60.0),
+    ("1 250 000,50 €", "Studio 18,5 m2", 1250000.5, 18.5),
+    ("Prix sur demande", "Surface NC", None, None),
+]
+
+def html_noise(rng):
+    """Lignes vides ou indentées, comme en produit `BeautifulSoup.get_text()` sur une page réelle"""
+    return [" " * rng.randint(0, 24) for _ in range(rng.randint(4, 12))]
+
+def make_listing(i, rng, ref_marker="Ref :"):
+    """Génère le texte d'une annonce tel qu'extrait d'une page de résultats (parfois sans prix)"""
+    ville = rng.choice(VILLES).format(n=rng.randint(1, 9))
+    lines = [f"{ref_marker} {100000 + i}"] + html_noise(rng)
+    lines += ["Appartement"] + html_noise(rng)
+    lines += [ville] + html_noise(rng)
+    lines += [f"{rng.randint(2, 5)} pièces - {rng.randint(18, 140)},{rng.randint(0, 9)} m²"] + html_noise(rng)
+    lines += [f"{rng.randint(150, 2500) * 1000:,} €".replace(",", " ") if rng.random() < 0.9 else ""]
+    lines += [
+        f"Quartier {rng.choice(QUARTIERS)}, proche métro, {rng.randint(1, 7)}e étage avec ascenseur."
+        for _ in range(rng.randint(3, 8))
+    ]
+    lines += ["Voir le détail du bien"] + html_noise(rng)
+    lines += ["Ajouter aux favoris", "Partager", "Contacter l'agence"] + html_noise(rng)
+    return "\n".join(lines)
+
+def make_page(n_listings, seed=0, ref_marker="Ref :"):
+    rng = random.Random(seed)
+    header = "Century 21\nAchat appartement Paris\nTrier par : pertinence\n"
+    return header + "\n".join(make_listing(i, rng, ref_marker) for i in range(n_listings))
+
+def best_of(func, arg, repeat=5):
+    """Meilleur temps (s) sur `repeat` exécutions ; les prints de debug sont masqués"""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func(arg)
+            timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main(sizes):
+    for price, surface, price_value, surface_m2 in TYPED_CASES:
+        with contextlib.redirect_stdout(io.StringIO()):
+            record, = simple_parse(f"Ref : 1\nParis 11e\n{surface}\n{price}\nVoir le détail du bien")
+        assert (record["price_value"], record["surface_m2"]) == (price_value, surface_m2), record
+
+    print(f"{'annonces':>9} | {'simple_parse':>12} | {'par annonce':>11}")
+    for size in sizes:
+        page = make_page(size)
+        t_simple, records = best_of(simple_parse, page)
+        assert len(records) == size
+        assert all(r["price_value"] is not None for r in records if r["price"])
+        assert all(r["surface_m2"] is not None for r in records)
+        print(f"{size:>9} | {t_simple * 1000:>10.1f}ms | {t_simple / size * 1e6:>9.1f}µs")
+
+    # Repli sur le parsing alternatif (pages sans marqueur "Ref :")
+    page = make_page(sizes[-1], ref_marker="Réf.")
+    t_alt, records = best_of(alternative_parse, page)
+    print(f"\nalternative_parse ({len(records)} annonces 'Réf.') : {t_alt * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 50000])
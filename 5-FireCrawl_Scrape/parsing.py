@@ -0,0 +1,129 @@
+"""
+Fonctions de parsing des pages d'annonces immobilières
+"""
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Fonctions de parsing
+def clean_text_block(text_block):
+    lines = [line.strip() for line in text_block.splitlines()]
+    return "\n".join([line for line in lines if line])
+
+def simple_parse(text):
+    listings = text.split("Ref :")
+    records = []
+
+    for listing in listings[1:]:
+        lines = listing.strip().split('\n')
+        record = {}
+        record['ref'] = lines[0].strip()
+
+        price_line = next((l for l in lines if '€' in l), '')
+        record['price'] = price_line.strip()
+
+        location_line = next((l for l in lines if 'PARIS' in l.upper()), '')
+        record['location'] = location_line.strip()
+
+        try:
+            price_index = lines.index(price_line)
+            detail_index = lines.index(next((l for l in lines if 'Voir le détail du bien' in l)))
+            record['description'] = ' '.join(line.strip() for line in lines[price_index+1:detail_index])
+        except:
+            record['description'] = ''
+
+        # Valeurs typées, pour trier et filtrer sans reparser les chaînes
+        record['price_value'] = parse_price_value(record['price'])
+        record['surface_m2'] = parse_surface(listing)
+
+        records.append(record)
+
+    return records
+
+# Valeurs numériques des annonces
+PRICE_VALUE_RE = re.compile(r'(\d[\d\s.]*)(?:,(\d{1,2}))?\s*€')
+SURFACE_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*$')
+PRICE_SEPARATORS = str.maketrans('', '', ' .\u00a0\u202f')
+
+def parse_price_value(price):
+    """Montant numérique d'une ligne de prix ("450 000 €" → 450000), None si absent"""
+    position = price.find('€')
+    if position == -1:
+        return None
+    match = PRICE_VALUE_RE.search(price, 0, position + 1)
+    if not match:
+        return None
+    digits = match.group(1).translate(PRICE_SEPARATORS)
+    if not digits.isdigit():
+        return None
+    return float(f"{digits}.{match.group(2)}") if match.group(2) else int(digits)
+
+def parse_surface(text):
+    """Surface en m² trouvée dans un texte ("72,5 m²" → 72.5), None si absente"""
+    position = text.find('m²')
+    if position == -1:
+        position = text.find('m2')
+        if position == -1:
+            return None
+    match = SURFACE_RE.search(text, max(0, position - 16), position)
+    return float(match.group(1).replace(',', '.')) if match else None
+
+# Parsing alternatif
+ALTERNATIVE_PATTERNS = ["Réf.", "REF:", "Ref.", "Reference:", "Prix", "€"]
+ALTERNATIVE_PATTERN_RE = re.compile('|'.join(re.escape(pattern) for pattern in ALTERNATIVE_PATTERNS))
+
+def alternative_parse(text):
+    """Méthode alternative de parsing si la première échoue"""
+    logger.debug("Tentative de parsing alternatif...")
+
+    # Rechercher d'autres patterns possibles (une seule lecture du texte pour tous les patterns)
+    found = set(ALTERNATIVE_PATTERN_RE.findall(text))
+
+    for pattern in ALTERNATIVE_PATTERNS:
+        if pattern in found:
+            logger.debug(f"Pattern trouvé: {pattern}")
+            # Essayer de parser avec ce pattern
+            listings = text.split(pattern)
+            if len(listings) > 1:
+                logger.debug(f"{len(listings)-1} segments trouvés avec le pattern {pattern}")
+                # Adapter le parsing selon le pattern
+                return parse_with_pattern(listings, pattern)
+
+    logger.debug("Aucun pattern reconnu trouvé")
+    return []
+
+def parse_with_pattern(listings, pattern):
+    """Parse les annonces selon le pattern détecté"""
+    records = []
+
+    for i, listing in enumerate(listings[1:], 1):  # Skip le premier segment
+        lines = listing.strip().split('\n')[:10]  # Limiter aux 10 premières lignes
+
+        record = {}
+        record['ref'] = f"{pattern}{lines[0].strip()}" if lines else f"Annonce_{i}"
+
+        # Chercher le prix
+        price_line = ""
+        for line in lines:
+            if '€' in line or 'EUR' in line:
+                price_line = line.strip()
+                break
+        record['price'] = price_line
+
+        # Chercher la localisation
+        location_line = ""
+        for line in lines:
+            if any(word in line.upper() for word in ['PARIS', 'ARRONDISSEMENT', '75']):
+                location_line = line.strip()
+                break
+        record['location'] = location_line
+
+        # Description = les premières lignes
+        record['description'] = ' '.join(lines[:5])
+
+        records.append(record)
+
+    logger.debug(f"{len(records)} annonces parsées avec pattern {pattern}")
+    return records
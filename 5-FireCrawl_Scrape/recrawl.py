@@ -0,0 +1,36 @@
+"""
+Recrawl quotidien : ne traite que les annonces nouvelles ou modifiées depuis le dernier passage
+
+Usage : python recrawl.py URL [--max-pages N]
+"""
+
+import argparse
+
+from scraping import incremental_recrawl
+
+def main():
+    parser = argparse.ArgumentParser(description="Recrawl incrémental d'une liste d'annonces")
+    parser.add_argument("url", help="URL de la première page de résultats")
+    parser.add_argument("--max-pages", type=int, default=50)
+    parser.add_argument("--max-workers", type=int, default=4, help="pages récupérées en parallèle")
+    parser.add_argument("--max-concurrency", type=int, default=4, help="analyses IA simultanées")
+    args = parser.parse_args()
+    if args.max_workers < 1 or args.max_concurrency < 1:
+        parser.error("--max-workers et --max-concurrency doivent être ≥ 1")
+
+    delta, result, summary_errors = incremental_recrawl(
+        args.url, max_pages=args.max_pages, max_workers=args.max_workers, max_concurrency=args.max_concurrency
+    )
+
+    counts = delta.counts()
+    # Crawl partiel (page en erreur, max_pages atteint) : les absentes ne sont pas forcément retirées
+    removed = f"🗑️ {counts['removed']} retirées" if delta.complete else "🗑️ retraits non calculés (crawl partiel)"
+    print(f"🆕 {counts['new']} nouvelles · ✏️ {counts['changed']} modifiées · "
+          f"⏸️ {counts['unchanged']} inchangées · {removed}")
+    print(f"📊 Airtable : {len(result.created)} créées, {len(result.updated)} mises à jour, {len(result.errors)} lots en échec"
+          + (f", {result.skipped} sans ref ignorées" if result.skipped else ""))
+    for error in summary_errors:
+        print(f"❌ {error['ref']} : {error['error']}")
+
+if __name__ == "__main__":
+    main()
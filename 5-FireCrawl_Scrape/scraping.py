@@ -1,11 +1,28 @@
 import os
-import requests
+import re
+import sys
+import random
+import threading
+import json
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from urllib.parse import urljoin, urlparse, urlunparse
 from bs4 import BeautifulSoup
-from firecrawl import Firecrawl
-from agno.agent import Agent
-from agno.models.openai import OpenAIChat
 from textwrap import dedent
 from dotenv import load_dotenv
+from airtable import AirtableWriter, AIRTABLE_API_URL
+from summary_cache import SummaryCache, record_fingerprint
+from snapshot import SnapshotStore
+from parsing import simple_parse, alternative_parse
+
+# 📦 Modules partagés du dépôt (common/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.llm_gateway import RateLimiter, get_gateway, is_rate_limit_error
+from common.tracing import bind, span
+
+logger = logging.getLogger(__name__)
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -14,211 +31,387 @@ load_dotenv()
 AIRTABLE_API_KEY = os.getenv("AIRTABLE_API_KEY")
 AIRTABLE_BASE_ID = os.getenv("AIRTABLE_BASE_ID")  
 AIRTABLE_TABLE_ID = os.getenv("AIRTABLE_TABLE_ID")
+AIRTABLE_URL = os.getenv("AIRTABLE_API_URL", AIRTABLE_API_URL)
 FIRECRAWL_API_KEY = os.getenv("FIRECRAWL_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+SUMMARY_CACHE_PATH = os.getenv(
+    "SUMMARY_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "summaries.sqlite")
+)
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "5000"))
+SNAPSHOT_PATH = os.getenv(
+    "SNAPSHOT_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "snapshots.sqlite")
+)
 
-# Configuration FireCrawl  
-firecrawl = Firecrawl(api_key=FIRECRAWL_API_KEY)
+# Client FireCrawl et agent créés au premier usage : l'import du module reste instantané
+_firecrawl = None
+_listing_agent = None
 
-# Agent IA
-listing_agent = Agent(
-    model=OpenAIChat(api_key=OPENAI_API_KEY, id="gpt-4o"),
-    name="Listing Analyzer",
-    role="Expert immobilier ",
-    instructions=dedent("""
-    Vous êtes un expert immobilier.
-    
-    Votre mission pour chaque annonce est :
-    - Générer un résumé clair et concis du bien.
-    - Identifier les atouts principaux (emplacement, prix, surface, transports, etc.).
-    - Identifier les risques potentiels (prix élevé, manque d'information, incohérences, localisation douteuse).
-    
-    ⚠️ Règles strictes :
-    - Si le quartier mentionné dans la description (ex : Gambetta/Pelleport) n'est PAS cohérent avec l'arrondissement dans le champ "location" (ex : 75015), signalez-le explicitement.
-    - Ne jamais faire d'affirmation sur la localisation sans confirmation croisée.
-    - Si une information importante est absente (surface, charges, etc.), mentionnez-le dans les risques.
-    
-    📝 Format de sortie obligatoire en Markdown clair :
-    **Résumé** : ...
-    
-    ✅ **Atouts** :
-    
-    ⚠️ **Risques / Incohérences** :
-    
-    ⚡ Répondez uniquement en markdown bien formaté. Ne sortez jamais de ce format.
-    """),
-    show_tool_calls=False,
-    markdown=True
-)
+def get_firecrawl():
+    """Retourne le client FireCrawl partagé (créé au premier appel)"""
+    global _firecrawl
+    if _firecrawl is None:
+        from firecrawl import Firecrawl
+        _firecrawl = Firecrawl(api_key=FIRECRAWL_API_KEY)
+    return _firecrawl
 
-# Fonctions de parsing
-def clean_text_block(text_block):
-    lines = [line.strip() for line in text_block.splitlines()]
-    return "\n".join([line for line in lines if line])
+# Agent IA
+# ⚠️ Incrémenter à chaque modification des instructions ou du prompt : invalide le cache des résumés
+SUMMARY_PROMPT_VERSION = "1"
 
-def simple_parse(text):
-    listings = text.split("Ref :")
-    records = []
-    
-    for listing in listings[1:]:
-        lines = listing.strip().split('\n')
-        record = {}
-        record['ref'] = lines[0].strip()
+def create_listing_agent():
+    """Crée une instance de l'agent d'analyse d'annonces"""
+    from agno.agent import Agent
+    from agno.models.openai import OpenAIChat
+    return Agent(
+        model=OpenAIChat(api_key=OPENAI_API_KEY, id="gpt-4o"),
+        name="Listing Analyzer",
+        role="Expert immobilier ",
+        instructions=dedent("""
+        Vous êtes un expert immobilier.
         
-        price_line = next((l for l in lines if '€' in l), '')
-        record['price'] = price_line.strip()
+        Votre mission pour chaque annonce est :
+        - Générer un résumé clair et concis du bien.
+        - Identifier les atouts principaux (emplacement, prix, surface, transports, etc.).
+        - Identifier les risques potentiels (prix élevé, manque d'information, incohérences, localisation douteuse).
         
-        location_line = next((l for l in lines if 'PARIS' in l.upper()), '')
-        record['location'] = location_line.strip()
+        ⚠️ Règles strictes :
+        - Si le quartier mentionné dans la description (ex : Gambetta/Pelleport) n'est PAS cohérent avec l'arrondissement dans le champ "location" (ex : 75015), signalez-le explicitement.
+        - Ne jamais faire d'affirmation sur la localisation sans confirmation croisée.
+        - Si une information importante est absente (surface, charges, etc.), mentionnez-le dans les risques.
         
-        try:
-            price_index = lines.index(price_line)
-            detail_index = lines.index(next((l for l in lines if 'Voir le détail du bien' in l)))
-            record['description'] = ' '.join(line.strip() for line in lines[price_index+1:detail_index])
-        except:
-            record['description'] = ''
-            
-        records.append(record)
-    
-    return records
+        📝 Format de sortie obligatoire en Markdown clair :
+        **Résumé** : ...
+        
+        ✅ **Atouts** :
+        
+        ⚠️ **Risques / Incohérences** :
+        
+        ⚡ Répondez uniquement en markdown bien formaté. Ne sortez jamais de ce format.
+        """),
+        show_tool_calls=False,
+        markdown=True
+    )
+
+def get_listing_agent():
+    """Retourne l'agent partagé des résumés unitaires (créé au premier appel)"""
+    global _listing_agent
+    if _listing_agent is None:
+        _listing_agent = create_listing_agent()
+    return _listing_agent
 
 def scrape_and_parse(url):
     """Scrape une URL et retourne les annonces parsées"""
+    records, _ = scrape_page(url)
+    return records
+
+def scrape_page(url):
+    """Scrape une URL et retourne les annonces parsées et les liens de la page"""
+    with span("scrape.page", url=url):
+        return _scrape_page(url)
+
+def _scrape_page(url):
     try:
-        # Debug: voir ce que retourne FireCrawl
-        scrape_result = firecrawl.scrape(url, formats=["html", "markdown"])
-        print(f"Debug - Type du résultat: {type(scrape_result)}")
-        
-        # Essayer d'accéder au contenu HTML
-        if hasattr(scrape_result, 'html'):
-            html_content = scrape_result.html
-        elif hasattr(scrape_result, 'content'):
-            html_content = scrape_result.content
-        elif isinstance(scrape_result, dict) and 'html' in scrape_result:
-            html_content = scrape_result['html']
-        else:
-            print(f"Debug - Structure du résultat: {scrape_result}")
-            # Fallback: essayer le markdown
-            if hasattr(scrape_result, 'markdown'):
-                return parse_markdown(scrape_result.markdown)
-            elif isinstance(scrape_result, dict) and 'markdown' in scrape_result:
-                return parse_markdown(scrape_result['markdown'])
+        with span("scrape.fetch") as fetch:
+            scrape_result = get_firecrawl().scrape(url, formats=["html", "markdown"])
+            logger.debug(f"Type du résultat FireCrawl: {type(scrape_result)}")
+            markdown_content = None
+
+            # Essayer d'accéder au contenu HTML
+            if hasattr(scrape_result, 'html'):
+                html_content = scrape_result.html
+            elif hasattr(scrape_result, 'content'):
+                html_content = scrape_result.content
+            elif isinstance(scrape_result, dict) and 'html' in scrape_result:
+                html_content = scrape_result['html']
             else:
-                raise ValueError("Impossible d'extraire le contenu HTML ou Markdown")
-        
-        # Parser le HTML
-        soup = BeautifulSoup(html_content, "html.parser")
-        plain_text = soup.get_text()
-        
-        # Debug: afficher un échantillon du texte
-        print(f"Debug - Échantillon du texte (200 premiers caractères): {plain_text[:200]}...")
-        
-        # Essayer différentes méthodes de parsing
-        records = simple_parse(plain_text)
-        if not records:
-            # Méthode alternative de parsing
-            records = alternative_parse(plain_text)
-        
-        return records
-        
+                logger.debug(f"Structure du résultat FireCrawl: {scrape_result}")
+                # Fallback: essayer le markdown
+                if hasattr(scrape_result, 'markdown'):
+                    markdown_content = scrape_result.markdown
+                elif isinstance(scrape_result, dict) and 'markdown' in scrape_result:
+                    markdown_content = scrape_result['markdown']
+                else:
+                    raise ValueError("Impossible d'extraire le contenu HTML ou Markdown")
+            if markdown_content is None:
+                fetch.set(format="html", payload_chars=len(html_content or ""))
+            else:
+                fetch.set(format="markdown", payload_chars=len(markdown_content))
+
+        if markdown_content is not None:
+            links = [urljoin(url, href) for href in MARKDOWN_LINK_RE.findall(markdown_content)]
+            return parse_markdown(markdown_content), links
+
+        with span("scrape.parse", format="html") as parse:
+            soup = BeautifulSoup(html_content, "html.parser")
+            plain_text = soup.get_text()
+            links = [urljoin(url, a["href"]) for a in soup.find_all("a", href=True)]
+            logger.debug(f"Échantillon du texte (200 premiers caractères): {plain_text[:200]}...")
+
+            # Essayer différentes méthodes de parsing
+            records = simple_parse(plain_text)
+            if not records:
+                # Méthode alternative de parsing
+                records = alternative_parse(plain_text)
+            parse.set(text_chars=len(plain_text), links=len(links), records=len(records))
+
+        return records, links
+
     except Exception as e:
-        print(f"Erreur dans scrape_and_parse: {e}")
+        logger.error(f"Erreur dans scrape_and_parse: {e}")
         raise
 
-def parse_markdown(markdown_content):
-    """Parse le contenu Markdown pour extraire les annonces"""
-    print(f"Debug - Parsing Markdown (200 premiers caractères): {markdown_content[:200]}...")
-    # Adapter selon le format Markdown retourné
-    return simple_parse(markdown_content)
+# Crawl multi-pages
+MARKDOWN_LINK_RE = re.compile(r'\]\((\S+?)\)')
+PAGINATION_PATH_RE = re.compile(r'/(?:page|p)[-/]?\d+/?$', re.IGNORECASE)
+PAGINATION_PARAMS = ("page", "p", "pg", "pagination")
 
-def alternative_parse(text):
-    """Méthode alternative de parsing si la première échoue"""
-    print("Debug - Tentative de parsing alternatif...")
-    
-    # Rechercher d'autres patterns possibles
-    patterns = ["Réf.", "REF:", "Ref.", "Reference:", "Prix", "€"]
-    
-    for pattern in patterns:
-        if pattern in text:
-            print(f"Debug - Pattern trouvé: {pattern}")
-            # Essayer de parser avec ce pattern
-            listings = text.split(pattern)
-            if len(listings) > 1:
-                print(f"Debug - {len(listings)-1} segments trouvés avec le pattern {pattern}")
-                # Adapter le parsing selon le pattern
-                return parse_with_pattern(listings, pattern)
-    
-    print("Debug - Aucun pattern reconnu trouvé")
-    return []
+def pagination_base(url):
+    """Retire le numéro de page d'une URL (chemin ou paramètre) pour comparer des listes"""
+    parts = urlparse(url)
+    path = PAGINATION_PATH_RE.sub('/', parts.path).rstrip('/')
+    query = '&'.join(
+        param for param in parts.query.split('&')
+        if param and param.split('=', 1)[0].lower() not in PAGINATION_PARAMS
+    )
+    return urlunparse((parts.scheme, parts.netloc.lower(), path, '', query, ''))
 
-def parse_with_pattern(listings, pattern):
-    """Parse les annonces selon le pattern détecté"""
-    records = []
-    
-    for i, listing in enumerate(listings[1:], 1):  # Skip le premier segment
-        lines = listing.strip().split('\n')[:10]  # Limiter aux 10 premières lignes
-        
-        record = {}
-        record['ref'] = f"{pattern}{lines[0].strip()}" if lines else f"Annonce_{i}"
-        
-        # Chercher le prix
-        price_line = ""
-        for line in lines:
-            if '€' in line or 'EUR' in line:
-                price_line = line.strip()
-                break
-        record['price'] = price_line
-        
-        # Chercher la localisation
-        location_line = ""
-        for line in lines:
-            if any(word in line.upper() for word in ['PARIS', 'ARRONDISSEMENT', '75']):
-                location_line = line.strip()
+def is_pagination_link(url):
+    """Indique si une URL porte un numéro de page"""
+    parts = urlparse(url)
+    if PAGINATION_PATH_RE.search(parts.path):
+        return True
+    return any(
+        param.split('=', 1)[0].lower() in PAGINATION_PARAMS and param.split('=', 1)[-1].isdigit()
+        for param in parts.query.split('&') if '=' in param
+    )
+
+@dataclass
+class CrawlStatus:
+    """Bilan d'un crawl, rempli par `crawl_listings` au fil du parcours"""
+    pages: int = 0
+    page_errors: int = 0
+    truncated: bool = False  # pages de pagination laissées de côté (`max_pages` atteint)
+    finished: bool = False
+
+    @property
+    def complete(self):
+        """Toutes les pages ont été lues : une annonce absente a bien été retirée du site"""
+        return self.finished and not self.page_errors and not self.truncated
+
+def crawl_listings(start_url, max_pages=50, max_workers=4, status=None):
+    """Parcourt les pages de résultats d'une liste d'annonces
+
+    Générateur : les pages sont récupérées en parallèle (au plus `max_workers`
+    à la fois), les liens de pagination découverts sont suivis jusqu'à
+    `max_pages`, et chaque annonce est renvoyée une seule fois (dédoublonnage
+    par `ref`). Seuls les refs et URLs déjà vus sont conservés en mémoire.
+    Un `CrawlStatus` passé en `status` indique, une fois le générateur épuisé,
+    si le crawl est complet.
+    """
+    status = status if status is not None else CrawlStatus()
+    max_workers = max(1, max_workers)
+    with span("crawl", activate=False, url=start_url, max_pages=max_pages) as crawl:
+        yield from _crawl_listings(crawl, status, start_url, max_pages, max_workers)
+        crawl.set(truncated=status.truncated)
+
+def _crawl_listings(crawl, status, start_url, max_pages, max_workers):
+    base = pagination_base(start_url)
+    seen_urls = {start_url.split('#')[0]}
+    seen_refs = set()
+    queue = deque([start_url])
+    fetched = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while queue or running:
+            while queue and len(running) < max_workers and fetched < max_pages:
+                page_url = queue.popleft()
+                running[executor.submit(bind(scrape_page, crawl), page_url)] = page_url
+                fetched += 1
+            if not running:
+                status.truncated = bool(queue)
                 break
-        record['location'] = location_line
-        
-        # Description = les premières lignes
-        record['description'] = ' '.join(lines[:5])
-        
-        records.append(record)
-        
-        if len(records) >= 10:  # Limiter pour éviter trop de résultats
-            break
-    
-    print(f"Debug - {len(records)} annonces parsées avec pattern {pattern}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_url = running.pop(future)
+                try:
+                    records, links = future.result()
+                except Exception as e:
+                    logger.warning(f"Erreur sur la page {page_url}: {e}")
+                    crawl.add(page_errors=1)
+                    status.page_errors += 1
+                    continue
+                crawl.add(pages=1)
+                status.pages += 1
+
+                for link in links:
+                    link = link.split('#')[0]
+                    if link not in seen_urls and is_pagination_link(link) and pagination_base(link) == base:
+                        seen_urls.add(link)
+                        queue.append(link)
+
+                for record in records:
+                    if record['ref'] in seen_refs:
+                        continue
+                    seen_refs.add(record['ref'])
+                    crawl.add(records=1)
+                    yield record
+    status.finished = True
+
+def parse_markdown(markdown_content):
+    """Parse le contenu Markdown pour extraire les annonces"""
+    logger.debug(f"Parsing Markdown (200 premiers caractères): {markdown_content[:200]}...")
+    # Adapter selon le format Markdown retourné
+    with span("scrape.parse", format="markdown", text_chars=len(markdown_content)) as parse:
+        records = simple_parse(markdown_content)
+        parse.set(records=len(records))
     return records
 
-def get_ai_summary(record):
-    """Génère le résumé IA pour une annonce"""
-    prompt = f"""Voici une annonce immobilière :
+def build_summary_prompt(record):
+    """Construit le prompt d'analyse d'une annonce"""
+    return f"""Voici une annonce immobilière :
     
 Référence : {record.get('ref')}
 Prix : {record.get('price')}
 Localisation : {record.get('location')}
 Description : {record.get('description')}
 """
-    
-    summary = listing_agent.run(prompt)
-    return summary.content
+
+def get_ai_summary(record, agent=None, max_retries=None):
+    """Génère le résumé IA pour une annonce (`max_retries=0` : réessais laissés à l'appelant)"""
+    return get_gateway().run_agent(agent or get_listing_agent(), build_summary_prompt(record), max_retries=max_retries)
+
+_summary_cache = None
+
+def get_summary_cache():
+    """Retourne le cache persistant des résumés (ouvert au premier appel)"""
+    global _summary_cache
+    if _summary_cache is None:
+        _summary_cache = SummaryCache(SUMMARY_CACHE_PATH, max_entries=SUMMARY_CACHE_MAX_ENTRIES)
+    return _summary_cache
+
+def summary_key(record):
+    """Clé de cache d'un résumé : contenu normalisé de l'annonce + version du prompt"""
+    return record_fingerprint(record, SUMMARY_PROMPT_VERSION)
+
+def enrich_records(records, max_concurrency=4, calls_per_minute=60, max_retries=3, base_delay=2.0, cache=None):
+    """Génère les résumés IA de plusieurs annonces en parallèle
+
+    Générateur qui renvoie des tuples `(record, summary, error)` au fur et à mesure
+    que les appels se terminent (pas dans l'ordre d'entrée). Les erreurs 429 sont
+    réessayées avec backoff exponentiel ; les autres sont renvoyées dans `error`.
+    Avec un `cache`, les annonces inchangées sont servies sans appel à l'agent.
+    """
+    with span("summaries", activate=False, cached=cache is not None) as trace:
+        yield from _enrich_records(trace, records, max_concurrency, calls_per_minute, max_retries, base_delay, cache)
+
+def _enrich_records(trace, records, max_concurrency, calls_per_minute, max_retries, base_delay, cache):
+    if cache is not None:
+        misses = []
+        for record in records:
+            summary = cache.get(summary_key(record))
+            if summary is None:
+                misses.append(record)
+            else:
+                trace.add(records=1, cache_hits=1)
+                yield record, summary, None
+        records = misses
+
+    limiter = RateLimiter(calls_per_minute)
+    local = threading.local()
+
+    def worker(record):
+        if not hasattr(local, "agent"):
+            local.agent = create_listing_agent()
+        with span("summary", ref=record.get('ref')) as summary_span:
+            for attempt in range(1, max_retries + 2):
+                limiter.acquire()
+                try:
+                    # Réessais gérés ici (pause partagée entre workers) : pas de second niveau dans la passerelle
+                    return record, get_ai_summary(record, agent=local.agent, max_retries=0), None
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt > max_retries:
+                        return record, None, f"Erreur lors de l'analyse IA: {e}"
+                    summary_span.add(rate_limited=1)
+                    limiter.pause(base_delay * 2 ** (attempt - 1) + random.uniform(0, 1))
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+    try:
+        futures = [executor.submit(bind(worker, trace), record) for record in records]
+        for future in as_completed(futures):
+            record, summary, error = future.result()
+            trace.add(records=1, errors=1 if error else 0)
+            if cache is not None and error is None:
+                cache.put(summary_key(record), summary)
+            yield record, summary, error
+    finally:
+        # Si le consommateur s'arrête en route, les résumés pas encore lancés sont annulés
+        executor.shutdown(cancel_futures=True)
+
+_airtable_writer = None
+
+def get_airtable_writer():
+    """Retourne le client Airtable partagé (session HTTP réutilisée)"""
+    global _airtable_writer
+    if _airtable_writer is None:
+        _airtable_writer = AirtableWriter(AIRTABLE_API_KEY, AIRTABLE_BASE_ID, AIRTABLE_TABLE_ID, api_url=AIRTABLE_URL)
+    return _airtable_writer
+
+def save_all_to_airtable(records):
+    """Sauvegarde plusieurs enregistrements dans Airtable (lots de 10, upsert sur `ref`)"""
+    records = list(records)
+    with span("airtable.upsert", records=len(records)) as trace:
+        result = get_airtable_writer().upsert(records)
+        trace.set(created=len(result.created), updated=len(result.updated), errors=len(result.errors),
+                  skipped=result.skipped)
+    return result
 
 def save_to_airtable(record):
     """Sauvegarde un enregistrement dans Airtable"""
-    
-    enriched_record = {
-        "ref": str(record.get("ref", "")),
-        "price": str(record.get("price", "")),
-        "location": str(record.get("location", "")),
-        "description": str(record.get("description", "")),
-        "summary": str(record.get("summary", ""))  # ✅ Maintenant que la colonne existe
-    }
-    
-    response = requests.post(
-        f"https://api.airtable.com/v0/{AIRTABLE_BASE_ID}/{AIRTABLE_TABLE_ID}",
-        headers={
-            "Authorization": f"Bearer {AIRTABLE_API_KEY}",
-            "Content-Type": "application/json"
-        },
-        json={"fields": enriched_record}
-    )
-    
-    return response.status_code == 200, response.text
\ No newline at end of file
+    result = save_all_to_airtable([record])
+    if result.ok:
+        return True, json.dumps({"created": result.created, "updated": result.updated})
+    return False, json.dumps(result.errors, ensure_ascii=False)
+
+# Recrawl incrémental
+_snapshot_store = None
+
+def get_snapshot_store():
+    """Retourne l'instantané des crawls précédents (ouvert au premier appel)"""
+    global _snapshot_store
+    if _snapshot_store is None:
+        _snapshot_store = SnapshotStore(SNAPSHOT_PATH)
+    return _snapshot_store
+
+def incremental_recrawl(url, max_pages=50, max_workers=4, max_concurrency=4):
+    """Recrawle `url` et ne résume/sauvegarde que les annonces nouvelles ou modifiées
+
+    Retourne le `CrawlDelta`, le bilan Airtable et les erreurs de résumé. Seules
+    les annonces résumées et sauvegardées avec succès entrent dans l'instantané ;
+    les annonces retirées n'en sortent qu'après un crawl complet.
+    """
+    with span("recrawl", url=url) as trace:
+        return _incremental_recrawl(trace, url, max_pages, max_workers, max_concurrency)
+
+def _incremental_recrawl(trace, url, max_pages, max_workers, max_concurrency):
+    store = get_snapshot_store()
+    status = CrawlStatus()
+    records = list(crawl_listings(url, max_pages=max_pages, max_workers=max_workers, status=status))
+    # Un crawl partiel (page en erreur, max_pages atteint) ne permet pas de conclure au retrait d'une annonce
+    delta = store.classify(url, records, complete=status.complete)
+    trace.set(records=len(records), to_process=len(delta.to_process), removed=len(delta.removed),
+              complete=status.complete)
+
+    enriched, summary_errors = [], []
+    for record, summary, error in enrich_records(delta.to_process, max_concurrency=max_concurrency, cache=get_summary_cache()):
+        if error:
+            summary_errors.append({"ref": record['ref'], "error": error})
+        else:
+            enriched.append({**record, "summary": summary})
+
+    result = save_all_to_airtable(enriched)
+    failed_refs = {ref for error in result.errors for ref in error.get("refs", [])}
+    store.commit(url, [record for record in enriched if record['ref'] and record['ref'] not in failed_refs],
+                 removed=delta.removed)
+    return delta, result, summary_errors
@@ -0,0 +1,95 @@
+"""
+Instantanés des annonces d'un crawl à l'autre, pour ne traiter que le delta
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+
+from summary_cache import record_fingerprint
+
+@dataclass
+class CrawlDelta:
+    """Classement des annonces d'un crawl par rapport à l'instantané précédent"""
+    new: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+    unchanged: list = field(default_factory=list)
+    removed: list = field(default_factory=list)  # refs absentes du nouveau crawl
+    complete: bool = True  # False : crawl partiel, `removed` n'est pas calculé
+
+    @property
+    def to_process(self):
+        """Annonces à résumer et à sauvegarder : nouvelles et modifiées"""
+        return self.new + self.changed
+
+    def counts(self):
+        return {
+            "new": len(self.new),
+            "changed": len(self.changed),
+            "unchanged": len(self.unchanged),
+            "removed": len(self.removed)
+        }
+
+class SnapshotStore:
+    """Empreintes par annonce et par source (URL de départ du crawl), stockées en SQLite"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS listings ("
+                "source TEXT, ref TEXT, fingerprint TEXT, last_seen REAL, PRIMARY KEY (source, ref))"
+            )
+
+    def close(self):
+        self._conn.close()
+
+    def fingerprints(self, source):
+        with self._lock:
+            rows = self._conn.execute("SELECT ref, fingerprint FROM listings WHERE source = ?", (source,))
+            return dict(rows.fetchall())
+
+    def classify(self, source, records, complete=True):
+        """Compare les annonces au dernier instantané de `source` (sans le modifier)
+
+        Les annonces retirées ne sont calculées que si `records` vient d'un crawl
+        `complete` : une page manquante ferait passer ses annonces pour retirées.
+        """
+        previous = self.fingerprints(source)
+        delta = CrawlDelta(complete=complete)
+        seen = set()
+        for record in records:
+            ref = record['ref']
+            if ref in seen:
+                continue
+            seen.add(ref)
+            if ref not in previous:
+                delta.new.append(record)
+            elif previous[ref] != record_fingerprint(record):
+                delta.changed.append(record)
+            else:
+                delta.unchanged.append(record)
+        if complete:
+            delta.removed = sorted(set(previous) - seen)
+        return delta
+
+    def commit(self, source, records, removed=()):
+        """Enregistre les empreintes des annonces traitées et oublie les annonces retirées
+
+        À appeler une fois les annonces effectivement résumées et sauvegardées, pour
+        qu'un échec laisse ces annonces dans le delta du crawl suivant.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?)",
+                [(source, record['ref'], record_fingerprint(record), now) for record in records]
+            )
+            self._conn.executemany(
+                "DELETE FROM listings WHERE source = ? AND ref = ?",
+                [(source, ref) for ref in removed]
+            )
@@ -0,0 +1,82 @@
+"""
+Cache persistant des résumés IA, adressé par le contenu des annonces
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+FINGERPRINT_FIELDS = ("ref", "price", "location", "description")
+
+def normalize_field(value):
+    """Normalise un champ (espaces multiples, casse) pour que le hash reste stable"""
+    return " ".join(str(value or "").split()).casefold()
+
+def record_fingerprint(record, version=""):
+    """Hash SHA-256 des champs normalisés d'une annonce (et d'une version de prompt)"""
+    payload = [normalize_field(record.get(name)) for name in FINGERPRINT_FIELDS]
+    payload.append(version)
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class SummaryCache:
+    """Stockage SQLite des résumés, borné à `max_entries` (éviction LRU)
+
+    Les compteurs de hits/misses sont conservés sur disque d'une session à l'autre.
+    """
+
+    def __init__(self, path, max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "key TEXT PRIMARY KEY, summary TEXT NOT NULL, created_at REAL, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)")
+            self._conn.execute("INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0)")
+
+    def close(self):
+        self._conn.close()
+
+    def get(self, key):
+        """Retourne le résumé en cache ou None, et met à jour les compteurs"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            counter = "hits" if row else "misses"
+            self._conn.execute("UPDATE stats SET value = value + 1 WHERE name = ?", (counter,))
+            if row:
+                self._conn.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0] if row else None
+
+    def put(self, key, summary):
+        """Enregistre un résumé puis évince les entrées les moins récemment utilisées"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)", (key, summary, now, now)
+            )
+            self._conn.execute(
+                "DELETE FROM summaries WHERE key IN ("
+                "SELECT key FROM summaries ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self):
+        """Compteurs cumulés : hits, misses, taux de hit et nombre d'entrées"""
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM stats").fetchall())
+            size = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            "entries": size
+        }
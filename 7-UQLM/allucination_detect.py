@@ -1,38 +1,73 @@
 import asyncio
 import os
+import sys
 import pandas as pd
 from dotenv import load_dotenv
 from uqlm import BlackBoxUQ
 from uqlm.utils import load_example_dataset, math_postprocessor
 from langchain_openai import ChatOpenAI
+from decision import Seuils, decider
+from incertitude import POIDS_DEFAUT, calculer_incertitude_colonnes
+from execution import executer_par_lots
+from cache_generation import CacheGeneration, generer_avec_cache
+from stockage import EcrivainParquet, ecrire_parquet, exporter_csv
+from echantillonnage_adaptatif import ConfigAdaptative, StatsEchantillonnage, generer_adaptatif, comparer_au_baseline
 
 # 🧠 AGENT AGNO
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.tools.python import PythonTools
 
+# 📦 Modules partagés du dépôt (common/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.llm_gateway import get_gateway
+from common.tracing import span
+
 # ✅ Chargement des variables d'environnement depuis le fichier .env
 load_dotenv()
 
-# ✅ Vérification que la clé API OpenAI est disponible
-if not os.getenv("OPENAI_API_KEY"):
-    raise ValueError("OPENAI_API_KEY non trouvée dans le fichier .env. Veuillez l'ajouter.")
+def exiger_cle_openai():
+    """Vérifie que la clé API OpenAI est disponible (au moment d'appeler le LLM, pas à l'import)"""
+    if not os.getenv("OPENAI_API_KEY"):
+        raise ValueError("OPENAI_API_KEY non trouvée dans le fichier .env. Veuillez l'ajouter.")
+    return os.getenv("OPENAI_API_KEY")
+
+# ⚙️ Règles de décision et justification optionnelle des cas limites par l'agent
+SEUILS = Seuils(accepter=0.2, refuser=0.5, marge=0.05)
+JUSTIFIER_CAS_LIMITES = os.getenv("JUSTIFIER_CAS_LIMITES", "0") == "1"
+MAX_CONCURRENCE_AGENT = int(os.getenv("MAX_CONCURRENCE_AGENT", "4"))
+POIDS_INCERTITUDE = POIDS_DEFAUT  # ex. {'semantique': 2, 'cosinus': 1}
+
+# ⚙️ Exécution par lots avec checkpoints (N_EXEMPLES vide = jeu de données complet)
+N_EXEMPLES = int(os.getenv("N_EXEMPLES")) if os.getenv("N_EXEMPLES") else None
+TAILLE_LOT = int(os.getenv("TAILLE_LOT", "50"))
+MAX_CONCURRENCE_LOTS = int(os.getenv("MAX_CONCURRENCE_LOTS", "2"))
+DOSSIER_CHECKPOINTS = os.getenv("DOSSIER_CHECKPOINTS", "checkpoints")
+NUM_RESPONSES = int(os.getenv("NUM_RESPONSES", "5"))
+
+# 💾 Cache des générations : HORS_LIGNE=1 rejoue le scoring sans aucun appel au LLM
+CHEMIN_CACHE_GENERATION = os.getenv("CHEMIN_CACHE_GENERATION", "cache/generations.sqlite")
+HORS_LIGNE = os.getenv("HORS_LIGNE", "0") == "1"
+
+# 🎯 Échantillonnage adaptatif : arrêt anticipé quand les échantillons sont en accord
+ECHANTILLONNAGE_ADAPTATIF = os.getenv("ECHANTILLONNAGE_ADAPTATIF", "0") == "1"
+CONFIG_ADAPTATIVE = ConfigAdaptative(budget=NUM_RESPONSES, premier_tour=min(3, NUM_RESPONSES), taille_tour=1)
+COMPARER_BASELINE = os.getenv("COMPARER_BASELINE", "0") == "1"
+
+# 💾 Sorties : Parquet (colonnes typées, listes natives), CSV en export optionnel
+EXPORT_CSV = os.getenv("EXPORT_CSV", "0") == "1"
+FICHIER_BRUT = "resultats_uq_bruts.parquet"  # écrit lot par lot pendant le run
+FICHIER_RESULTATS = "resultats_math_uq_corrige"
 
 # ✅ Définition de l'agent Agno
-agent_hallucination = Agent(
-    name="AgentDetectionHallucination",
-    role="Analyser les réponses incertaines et proposer une action appropriée.",
-    model=OpenAIChat(id="gpt-4o"),
-    tools=[PythonTools()],
-    show_tool_calls=False,
-    markdown=False,
-    description="""
+DESCRIPTION_AGENT = """
 Vous êtes un agent spécialisé dans l'analyse des réponses générées par un modèle de langage.
 Votre rôle est de détecter les réponses avec un risque élevé d'hallucination basé uniquement sur le score d'incertitude fourni par une méthode de quantification d'incertitude (UQ).
 Vous n'avez pas accès à la vérité terrain et devez vous fier exclusivement au niveau d'incertitude pour décider s'il faut ACCEPTER, REFORMULER, ou REFUSER la réponse.
 Vous opérez selon une logique basée sur des seuils et êtes censé fournir des sorties normalisées et cohérentes dans un format de décision clair.
-""",
-    instructions="""
+"""
+
+INSTRUCTIONS_AGENT = """
 🎯 Objectif:
 Vous êtes un expert agent dans la détection d'hallucinations potentielles dans les réponses générées par un modèle de langage (ex. GPT-3.5-turbo) pour des questions mathématiques simples du jeu de données SVAMP.
 
@@ -54,35 +89,75 @@ Toujours répondre sur **une seule ligne**, commençant par l'action (**ACCEPTER
 🔴 Exemple:
 REFORMULER L'incertitude est modérée (0.43), reformuler la réponse est recommandé.
 """
-)
 
-def calculer_incertitude(row):
+def creer_agent_hallucination():
+    """Crée une instance de l'agent de justification (une par appel : Agno garde l'état du run sur l'agent)"""
+    return Agent(
+        name="AgentDetectionHallucination",
+        role="Analyser les réponses incertaines et proposer une action appropriée.",
+        model=OpenAIChat(id="gpt-4o", api_key=exiger_cle_openai()),
+        tools=[PythonTools()],
+        show_tool_calls=False,
+        markdown=False,
+        description=DESCRIPTION_AGENT,
+        instructions=INSTRUCTIONS_AGENT
+    )
+
+async def justifier_cas_limites(df, max_concurrence=MAX_CONCURRENCE_AGENT):
     """
-    Calculer le score d'incertitude à partir des métriques BlackBoxUQ.
-    Une entropie_semantique plus faible = incertitude plus élevée
+    Demande à l'agent une justification pour les seuls cas limites, en parallèle
+    (au plus `max_concurrence` appels simultanés). La décision reste celle des règles.
     """
-    incertitude_semantique = 1 - row.get('semantic_negentropy', 0)
-    incertitude_correspondance_exacte = 1 - row.get('exact_match', 0)  
-    incertitude_cosinus = 1 - row.get('cosine_sim', 0)
-    incertitude_contradiction = 1 - row.get('noncontradiction', 0)
-    
-    incertitude_primaire = incertitude_semantique
-    incertitude_combinee = (incertitude_semantique + incertitude_correspondance_exacte + incertitude_cosinus) / 3
-    
-    return incertitude_primaire, {
-        'semantique': incertitude_semantique,
-        'correspondance_exacte': incertitude_correspondance_exacte, 
-        'cosinus': incertitude_cosinus,
-        'contradiction': incertitude_contradiction,
-        'combinee': incertitude_combinee
-    }
+    exiger_cle_openai()  # avant de lancer les tâches : une clé absente est une erreur, pas une justification
+    semaphore = asyncio.Semaphore(max_concurrence)
+
+    async def justifier(i, row):
+        contexte_prompt = f"""
+Question : {row.get('question', 'N/A')}
+Réponse : {row.get('response') or row.get('generation', '')}
+Incertitude : {row['incertitude']:.3f}
+Décision (règles) : {row['decision']}
+"""
+        async with semaphore:
+            try:
+                return i, await get_gateway().arun_agent(creer_agent_hallucination(), contexte_prompt.strip())
+            except Exception as e:
+                return i, f"ERREUR: {str(e)}"
+
+    cas_limites = df[df['cas_limite']]
+    with span("uq.justification", cas_limites=len(cas_limites)):
+        resultats = await asyncio.gather(*(justifier(i, row) for i, row in cas_limites.iterrows()))
+    df['justification_agent'] = None
+    for i, justification in resultats:
+        df.at[i, 'justification_agent'] = justification
+        print(f"🤖 Q{i+1} (cas limite) → {df.at[i, 'decision']} | Agent : {justification}")
+    return df
+
+def post_traiter(df):
+    """Nettoyage des réponses, scores d'incertitude (par colonne) et décisions par règles"""
+    with span("uq.post_traitement", lignes=len(df)):
+        # 🧹 Nettoyage des réponses
+        if "response" in df.columns:
+            df['sortie_traitee'] = df['response'].apply(math_postprocessor)
+        elif "generation" in df.columns:
+            df['sortie_traitee'] = df['generation'].apply(math_postprocessor)
+        else:
+            print("⚠️ Aucun champ 'response' ou 'generation' trouvé.")
+            df['sortie_traitee'] = None
+        
+        # 📊 Scores d'incertitude (opérations par colonne)
+        df = pd.concat([df, calculer_incertitude_colonnes(df, POIDS_INCERTITUDE)], axis=1)
+        
+        # 🧠 Décisions par règles (vectorisées)
+        return decider(df, SEUILS)
 
 async def main():
     # 📊 1. Charger le jeu de données SVAMP
-    svamp = load_example_dataset("svamp", n=5)
+    svamp = load_example_dataset("svamp", n=N_EXEMPLES) if N_EXEMPLES else load_example_dataset("svamp")
     print('------------------------📊 Questions------------------------')
-    for idx, q in enumerate(svamp['question'], 1):
+    for idx, q in enumerate(svamp['question'][:10], 1):
         print(f"{idx}. {q}")
+    print(f"... {len(svamp)} questions au total")
     print('-----------------------------------------------------------')
     
     # 📝 2. Préparer les prompts
@@ -90,73 +165,78 @@ async def main():
     prompts = [INSTRUCTION_MATH + q for q in svamp.question]
     
     # 🧠 3. Initialiser le modèle LLM
-    llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0)
+    # Hors ligne, les générations viennent du cache : le client n'envoie aucune requête et la clé n'est pas exigée
+    cle = (os.getenv("OPENAI_API_KEY") or "hors-ligne") if HORS_LIGNE else exiger_cle_openai()
+    llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0, api_key=cle)
     
-    # 🔍 4. Génération avec incertitude via BlackBoxUQ
+    # 🔍 4. Génération avec incertitude via BlackBoxUQ, par lots avec reprise sur checkpoint
     bbuq = BlackBoxUQ(llm=llm)
-    results = await bbuq.generate_and_score(prompts)
-    df = results.to_df()
+    cache_generation = CacheGeneration(CHEMIN_CACHE_GENERATION)
     
-    print("\n✅ Colonnes disponibles :", df.columns.tolist())
-    print(df.head())
+    async def executer_fixe(sur_lot=None):
+        return await executer_par_lots(
+            bbuq, prompts,
+            dossier_checkpoints=DOSSIER_CHECKPOINTS,
+            taille_lot=TAILLE_LOT,
+            max_concurrence=MAX_CONCURRENCE_LOTS,
+            num_responses=NUM_RESPONSES,
+            sur_lot=sur_lot,
+            generer=lambda lot: generer_avec_cache(bbuq, lot, cache_generation, NUM_RESPONSES, hors_ligne=HORS_LIGNE)
+        )
     
-    # 🧹 5. Nettoyage des réponses
-    if "response" in df.columns:
-        df['sortie_traitee'] = df['response'].apply(math_postprocessor)
-    elif "generation" in df.columns:
-        df['sortie_traitee'] = df['generation'].apply(math_postprocessor)
-    else:
-        print("⚠️ Aucun champ 'response' ou 'generation' trouvé.")
-        df['sortie_traitee'] = None
+    with EcrivainParquet(FICHIER_BRUT) as ecrivain_brut:
+        sur_lot = lambda k, df_lot: ecrivain_brut.ecrire(df_lot.assign(lot=k))
+        if ECHANTILLONNAGE_ADAPTATIF:
+            stats_echantillonnage = StatsEchantillonnage()
+            df = await executer_par_lots(
+                bbuq, prompts,
+                dossier_checkpoints=DOSSIER_CHECKPOINTS,
+                taille_lot=TAILLE_LOT,
+                max_concurrence=MAX_CONCURRENCE_LOTS,
+                num_responses=NUM_RESPONSES,
+                sur_lot=sur_lot,
+                generer=lambda lot: generer_adaptatif(
+                    bbuq, lot, CONFIG_ADAPTATIVE, normaliser=math_postprocessor, stats=stats_echantillonnage,
+                    cache=cache_generation, hors_ligne=HORS_LIGNE
+                ),
+                parametres_run={"mode": "adaptatif", **CONFIG_ADAPTATIVE.__dict__}
+            )
+            print(stats_echantillonnage.rapport())
+        else:
+            df = await executer_fixe(sur_lot)
+        print(cache_generation.rapport())
+    print(f"📁 Résultats bruts écrits lot par lot dans {FICHIER_BRUT}")
     
-    # 📊 6. Calculer les scores d'incertitude
-    donnees_incertitude = []
-    for i, row in df.iterrows():
-        incertitude, detail_incertitude = calculer_incertitude(row)
-        donnees_incertitude.append({
-            'incertitude': incertitude,
-            **detail_incertitude
-        })
+    print("\n✅ Colonnes disponibles :", df.columns.tolist())
+    print(df.head())
     
-    df_incertitude = pd.DataFrame(donnees_incertitude)
-    df = pd.concat([df, df_incertitude], axis=1)
+    # 🧹 5-7. Nettoyage, scores d'incertitude et décisions
+    df = post_traiter(df)
     
     print("\n📊 Scores d'incertitude calculés:")
     print(df[['response', 'incertitude', 'semantique', 'correspondance_exacte', 'cosinus', 'combinee']].head())
+    print("\n🧠 Décisions (règles) :")
+    print(df[['incertitude', 'decision', 'cas_limite']].head(10))
     
-    # 🧠 7. Analyser intelligemment par Agent Agno
-    resultats_analyse = []
-    for i, row in df.iterrows():
-        question = row.get('question', 'N/A')
-        response = row.get('response') or row.get('generation', '')
-        incertitude = row.get('incertitude', 1.0)
-        
-        contexte_prompt = f"""
-Question : {question}
-Réponse : {response}
-Incertitude : {incertitude:.3f}
-"""
-        
-        try:
-            reponse_agent = agent_hallucination.run(contexte_prompt.strip())
-            decision_agent = reponse_agent.content if hasattr(reponse_agent, "content") else str(reponse_agent)
-            print(f"🤖 Décision agent    : {decision_agent}")
-        except Exception as e:
-            decision_agent = f"ERREUR: {str(e)}"
-        
-        resultats_analyse.append(decision_agent)
-        print(f"🧠 Q{i+1} → Incertitude: {incertitude:.3f} → {decision_agent}")
+    # 🎯 Effet de l'échantillonnage adaptatif sur les scores, face au run à échantillons fixes
+    if ECHANTILLONNAGE_ADAPTATIF and COMPARER_BASELINE:
+        df_fixe = post_traiter(await executer_fixe())
+        print("\n🎯 Écart des scores adaptatif vs fixe :")
+        print(comparer_au_baseline(df, df_fixe))
     
-    df['decision_agent'] = resultats_analyse
+    if JUSTIFIER_CAS_LIMITES and df['cas_limite'].any():
+        print(f"\n🤖 Justification de {int(df['cas_limite'].sum())} cas limite(s) par l'agent...")
+        df = await justifier_cas_limites(df)
     
-    # 💾 8. Sauvegarder dans un fichier CSV
-    df.to_csv("resultats_math_uq_corrige.csv", index=False)
-    print("\n📁 Résultats sauvegardés dans resultats_math_uq_corrige.csv")
+    # 💾 8. Sauvegarder (Parquet par défaut, CSV en export)
+    chemin_parquet = ecrire_parquet(df, f"{FICHIER_RESULTATS}.parquet")
+    print(f"\n📁 Résultats sauvegardés dans {chemin_parquet}")
+    if EXPORT_CSV:
+        print(f"📁 Export CSV : {exporter_csv(chemin_parquet, f'{FICHIER_RESULTATS}.csv')}")
     
     # 📊 9. Résumé des décisions
     print("\n📊 Résumé des décisions:")
-    decisions = [result.split()[0] for result in resultats_analyse if result.split()]
-    comptes_decisions = pd.Series(decisions).value_counts()
+    comptes_decisions = df['decision'].value_counts()
     print(comptes_decisions)
 
 if __name__ == "__main__":
@@ -0,0 +1,58 @@
+"""
+Benchmark du calcul d'incertitude : boucle iterrows historique vs opérations par colonne
+
+Usage : python bench_incertitude.py [nombre_de_lignes]
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from incertitude import calculer_incertitude, calculer_incertitude_colonnes
+
+def make_results(n, seed=0):
+    """Résultats BlackBoxUQ synthétiques (mêmes colonnes que `results.to_df()`)"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'response': rng.integers(0, 500, n).astype(str),
+        'exact_match': rng.choice([0.2, 0.4, 0.6, 0.8, 1.0], n),
+        'cosine_sim': rng.uniform(0.5, 1.0, n),
+        'semantic_negentropy': rng.uniform(0.0, 1.0, n),
+        'noncontradiction': rng.uniform(0.3, 1.0, n)
+    })
+
+def ligne_par_ligne(df):
+    """Version historique de `main()` : iterrows + liste de dicts + concat"""
+    donnees_incertitude = []
+    for i, row in df.iterrows():
+        incertitude, detail_incertitude = calculer_incertitude(row)
+        donnees_incertitude.append({
+            'incertitude': incertitude,
+            **detail_incertitude
+        })
+    return pd.concat([df, pd.DataFrame(donnees_incertitude)], axis=1)
+
+def par_colonnes(df):
+    return pd.concat([df, calculer_incertitude_colonnes(df)], axis=1)
+
+def chrono(func, df):
+    start = time.perf_counter()
+    result = func(df)
+    return time.perf_counter() - start, result
+
+def main(n):
+    df = make_results(n)
+    t_lignes, attendu = chrono(ligne_par_ligne, df)
+    t_colonnes, obtenu = chrono(par_colonnes, df)
+
+    colonnes = ['incertitude', 'semantique', 'correspondance_exacte', 'cosinus', 'contradiction', 'combinee']
+    assert np.allclose(attendu[colonnes].to_numpy(dtype=float), obtenu[colonnes].to_numpy(dtype=float))
+
+    print(f"📊 {n} lignes")
+    print(f"   iterrows       : {t_lignes:8.3f} s")
+    print(f"   par colonnes   : {t_colonnes:8.3f} s")
+    print(f"   gain           : {t_lignes / t_colonnes:8.0f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
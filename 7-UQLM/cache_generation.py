@@ -0,0 +1,103 @@
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import sys
+import time
+
+# 📦 Modules partagés du dépôt (common/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.tracing import span
+
+class CacheGeneration:
+    """
+    Cache persistant (SQLite) des générations BlackBoxUQ : réponse originale et
+    réponses échantillonnées, par prompt, modèle, températures et nombre d'échantillons.
+    Un run adaptatif peut y laisser moins d'échantillons que ce nombre (arrêt anticipé).
+    """
+
+    def __init__(self, chemin="cache/generations.sqlite"):
+        os.makedirs(os.path.dirname(os.path.abspath(chemin)), exist_ok=True)
+        self.conn = sqlite3.connect(chemin)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations ("
+                "cle TEXT PRIMARY KEY, response TEXT, sampled_responses TEXT, cree_le REAL)"
+            )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def cle(prompt, modele, temperature, temperature_echantillons, num_responses):
+        contenu = json.dumps([prompt, modele, temperature, temperature_echantillons, num_responses], ensure_ascii=False)
+        return hashlib.sha256(contenu.encode("utf-8")).hexdigest()
+
+    def lire(self, cles, min_echantillons=0):
+        """Retourne {cle: (response, sampled_responses)} pour les clés présentes avec au moins `min_echantillons` échantillons"""
+        trouves = {}
+        for debut in range(0, len(cles), 500):
+            paquet = cles[debut:debut + 500]
+            requete = f"SELECT cle, response, sampled_responses FROM generations WHERE cle IN ({','.join('?' * len(paquet))})"
+            for cle, response, sampled in self.conn.execute(requete, paquet):
+                sampled = json.loads(sampled)
+                if len(sampled) >= min_echantillons:
+                    trouves[cle] = (response, sampled)
+        self.hits += len(trouves)
+        self.misses += len(cles) - len(trouves)
+        return trouves
+
+    def ecrire(self, entrees):
+        """Enregistre {cle: (response, sampled_responses)}"""
+        maintenant = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO generations VALUES (?, ?, ?, ?)",
+                [(cle, response, json.dumps(sampled, ensure_ascii=False), maintenant)
+                 for cle, (response, sampled) in entrees.items()]
+            )
+
+    def rapport(self):
+        total = self.hits + self.misses
+        taux = self.hits / total if total else 0.0
+        return f"💾 Cache de génération : {self.hits} hits, {self.misses} misses ({taux:.0%} de hits)"
+
+def parametres_generation(bbuq):
+    """Modèle et températures utilisés par BlackBoxUQ, pour la clé de cache"""
+    llm = bbuq.llm
+    modele = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+    return modele, getattr(llm, "temperature", None), getattr(bbuq, "sampling_temperature", None)
+
+async def generer_avec_cache(bbuq, prompts, cache, num_responses=5, hors_ligne=False):
+    """
+    Équivalent de `bbuq.generate_and_score` qui ne sollicite le LLM que pour les
+    prompts absents du cache, puis calcule les scores sur l'ensemble.
+    Avec `hors_ligne=True`, un prompt absent du cache lève une erreur au lieu d'appeler le LLM.
+    """
+    modele, temperature, temperature_echantillons = parametres_generation(bbuq)
+    cles = [cache.cle(p, modele, temperature, temperature_echantillons, num_responses) for p in prompts]
+    # Les entrées incomplètes laissées par un run adaptatif sont régénérées
+    trouves = cache.lire(cles, min_echantillons=num_responses)
+
+    manquants = [(cle, p) for cle, p in zip(cles, prompts) if cle not in trouves]
+    with span("uq.generation", modele=modele, prompts=len(cles), cache_hits=len(cles) - len(manquants),
+              num_responses=num_responses):
+        if manquants:
+            if hors_ligne:
+                raise RuntimeError(f"{len(manquants)} prompt(s) absent(s) du cache de génération en mode hors ligne")
+            prompts_manquants = [p for _, p in manquants]
+            responses = await bbuq.generate_original_responses(prompts_manquants)
+            sampled_responses = await bbuq.generate_candidate_responses(prompts_manquants, num_responses=num_responses)
+            nouveaux = {cle: (r, list(s)) for (cle, _), r, s in zip(manquants, responses, sampled_responses)}
+            cache.ecrire(nouveaux)
+            trouves.update(nouveaux)
+
+    with span("uq.score", prompts=len(cles)):
+        resultats = bbuq.score(
+            prompts=list(prompts),
+            responses=[trouves[cle][0] for cle in cles],
+            sampled_responses=[trouves[cle][1] for cle in cles]
+        )
+        if inspect.isawaitable(resultats):
+            resultats = await resultats
+    return resultats
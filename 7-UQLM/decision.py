@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+ACCEPTER = "ACCEPTER"
+REFORMULER = "REFORMULER"
+REFUSER = "REFUSER"
+
+@dataclass(frozen=True)
+class Seuils:
+    """
+    Seuils de décision sur le score d'incertitude :
+    incertitude < accepter → ACCEPTER, incertitude > refuser → REFUSER, sinon REFORMULER.
+    Une ligne à moins de `marge` d'un seuil est considérée comme un cas limite.
+    """
+    accepter: float = 0.2
+    refuser: float = 0.5
+    marge: float = 0.05
+
+    def __post_init__(self):
+        if not 0 <= self.accepter <= self.refuser <= 1:
+            raise ValueError("Les seuils doivent vérifier 0 ≤ accepter ≤ refuser ≤ 1")
+
+def decider(df, seuils=Seuils(), colonne="incertitude"):
+    """
+    Applique les règles de décision à tout le DataFrame en une passe vectorisée.
+    Une incertitude manquante est traitée comme maximale (1.0).
+    Retourne une copie avec les colonnes 'decision', 'cas_limite' et 'decision_agent'.
+    """
+    incertitude = pd.to_numeric(df[colonne], errors="coerce").fillna(1.0).to_numpy(dtype=float)
+
+    decision = np.select(
+        [incertitude < seuils.accepter, incertitude > seuils.refuser],
+        [ACCEPTER, REFUSER],
+        default=REFORMULER
+    )
+    distance = np.minimum(np.abs(incertitude - seuils.accepter), np.abs(incertitude - seuils.refuser))
+
+    resultat = df.copy()
+    resultat["decision"] = decision
+    resultat["cas_limite"] = distance < seuils.marge
+    resultat["decision_agent"] = justification_regle(resultat["decision"], incertitude, seuils).to_numpy()
+    return resultat
+
+def justification_regle(decision, incertitude, seuils):
+    """Justifications déterministes (Series), au format « ACTION phrase » de l'agent"""
+    motifs = {
+        ACCEPTER: f"L'incertitude est inférieure au seuil d'acceptation ({seuils.accepter}), la réponse est probablement fiable.",
+        REFORMULER: f"L'incertitude est modérée (entre {seuils.accepter} et {seuils.refuser}), reformuler la réponse est recommandé.",
+        REFUSER: f"L'incertitude dépasse le seuil de refus ({seuils.refuser}), la réponse risque d'être une hallucination."
+    }
+    scores = pd.Series(np.round(incertitude, 3), index=decision.index).astype(str)
+    return decision + " (" + scores + ") " + decision.map(motifs)
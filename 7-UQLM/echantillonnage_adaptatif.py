@@ -0,0 +1,201 @@
+import asyncio
+import inspect
+import math
+import os
+import sys
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from cache_generation import parametres_generation
+
+# 📦 Modules partagés du dépôt (common/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.tracing import span
+
+@dataclass(frozen=True)
+class ConfigAdaptative:
+    """
+    Échantillonnage par tours : `premier_tour` échantillons, puis `taille_tour` de plus
+    tant que l'accord n'est pas établi, sans dépasser `budget` échantillons par prompt.
+    Un prompt s'arrête dès que la borne inférieure de Wilson (niveau `z`) de la
+    proportion d'échantillons en accord avec la réponse originale atteint `seuil_accord`.
+    Avec z = 1, 3/3 accords donnent une borne de 0.75 et 4/4 de 0.80 : le seuil par défaut
+    (0.70) arrête un prompt unanime après le premier tour, sans dépendre d'un arrondi.
+    """
+    budget: int = 5
+    premier_tour: int = 3
+    taille_tour: int = 1
+    seuil_accord: float = 0.7
+    z: float = 1.0
+
+    def __post_init__(self):
+        if not 1 <= self.premier_tour <= self.budget or self.taille_tour < 1:
+            raise ValueError("Il faut 1 ≤ premier_tour ≤ budget et taille_tour ≥ 1")
+
+@dataclass
+class StatsEchantillonnage:
+    """Échantillons tirés par rapport au budget fixe, cumulés sur les lots"""
+    prompts: int = 0
+    echantillons: int = 0
+    budget: int = 0
+    arrets_anticipes: int = 0
+
+    def rapport(self):
+        economises = self.budget - self.echantillons
+        part = economises / self.budget if self.budget else 0.0
+        return (f"🎯 Échantillonnage adaptatif : {self.echantillons}/{self.budget} échantillons tirés "
+                f"({economises} appels LLM économisés, {part:.0%}), "
+                f"{self.arrets_anticipes}/{self.prompts} prompts arrêtés avant le budget")
+
+def borne_wilson(accords, n, z):
+    """Borne inférieure de l'intervalle de Wilson pour une proportion accords/n"""
+    if n == 0:
+        return 0.0
+    p = accords / n
+    centre = p + z * z / (2 * n)
+    marge = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    return (centre - marge) / (1 + z * z / n)
+
+def normaliser_texte(texte):
+    return " ".join(str(texte).split()).lower()
+
+def _nombre(texte):
+    try:
+        return float(texte.replace(",", "."))
+    except ValueError:
+        return None
+
+def similarite_textuelle(seuil=0.85, normaliser=None):
+    """
+    Similarité par défaut entre deux réponses, après normalisation : deux nombres
+    doivent être égaux, deux textes sont en accord si leur ratio difflib atteint
+    `seuil` (reformulations proches).
+    """
+    normaliser = normaliser or normaliser_texte
+
+    def similaire(reponse, echantillon):
+        a, b = normaliser(reponse), normaliser(echantillon)
+        if a == b:
+            return True
+        nombre_a, nombre_b = _nombre(a), _nombre(b)
+        if nombre_a is not None or nombre_b is not None:
+            return nombre_a == nombre_b
+        return SequenceMatcher(None, a, b).ratio() >= seuil
+    return similaire
+
+def compter_accords(reponse, echantillons, normaliser=None, similaire=None):
+    """Nombre d'échantillons en accord avec la réponse (égalité après normalisation, ou `similaire`)"""
+    if similaire is not None:
+        return sum(1 for e in echantillons if similaire(reponse, e))
+    normaliser = normaliser or normaliser_texte
+    cible = normaliser(reponse)
+    return sum(1 for e in echantillons if normaliser(e) == cible)
+
+async def generer_adaptatif(bbuq, prompts, config=ConfigAdaptative(), normaliser=None, similaire=None, stats=None,
+                            cache=None, hors_ligne=False):
+    """
+    Équivalent de `bbuq.generate_and_score` qui tire les échantillons par tours et
+    arrête chaque prompt dès que l'accord est suffisant : seuls les prompts ambigus
+    consomment tout le budget. Les listes `sampled_responses` sont de longueur variable.
+
+    L'accord est jugé par `similaire(reponse, echantillon)`, par défaut
+    `similarite_textuelle(normaliser=normaliser)`. Avec un `CacheGeneration`, les
+    échantillons déjà en cache pour le prompt (clé au nombre d'échantillons `budget`,
+    partagée avec les runs à échantillons fixes) sont consommés avant d'appeler le LLM,
+    et les nouveaux tirages y sont ajoutés. `hors_ligne=True` lève une erreur plutôt
+    que d'appeler le LLM.
+    """
+    prompts = list(prompts)
+    similaire = similaire or similarite_textuelle(normaliser=normaliser)
+    cles, trouves = [None] * len(prompts), {}
+    if cache is not None:
+        modele, temperature, temperature_echantillons = parametres_generation(bbuq)
+        cles = [cache.cle(p, modele, temperature, temperature_echantillons, config.budget) for p in prompts]
+        trouves = cache.lire(cles)
+    responses = [trouves[cle][0] if cle in trouves else None for cle in cles]
+    reserves = [trouves[cle][1] if cle in trouves else [] for cle in cles]  # consommées dans l'ordre
+    echantillons = [[] for _ in prompts]
+    a_enregistrer = set()
+
+    def verifier_en_ligne(manquants):
+        if hors_ligne:
+            raise RuntimeError(f"{manquants} prompt(s) absent(s) ou incomplet(s) dans le cache de génération en mode hors ligne")
+
+    with span("uq.generation", mode="adaptatif", prompts=len(prompts), cache_hits=len(trouves)) as trace:
+        manquants = [i for i, response in enumerate(responses) if response is None]
+        if manquants:
+            verifier_en_ligne(len(manquants))
+            for i, response in zip(manquants, await bbuq.generate_original_responses([prompts[i] for i in manquants])):
+                responses[i] = response
+            a_enregistrer.update(manquants)
+
+        actifs = list(range(len(prompts)))
+        while actifs:
+            deja = len(echantillons[actifs[0]])
+            taille = config.premier_tour if deja == 0 else min(config.taille_tour, config.budget - deja)
+            # Tirages regroupés par nombre d'échantillons manquant une fois la réserve du cache consommée
+            a_tirer = {}
+            for i in actifs:
+                echantillons[i].extend(reserves[i][deja:deja + taille])
+                manque = deja + taille - len(echantillons[i])
+                if manque:
+                    a_tirer.setdefault(manque, []).append(i)
+            if a_tirer:
+                verifier_en_ligne(sum(len(indices) for indices in a_tirer.values()))
+                groupes = list(a_tirer.items())
+                tirages = await asyncio.gather(*(
+                    bbuq.generate_candidate_responses([prompts[i] for i in indices], num_responses=manque)
+                    for manque, indices in groupes
+                ))
+                for (_, indices), nouveaux_par_prompt in zip(groupes, tirages):
+                    for i, nouveaux in zip(indices, nouveaux_par_prompt):
+                        echantillons[i].extend(nouveaux)
+                        a_enregistrer.add(i)
+
+            suivants = []
+            for i in actifs:
+                n = len(echantillons[i])
+                accords = compter_accords(responses[i], echantillons[i], normaliser, similaire)
+                if n < config.budget and borne_wilson(accords, n, config.z) < config.seuil_accord:
+                    suivants.append(i)
+            actifs = suivants
+
+        if cache is not None and a_enregistrer:
+            cache.ecrire({cles[i]: (responses[i], echantillons[i]) for i in a_enregistrer})
+        trace.set(echantillons=sum(len(e) for e in echantillons), ecrits_en_cache=len(a_enregistrer))
+
+    if stats is not None:
+        stats.prompts += len(prompts)
+        stats.echantillons += sum(len(e) for e in echantillons)
+        stats.budget += len(prompts) * config.budget
+        stats.arrets_anticipes += sum(1 for e in echantillons if len(e) < config.budget)
+
+    with span("uq.score", prompts=len(prompts)):
+        resultats = bbuq.score(prompts=prompts, responses=responses, sampled_responses=echantillons)
+        if inspect.isawaitable(resultats):
+            resultats = await resultats
+    return resultats
+
+def comparer_au_baseline(df_adaptatif, df_fixe, colonnes=("exact_match", "cosine_sim", "semantic_negentropy", "noncontradiction")):
+    """
+    Écart des scores entre un run adaptatif et un run à échantillons fixes sur les mêmes prompts,
+    dans le même ordre (alignés ligne à ligne : un prompt répété reste une seule ligne par run).
+    Retourne un DataFrame : écart absolu moyen et maximal par score, et accord des décisions si disponibles.
+    """
+    adaptatif, fixe = df_adaptatif.reset_index(drop=True), df_fixe.reset_index(drop=True)
+    if len(adaptatif) != len(fixe) or not adaptatif["prompt"].equals(fixe["prompt"]):
+        raise ValueError("Les deux runs doivent porter sur les mêmes prompts, dans le même ordre")
+    fusion = adaptatif.add_suffix("_adaptatif").join(fixe.add_suffix("_fixe"))
+    lignes = {}
+    for colonne in colonnes:
+        if f"{colonne}_adaptatif" in fusion and f"{colonne}_fixe" in fusion:
+            ecart = np.abs(fusion[f"{colonne}_adaptatif"].astype(float) - fusion[f"{colonne}_fixe"].astype(float))
+            lignes[colonne] = {"ecart_moyen": ecart.mean(), "ecart_max": ecart.max()}
+    comparaison = pd.DataFrame(lignes).T
+    if "decision_adaptatif" in fusion and "decision_fixe" in fusion:
+        accord = (fusion["decision_adaptatif"] == fusion["decision_fixe"]).mean()
+        print(f"🤝 Décisions identiques au baseline : {accord:.1%} ({len(fusion)} prompts)")
+    return comparaison
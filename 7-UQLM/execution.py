@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+# 📦 Modules partagés du dépôt (common/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.tracing import span
+
+class Progression:
+    """Suivi du débit et de l'ETA d'une exécution par lots"""
+
+    def __init__(self, total, deja_faits=0):
+        self.total = total
+        self.faits = deja_faits
+        self.faits_run = 0
+        self.debut = time.monotonic()
+
+    def avancer(self, n):
+        self.faits += n
+        self.faits_run += n
+        duree = time.monotonic() - self.debut
+        debit = self.faits_run / duree if duree > 0 else 0.0
+        restants = self.total - self.faits
+        eta = restants / debit if debit > 0 else float("inf")
+        print(f"⏱️ {self.faits}/{self.total} prompts ({self.faits / self.total:.0%}) · "
+              f"{debit:.2f} prompts/s · ETA {formater_duree(eta)}")
+
+def formater_duree(secondes):
+    if secondes == float("inf"):
+        return "?"
+    minutes, secondes = divmod(int(secondes), 60)
+    heures, minutes = divmod(minutes, 60)
+    return f"{heures}h{minutes:02d}m{secondes:02d}s" if heures else f"{minutes}m{secondes:02d}s"
+
+def identifiant_run(prompts, **parametres):
+    """Empreinte des prompts et paramètres : un même run reprend les mêmes checkpoints"""
+    contenu = json.dumps({"prompts": list(prompts), **parametres}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(contenu.encode("utf-8")).hexdigest()[:16]
+
+def _ecrire_atomique(df, chemin):
+    temporaire = chemin + ".tmp"
+    df.to_pickle(temporaire)
+    os.replace(temporaire, chemin)
+
+async def executer_par_lots(bbuq, prompts, dossier_checkpoints="checkpoints", taille_lot=50,
+                            max_concurrence=2, num_responses=5, max_tentatives=3, delai_base=5.0,
+                            sur_lot=None, generer=None, parametres_run=None):
+    """
+    Exécute `bbuq.generate_and_score` sur tout le jeu de prompts, par lots.
+    - au plus `max_concurrence` lots en cours simultanément ;
+    - chaque lot terminé est sauvegardé sur disque, un run relancé reprend là où il s'était arrêté ;
+    - un lot en échec est réessayé avec backoff exponentiel (limites de débit, erreurs réseau).
+    `sur_lot(index, df)` est appelé pour chaque lot disponible (repris ou calculé), dans l'ordre de fin.
+    `generer(prompts)` remplace `bbuq.generate_and_score` (ex. génération avec cache) ;
+    `parametres_run` distingue les checkpoints de runs différents sur les mêmes prompts.
+    Retourne le DataFrame complet, dans l'ordre des prompts.
+    """
+    if max_tentatives < 1 or taille_lot < 1 or max_concurrence < 1:
+        raise ValueError("max_tentatives, taille_lot et max_concurrence doivent être ≥ 1")
+    prompts = list(prompts)
+    with span("uq.run", prompts=len(prompts), taille_lot=taille_lot, max_concurrence=max_concurrence) as trace:
+        return await _executer_par_lots(trace, bbuq, prompts, dossier_checkpoints, taille_lot, max_concurrence,
+                                        num_responses, max_tentatives, delai_base, sur_lot, generer, parametres_run)
+
+async def _executer_par_lots(trace, bbuq, prompts, dossier_checkpoints, taille_lot, max_concurrence,
+                             num_responses, max_tentatives, delai_base, sur_lot, generer, parametres_run):
+    scorers = getattr(bbuq, "scorers", None)
+    run_id = identifiant_run(prompts, taille_lot=taille_lot, num_responses=num_responses,
+                             scorers=sorted(map(str, scorers)) if scorers else None, **(parametres_run or {}))
+    dossier = os.path.join(dossier_checkpoints, run_id)
+    os.makedirs(dossier, exist_ok=True)
+    with open(os.path.join(dossier, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"prompts": len(prompts), "taille_lot": taille_lot, "num_responses": num_responses}, f)
+
+    lots = [prompts[i:i + taille_lot] for i in range(0, len(prompts), taille_lot)]
+    chemins = [os.path.join(dossier, f"lot_{k:05d}.pkl") for k in range(len(lots))]
+    termines = [k for k, chemin in enumerate(chemins) if os.path.exists(chemin)]
+    a_faire = sorted(set(range(len(lots))) - set(termines))
+    trace.set(run_id=run_id, lots=len(lots), lots_repris=len(termines))
+
+    print(f"📦 Run {run_id} : {len(lots)} lots de {taille_lot} prompts, "
+          f"{len(termines)} déjà terminés, {len(a_faire)} à exécuter")
+    progression = Progression(len(prompts), deja_faits=sum(len(lots[k]) for k in termines))
+    if sur_lot:
+        for k in termines:
+            sur_lot(k, pd.read_pickle(chemins[k]))
+
+    if generer is None:
+        async def generer(lot):
+            return await bbuq.generate_and_score(lot, num_responses=num_responses)
+
+    semaphore = asyncio.Semaphore(max_concurrence)
+
+    async def executer_lot(k):
+        async with semaphore:
+            with span("uq.lot", lot=k, prompts=len(lots[k])) as lot:
+                for tentative in range(1, max_tentatives + 1):
+                    lot.set(tentatives=tentative)
+                    try:
+                        resultats = await generer(lots[k])
+                        break
+                    except Exception as e:
+                        if tentative == max_tentatives:
+                            raise RuntimeError(f"Lot {k} en échec après {tentative} tentatives : {e}") from e
+                        delai = delai_base * 2 ** (tentative - 1) + random.uniform(0, delai_base)
+                        print(f"⚠️ Lot {k} : {e} → nouvel essai dans {delai:.0f} s")
+                        await asyncio.sleep(delai)
+        with span("uq.checkpoint", lot=k):
+            df = resultats.to_df()
+            _ecrire_atomique(df, chemins[k])
+        progression.avancer(len(lots[k]))
+        if sur_lot:
+            sur_lot(k, df)
+
+    issues = await asyncio.gather(*(executer_lot(k) for k in a_faire), return_exceptions=True)
+    echecs = [issue for issue in issues if isinstance(issue, Exception)]
+    if echecs:
+        for echec in echecs:
+            print(f"❌ {echec}")
+        raise RuntimeError(f"{len(echecs)} lot(s) en échec ; relancer le script reprendra depuis les checkpoints ({dossier})")
+
+    return pd.concat([pd.read_pickle(chemin) for chemin in chemins], ignore_index=True)
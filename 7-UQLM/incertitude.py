@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+# Métrique BlackBoxUQ (score de confiance) associée à chaque composante d'incertitude
+COMPOSANTES = {
+    'semantique': 'semantic_negentropy',
+    'correspondance_exacte': 'exact_match',
+    'cosinus': 'cosine_sim',
+    'contradiction': 'noncontradiction'
+}
+POIDS_DEFAUT = {'semantique': 1, 'correspondance_exacte': 1, 'cosinus': 1}
+
+def calculer_incertitude(row):
+    """
+    Calculer le score d'incertitude à partir des métriques BlackBoxUQ.
+    Une entropie_semantique plus faible = incertitude plus élevée
+    """
+    incertitude_semantique = 1 - row.get('semantic_negentropy', 0)
+    incertitude_correspondance_exacte = 1 - row.get('exact_match', 0)
+    incertitude_cosinus = 1 - row.get('cosine_sim', 0)
+    incertitude_contradiction = 1 - row.get('noncontradiction', 0)
+    
+    incertitude_primaire = incertitude_semantique
+    incertitude_combinee = (incertitude_semantique + incertitude_correspondance_exacte + incertitude_cosinus) / 3
+    
+    return incertitude_primaire, {
+        'semantique': incertitude_semantique,
+        'correspondance_exacte': incertitude_correspondance_exacte,
+        'cosinus': incertitude_cosinus,
+        'contradiction': incertitude_contradiction,
+        'combinee': incertitude_combinee
+    }
+
+def calculer_incertitude_colonnes(df, poids=None, primaire='semantique'):
+    """
+    Version vectorisée de `calculer_incertitude` : toutes les composantes sont
+    calculées par opérations sur les colonnes (une métrique absente vaut 0).
+    `poids` pondère les composantes de l'incertitude combinée (moyenne simple de
+    semantique, correspondance_exacte et cosinus par défaut).
+    Retourne un DataFrame aligné sur `df` : incertitude, composantes et combinee.
+    """
+    poids = POIDS_DEFAUT if poids is None else poids
+    if primaire not in COMPOSANTES:
+        raise ValueError(f"Composante primaire inconnue : {primaire}")
+    inconnues = set(poids) - set(COMPOSANTES)
+    if inconnues:
+        raise ValueError(f"Composantes inconnues dans les poids : {sorted(inconnues)}")
+    total = sum(poids.values())
+    if total <= 0:
+        raise ValueError("La somme des poids doit être strictement positive")
+
+    composantes = {}
+    for nom, metrique in COMPOSANTES.items():
+        if metrique in df.columns:
+            composantes[nom] = 1 - pd.to_numeric(df[metrique], errors='coerce').to_numpy(dtype=float)
+        else:
+            composantes[nom] = np.ones(len(df))
+
+    combinee = sum(composantes[nom] * p for nom, p in poids.items()) / total
+
+    return pd.DataFrame({
+        'incertitude': composantes[primaire],
+        **composantes,
+        'combinee': combinee
+    }, index=df.index)
@@ -0,0 +1,115 @@
+import ast
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+COLONNES_LISTES = ("sampled_responses",)
+
+def normaliser_echantillons(valeur):
+    """Liste de chaînes, y compris depuis une liste Python sérialisée par un ancien CSV"""
+    if valeur is None or (isinstance(valeur, float) and np.isnan(valeur)):
+        return []
+    if isinstance(valeur, str):
+        try:
+            valeur = ast.literal_eval(valeur)
+        except (ValueError, SyntaxError):
+            return [valeur]
+    return [str(v) for v in valeur]
+
+def vers_table(df, schema=None):
+    """DataFrame → table Arrow, `sampled_responses` en colonne list<string>"""
+    df = df.copy()
+    for colonne in COLONNES_LISTES:
+        if colonne in df.columns:
+            df[colonne] = df[colonne].map(normaliser_echantillons)
+    if schema is None:
+        champs = {c: pa.list_(pa.string()) for c in COLONNES_LISTES if c in df.columns}
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Colonne entièrement vide dans ce lot (ex. `justification_agent` sans cas limite) : type
+        # `null`, que les lots suivants ne pourraient pas remplir ; on la déclare en chaîne
+        champs.update({champ.name: pa.string() for champ in table.schema
+                       if pa.types.is_null(champ.type) and champ.name not in champs})
+        for nom, type_ in champs.items():
+            table = table.set_column(table.schema.get_field_index(nom), nom, table[nom].cast(type_))
+        return table
+    return pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+class EcrivainParquet:
+    """
+    Écriture incrémentale d'un fichier Parquet, un row group par lot.
+    Le schéma est fixé par le premier lot ; les lots suivants y sont convertis.
+    Si le bloc `with` lève une exception, le fichier temporaire est supprimé.
+    """
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.temporaire = chemin + ".tmp"
+        self.writer = None
+        self.lignes = 0
+
+    def ecrire(self, df):
+        if self.writer is None:
+            table = vers_table(df)
+            os.makedirs(os.path.dirname(os.path.abspath(self.chemin)), exist_ok=True)
+            self.writer = pq.ParquetWriter(self.temporaire, table.schema, compression="zstd")
+        else:
+            table = vers_table(df, self.writer.schema)
+        self.writer.write_table(table)
+        self.lignes += table.num_rows
+
+    def fermer(self):
+        """Finalise le fichier ; il n'apparaît sous son nom définitif qu'une fois complet"""
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(self.temporaire, self.chemin)
+            self.writer = None
+
+    def abandonner(self):
+        """Ferme et supprime le fichier temporaire, sans publier de fichier incomplet"""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if os.path.exists(self.temporaire):
+            os.remove(self.temporaire)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type_exc, *exc):
+        if type_exc is None:
+            self.fermer()
+        else:
+            self.abandonner()
+
+def ecrire_parquet(df, chemin, taille_lot=10_000):
+    """Écrit un DataFrame complet en Parquet, par tranches de `taille_lot` lignes"""
+    with EcrivainParquet(chemin) as ecrivain:
+        for debut in range(0, len(df), taille_lot):
+            ecrivain.ecrire(df.iloc[debut:debut + taille_lot])
+    return chemin
+
+def charger_resultats(chemin, colonnes=None):
+    """Recharge des résultats Parquet (lecture mappée en mémoire), `sampled_responses` restant des listes"""
+    return pq.read_table(chemin, columns=colonnes, memory_map=True).to_pandas()
+
+def exporter_csv(chemin_parquet, chemin_csv):
+    """Export CSV d'un fichier Parquet, row group par row group"""
+    fichier = pq.ParquetFile(chemin_parquet, memory_map=True)
+    writer = None
+    try:
+        for i in range(fichier.num_row_groups):
+            table = fichier.read_row_group(i)
+            for colonne in COLONNES_LISTES:
+                if colonne in table.column_names:
+                    valeurs = pa.array([str(v) for v in table[colonne].to_pylist()], pa.string())
+                    table = table.set_column(table.schema.get_field_index(colonne), colonne, valeurs)
+            if writer is None:
+                writer = pacsv.CSVWriter(chemin_csv, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return chemin_csv
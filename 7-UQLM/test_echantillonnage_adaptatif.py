@@ -0,0 +1,24 @@
+import pandas as pd
+import pytest
+
+from echantillonnage_adaptatif import ConfigAdaptative, borne_wilson, comparer_au_baseline
+
+def arret(accords, n, config=ConfigAdaptative()):
+    return borne_wilson(accords, n, config.z) >= config.seuil_accord
+
+def test_seuil_par_defaut_avec_marge():
+    config = ConfigAdaptative()
+    assert borne_wilson(3, 3, config.z) - config.seuil_accord >= 0.04
+    assert arret(3, 3) and arret(4, 4)
+    assert not arret(2, 3) and not arret(3, 4) and not arret(4, 5)
+
+def test_comparer_au_baseline_prompts_repetes():
+    adaptatif = pd.DataFrame({"prompt": ["a", "a", "b"], "exact_match": [1.0, 0.5, 0.0]})
+    fixe = pd.DataFrame({"prompt": ["a", "a", "b"], "exact_match": [1.0, 1.0, 0.0]})
+    comparaison = comparer_au_baseline(adaptatif, fixe, colonnes=("exact_match",))
+    assert comparaison.loc["exact_match", "ecart_max"] == 0.5
+    assert comparaison.loc["exact_match", "ecart_moyen"] == pytest.approx(0.5 / 3)
+
+def test_comparer_au_baseline_prompts_differents():
+    with pytest.raises(ValueError):
+        comparer_au_baseline(pd.DataFrame({"prompt": ["a", "b"]}), pd.DataFrame({"prompt": ["b", "a"]}))
@@ -1,11 +1,23 @@
 import streamlit as st
 import os
+import threading
 from legal_copilot import OCRService
+from common.tracing import streamlit_debug_panel
 
 st.set_page_config(page_title="Legal Copilot", layout="wide")
 st.title("⚖️ Legal Copilot - PDF OCR and Legal QA")
 
-ocr_service = OCRService()
+@st.cache_resource
+def get_ocr_service():
+    """One OCRService per process, shared by reruns and sessions (client, store, loaded indexes)"""
+    return OCRService()
+
+ocr_service = get_ocr_service()
+cancel_stream = st.session_state.setdefault("cancel_stream", threading.Event())
+
+def stop_answer(question):
+    cancel_stream.set()
+    st.session_state["stopped_question"] = question
 uploaded_file = st.file_uploader("📁 Upload a legal PDF file", type=["pdf"])
 ocr_performed = False
 
@@ -13,16 +25,33 @@ if uploaded_file:
     os.makedirs("pdf", exist_ok=True)
     file_path = f"pdf/{uploaded_file.name}"
     
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.read())
+    # Only write a new upload: rewriting on every rerun would change the mtime and force a rehash
+    upload_id = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+    written = st.session_state.setdefault("written_uploads", {})
+    if written.get(file_path) != upload_id or not os.path.exists(file_path):
+        with open(file_path, "wb") as f:
+            f.write(uploaded_file.getvalue())
+        written[file_path] = upload_id
     
+    keep_images = st.checkbox("🖼️ Keep page images", value=False)
     if st.button("🔍 Run OCR"):
-        ocr_service.ocr_pdf(file_path)
-        ocr_performed = True
+        try:
+            with st.spinner("Running OCR and indexing the document..."):
+                ocr_service.ocr_pdf(file_path, include_images=keep_images)
+            ocr_performed = True
+        except ValueError as e:
+            st.error(f"❌ {e}")
+
+ready_documents = ocr_service.store.documents()
+if ready_documents:
+    with st.sidebar:
+        st.markdown("### 📚 Documents ready for Q&A")
+        for meta in ready_documents:
+            st.markdown(f"- {meta['source']} ({meta['pages']} pages)")
 
 if uploaded_file and ocr_service.ocr_is_valid(file_path) and st.checkbox("📄 Show extracted OCR text"):
     try:
-        text = ocr_service.read_markdown_file("ocr_response.md")
+        text = ocr_service.read_document(file_path)
         st.markdown(text)
     except Exception:
         st.warning("Error reading OCR content.")
@@ -30,26 +59,52 @@ elif not uploaded_file:
     st.info("Upload a PDF file to enable OCR analysis.")
 
 st.markdown("### 📝 Document Summary")
+hierarchical = st.checkbox("🧩 Hierarchical summary (long documents)", value=True,
+                           help="Summarizes page sections concurrently, then combines them. Section summaries are cached and reused for questions.")
 if uploaded_file and ocr_service.ocr_is_valid(file_path) and st.button("📝 Generate Summary"):
-    text = ocr_service.read_markdown_file("ocr_response.md")
-    prompt = f"Summarize this legal document clearly and concisely:\n\n{text}"
+    cancel_stream.clear()
+    st.button("⏹️ Stop", key="stop_summary", on_click=cancel_stream.set)
     try:
-        summary = ocr_service.run_mistral(prompt)
+        if hierarchical:
+            progress = st.progress(0.0, text="Summarizing sections...")
+            summary_stream = ocr_service.summarizer.stream_summary(
+                ocr_service.doc_id(file_path),
+                on_section=lambda done, total: progress.progress(done / total, text=f"Summarizing sections... {done}/{total}"),
+                cancel_event=cancel_stream
+            )
+        else:
+            text = ocr_service.read_document(file_path)
+            prompt = f"Summarize this legal document clearly and concisely:\n\n{text}"
+            summary_stream = ocr_service.stream_mistral(prompt, cancel_event=cancel_stream)
         st.markdown("#### 🔍 Summary:")
-        st.markdown(summary)
+        st.write_stream(summary_stream)
     except Exception as e:
         st.error(f"Error during summarization: {e}")
+    finally:
+        if hierarchical:
+            progress.empty()
 
 st.markdown("### ❓ Ask a question about the document content")
 question = st.text_input("Your question:")
 
 if question:
-    if not os.path.exists("ocr_response.md") or not ocr_service.ocr_is_valid(file_path):
+    if not uploaded_file or not ocr_service.ocr_is_valid(file_path):
         st.error("❌ No valid OCR data found. Please run OCR first.")
     else:
-        try:
-            response = ocr_service.process_question(question, file_path)
-            st.markdown("### 🤖 Response")
-            st.markdown(response)
-        except Exception as e:
-            st.error(f"Error while processing: {e}")
\ No newline at end of file
+        st.markdown("### 🤖 Response")
+        if st.session_state.get("stopped_question") == question:
+            # The Stop click reruns the script: don't ask the same question again on this rerun,
+            # but forget the stop so that submitting it again asks it again
+            del st.session_state["stopped_question"]
+            st.info("⏹️ Generation stopped.")
+        else:
+            cancel_stream.clear()
+            st.button("⏹️ Stop", key="stop_answer", on_click=stop_answer, args=(question,))
+            try:
+                st.write_stream(ocr_service.stream_question(question, file_path, cancel_event=cancel_stream))
+            except Exception as e:
+                st.error(f"Error while processing: {e}")
+
+# 🐞 Per-stage breakdown (durations, sizes, tokens, cache hits) of the latest requests
+if st.sidebar.checkbox("🐞 Show debug traces"):
+    streamlit_debug_panel(title="🐞 Debug: traces of the latest requests")
@@ -0,0 +1,103 @@
+"""
+Benchmark of OCR ingestion on a large document, against a local fake Mistral client:
+the historical single request with base64 images vs page-batched streaming to the store
+
+Usage: python bench_ocr.py [pages] [page_batch]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+
+from legal_copilot import OCRService, OCR_PAGE_BATCH, OCR_MODEL
+from ocr_store import OCRStore
+
+PAGE_TEXT = "Article {n}. Le preneur s'engage à user paisiblement des lieux loués. " * 60
+IMAGE_BASE64 = "iVBORw0KGgo" + "A" * (300 * 1024 - 11)  # ~300 KB base64 payload per image
+
+class FakeMistral:
+    """Stand-in for the Mistral client: OCR latency grows with the number of pages requested"""
+
+    def __init__(self, page_count, images_per_page=2, latency=0.2, per_page=0.01):
+        self.page_count = page_count
+        self.images_per_page = images_per_page
+        self.latency = latency
+        self.per_page = per_page
+        self.requests = 0
+        self.files = SimpleNamespace(
+            upload=lambda file, purpose: SimpleNamespace(id="file-1"),
+            get_signed_url=lambda file_id: SimpleNamespace(url="https://fake/doc.pdf")
+        )
+        self.ocr = SimpleNamespace(process=self.process)
+
+    def page(self, n, include_image_base64):
+        images = [
+            SimpleNamespace(
+                id=f"img-{n}-{k}.jpeg",
+                # A fresh string per image, as a real response would carry
+                image_base64=IMAGE_BASE64[:-8] + f"{n:04d}{k:04d}" if include_image_base64 else None
+            )
+            for k in range(self.images_per_page)
+        ]
+        return SimpleNamespace(index=n, markdown=PAGE_TEXT.format(n=n), images=images)
+
+    def process(self, model, document, pages=None, include_image_base64=False):
+        pages = range(self.page_count) if pages is None else pages
+        self.requests += 1
+        time.sleep(self.latency + self.per_page * len(pages))
+        return SimpleNamespace(pages=[self.page(n, include_image_base64) for n in pages])
+
+def legacy_ocr(client, file_path, output_path):
+    """Historical `ocr_pdf`: whole document in one response, images included, joined in memory"""
+    signed_url = client.files.get_signed_url(file_id=client.files.upload(file=None, purpose="ocr").id)
+    ocr_response = client.ocr.process(
+        model=OCR_MODEL,
+        document={"type": "document_url", "document_url": signed_url.url},
+        include_image_base64=True
+    )
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("\n".join([page.markdown for page in ocr_response.pages]))
+
+def measure(func):
+    """Wall time (s) and peak traced memory (MB) of a call"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return duration, peak
+
+def main(page_count, page_batch):
+    workdir = tempfile.mkdtemp(prefix="bench_ocr_")
+    file_path = os.path.join(workdir, "contract.pdf")
+    with open(file_path, "wb") as f:
+        f.write(b"%PDF-1.7 fake " + str(page_count).encode())
+
+    service = OCRService()
+    service.store = OCRStore(os.path.join(workdir, "store"))
+    runs = [
+        ("legacy (1 request, images)", lambda: legacy_ocr(service.client, file_path, os.path.join(workdir, "ocr_response.md"))),
+        ("streamed, images to disk", lambda: service.ocr_to_store(file_path, include_images=True, page_batch=page_batch, page_count=page_count)),
+        ("streamed, markdown only", lambda: service.ocr_to_store(file_path, page_batch=page_batch, page_count=page_count)),
+    ]
+
+    print(f"{page_count} pages, batches of {page_batch}")
+    print(f"{'mode':<28} | {'requests':>8} | {'wall (s)':>8} | {'peak (MB)':>9}")
+    try:
+        for label, run in runs:
+            service.client = FakeMistral(page_count)
+            duration, peak = measure(run)
+            print(f"{label:<28} | {service.client.requests:>8} | {duration:>8.2f} | {peak:>9.1f}")
+        assert service.store.read_text(service.doc_id(file_path)).count("Article") == page_count * 60
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == "__main__":
+    page_count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    page_batch = int(sys.argv[2]) if len(sys.argv) > 2 else OCR_PAGE_BATCH
+    main(page_count, page_batch)
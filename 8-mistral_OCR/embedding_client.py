@@ -0,0 +1,108 @@
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared repo modules (common/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.llm_gateway import get_gateway, is_rate_limit_error, is_retryable, retry_after
+
+EMBED_MODEL = "mistral-embed"
+MAX_BATCH_TOKENS = 16000
+MAX_BATCH_SIZE = 128
+
+def estimate_tokens(text):
+    """Conservative token estimate (about 3 characters per token)"""
+    return len(text) // 3 + 1
+
+def pack_batches(texts, max_batch_tokens=MAX_BATCH_TOKENS, max_batch_size=MAX_BATCH_SIZE):
+    """Group consecutive texts into batches under the token and size limits, as lists of indices"""
+    batches, current, current_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > max_batch_tokens or len(current) >= max_batch_size):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+class AdaptiveThrottle:
+    """Shared delay between requests: doubled on each 429, halved on each success"""
+
+    def __init__(self, base_delay=1.0, max_delay=60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.delay = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if self.delay:
+            time.sleep(self.delay)
+
+    def on_success(self):
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay > self.base_delay else 0.0
+
+    def on_rate_limit(self, advertised=None):
+        with self._lock:
+            self.delay = min(self.max_delay, max(self.base_delay, self.delay * 2, advertised or 0.0))
+            return self.delay
+
+class BatchEmbedder:
+    """Embeds many texts with few requests: token-packed batches, sent a few at a time"""
+
+    def __init__(self, client, model=EMBED_MODEL, max_batch_tokens=MAX_BATCH_TOKENS,
+                 max_batch_size=MAX_BATCH_SIZE, max_workers=3, max_retries=6, base_delay=1.0, max_delay=60.0):
+        self.client = client
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.throttle = AdaptiveThrottle(base_delay, max_delay)
+        self.requests = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def _count(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def _embed_batch(self, inputs):
+        for attempt in range(1, self.max_retries + 2):
+            self.throttle.wait()
+            try:
+                self._count(requests=1)
+                # Same concurrency slots and rate bucket as the Mistral chat calls
+                with get_gateway().limited("mistral"):
+                    response = self.client.embeddings.create(model=self.model, inputs=inputs)
+            except Exception as e:
+                if attempt > self.max_retries or not is_retryable(e):
+                    raise
+                if is_rate_limit_error(e):
+                    self._count(rate_limited=1)
+                    self.throttle.on_rate_limit(retry_after(e))
+                else:
+                    time.sleep(self.throttle.base_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+                continue
+            self.throttle.on_success()
+            data = sorted(response.data, key=lambda item: getattr(item, "index", 0) or 0)
+            return [item.embedding for item in data]
+
+    def embed(self, texts):
+        """Return one embedding per text, in input order"""
+        texts = list(texts)
+        batches = pack_batches(texts, self.max_batch_tokens, self.max_batch_size)
+        embeddings = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            results = executor.map(lambda batch: self._embed_batch([texts[i] for i in batch]), batches)
+            for batch, vectors in zip(batches, results):
+                for i, vector in zip(batch, vectors):
+                    embeddings[i] = vector
+        return embeddings
@@ -1,102 +1,271 @@
 
 import os
-from dotenv import load_dotenv
+import sys
+import json
 import time
+import hashlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from dotenv import load_dotenv
 import faiss
 import numpy as np
 import chardet
 from mistralai import Mistral
-import os
+from pypdf import PdfReader
+from embedding_client import BatchEmbedder, estimate_tokens
+from ocr_store import OCRStore
+from summarizer import Summarizer
+
+# Shared repo modules (common/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.llm_gateway import get_gateway
+from common.tracing import bind, span
 
 load_dotenv()
 
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
+MISTRAL_SERVER_URL = os.getenv("MISTRAL_SERVER_URL")  # e.g. a local stand-in server
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+CHUNK_SIZE = 2048
+CHARDET_SAMPLE_SIZE = 64 * 1024
+OCR_MODEL = "mistral-ocr-latest"
+OCR_PAGE_BATCH = int(os.getenv("OCR_PAGE_BATCH", "16"))  # pages per OCR request
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))  # OCR requests in flight
+DOC_ID_MEMO_SIZE = 256  # (path, size, mtime) -> content hash entries kept
+
+def document_hash(file_path):
+    """SHA-256 of the PDF content, used to key persisted artefacts"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def pdf_page_count(file_path):
+    return len(PdfReader(file_path).pages)
+
 class OCRService:
     def __init__(self):
-        self.client = Mistral(api_key=MISTRAL_API_KEY)
-    
-    def ocr_pdf(self, file_path):
-        uploaded_pdf = self.client.files.upload(
-            file={
-                "file_name": file_path.split("/")[-1],
-                "content": open(file_path, "rb"),
-            },
-            purpose="ocr"
-        )
-        
-        signed_url = self.client.files.get_signed_url(file_id=uploaded_pdf.id)
-        
-        ocr_response = self.client.ocr.process(
-            model="mistral-ocr-latest",
-            document={
-                "type": "document_url",
-                "document_url": signed_url.url,
-            },
-            include_image_base64=True
-        )
-        
-        with open("ocr_response.md", "w", encoding="utf-8") as f:
-            f.write("\n".join([page.markdown for page in ocr_response.pages]))
-        
-        with open("ocr_meta.txt", "w") as meta:
-            meta.write(file_path)
+        self.client = Mistral(api_key=MISTRAL_API_KEY, server_url=MISTRAL_SERVER_URL)
+        self.embedder = BatchEmbedder(self.client)
+        self.store = OCRStore()
+        self.summarizer = Summarizer(self)
+        self._indexes = {}
+        self._doc_ids = OrderedDict()
+    
+    def doc_id(self, file_path):
+        """Content hash of the PDF, memoized on (path, size, mtime) to avoid rehashing on every rerun"""
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        if key in self._doc_ids:
+            self._doc_ids.move_to_end(key)
+        else:
+            self._doc_ids[key] = document_hash(file_path)
+            while len(self._doc_ids) > DOC_ID_MEMO_SIZE:
+                self._doc_ids.popitem(last=False)
+        return self._doc_ids[key]
+    
+    def ocr_pdf(self, file_path, include_images=False, page_batch=OCR_PAGE_BATCH):
+        with span("ocr.document", source=os.path.basename(file_path)):
+            self.ocr_to_store(file_path, include_images=include_images, page_batch=page_batch)
+            self.build_index(file_path)
+    
+    def ocr_to_store(self, file_path, include_images=False, page_batch=OCR_PAGE_BATCH, page_count=None):
+        """OCR the PDF in page batches, writing each page's markdown to the store as it arrives"""
+        doc_id = self.doc_id(file_path)
+        with span("ocr", page_batch=page_batch, include_images=include_images) as trace:
+            with span("ocr.upload", bytes=os.path.getsize(file_path)), open(file_path, "rb") as pdf:
+                uploaded_pdf = self.client.files.upload(
+                    file={
+                        "file_name": os.path.basename(file_path),
+                        "content": pdf,
+                    },
+                    purpose="ocr"
+                )
+                signed_url = self.client.files.get_signed_url(file_id=uploaded_pdf.id)
+            
+            if page_count is None:
+                page_count = pdf_page_count(file_path)
+            pages = self.iter_ocr_pages(signed_url.url, page_count, page_batch, doc_id if include_images else None)
+            meta = self.store.save_pages(doc_id, pages, os.path.basename(file_path))
+            trace.set(pages=meta["pages"])
+        self._indexes.pop(doc_id, None)
+        return meta
+    
+    def ocr_batch(self, document_url, pages, include_images=False):
+        with span("ocr.batch", pages=len(pages)) as trace:
+            response = self.client.ocr.process(
+                model=OCR_MODEL,
+                document={
+                    "type": "document_url",
+                    "document_url": document_url,
+                },
+                pages=pages,
+                include_image_base64=include_images
+            )
+            trace.set(markdown_chars=sum(len(page.markdown or "") for page in response.pages))
+            return response
+    
+    def iter_ocr_pages(self, document_url, page_count, page_batch=OCR_PAGE_BATCH, image_doc_id=None, max_workers=OCR_WORKERS):
+        """
+        Yield page markdown in order, batch by batch. Up to `max_workers` batches are in
+        flight at once, so at most that many responses are held in memory.
+        Images are only requested (and written to the store) when `image_doc_id` is given.
+        """
+        include_images = image_doc_id is not None
+        ocr_batch = bind(self.ocr_batch)
+        batches = iter([list(range(start, min(start + page_batch, page_count)))
+                        for start in range(0, page_count, page_batch)])
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            pending = deque(executor.submit(ocr_batch, document_url, pages, include_images)
+                            for pages in islice(batches, max(1, max_workers)))
+            while pending:
+                ocr_response = pending.popleft().result()
+                for pages in islice(batches, 1):
+                    pending.append(executor.submit(ocr_batch, document_url, pages, include_images))
+                for page in ocr_response.pages:
+                    if include_images:
+                        for image in page.images or []:
+                            if image.image_base64:
+                                self.store.save_image(image_doc_id, image.id, image.image_base64)
+                    yield page.markdown
+                del ocr_response
+    
+    def read_document(self, file_path):
+        """OCR markdown of a document from the store (pages joined)"""
+        return self.store.read_text(self.doc_id(file_path))
     
     def read_markdown_file(self, path):
+        """Read a markdown file of unknown encoding: UTF-8 first, chardet on a sample as fallback"""
         with open(path, 'rb') as f:
             raw_data = f.read()
-            result = chardet.detect(raw_data)
-            encoding = result['encoding']
-        return raw_data.decode(encoding, errors='replace')
+        try:
+            return raw_data.decode("utf-8")
+        except UnicodeDecodeError:
+            encoding = chardet.detect(raw_data[:CHARDET_SAMPLE_SIZE])['encoding'] or "utf-8"
+            return raw_data.decode(encoding, errors='replace')
     
     def get_text_embedding(self, input):
-        embeddings_batch_response = self.client.embeddings.create(
-            model="mistral-embed",
-            inputs=input
-        )
-        return embeddings_batch_response.data[0].embedding
+        """Embed a single text (same retry and 429 backoff as batch embedding)"""
+        return self.get_text_embeddings([input])[0]
+    
+    def get_text_embeddings(self, inputs):
+        """Embed many texts in token-packed batches, with 429-driven backoff"""
+        inputs = list(inputs)
+        with span("embed", texts=len(inputs), chars=sum(len(text) for text in inputs),
+                  estimated_tokens=sum(estimate_tokens(text) for text in inputs)) as trace:
+            requests, rate_limited = self.embedder.requests, self.embedder.rate_limited
+            embeddings = self.embedder.embed(inputs)
+            # Cumulative counters of the shared embedder: approximate if other embeddings run concurrently
+            trace.set(requests=self.embedder.requests - requests, rate_limited=self.embedder.rate_limited - rate_limited)
+            return embeddings
     
-    def run_mistral(self, user_message, model="mistral-large-latest"):
+    def run_mistral(self, user_message, model="mistral-large-latest", max_retries=None):
         messages = [{"role": "user", "content": user_message}]
-        chat_response = self.client.chat.complete(model=model, messages=messages)
-        return chat_response.choices[0].message.content
+        return get_gateway().chat_mistral(self.client, model, messages, max_retries=max_retries)
+    
+    def stream_mistral(self, user_message, model="mistral-large-latest", cancel_event=None, parent=None):
+        """
+        Yield the answer text as it is generated. Streaming stops when `cancel_event` is set
+        or when the consumer closes the generator; either way the HTTP stream is closed.
+        The stream is traced as an "llm.stream" span, attached to `parent` when given.
+        """
+        messages = [{"role": "user", "content": user_message}]
+        with span("llm.stream", activate=False, parent=parent, provider="mistral", model=model,
+                  prompt_chars=len(user_message)) as trace:
+            start, chars = time.perf_counter(), 0
+            try:
+                with get_gateway().limited("mistral"), self.client.chat.stream(model=model, messages=messages) as stream:
+                    for event in stream:
+                        if cancel_event is not None and cancel_event.is_set():
+                            trace.set(cancelled=True)
+                            return
+                        content = event.data.choices[0].delta.content if event.data.choices else None
+                        if content:
+                            if not chars:
+                                trace.set(first_token_ms=round((time.perf_counter() - start) * 1000, 1))
+                            chars += len(content)
+                            yield content
+            finally:
+                trace.set(response_chars=chars)
     
     def ocr_is_valid(self, file_path):
-        if not os.path.exists("ocr_meta.txt"):
-            return False
-        with open("ocr_meta.txt", "r") as meta:
-            last_file = meta.read().strip()
-        return file_path == last_file
+        return os.path.exists(file_path) and self.store.has(self.doc_id(file_path))
     
-    def process_question(self, question, file_path):
-        text = self.read_markdown_file("ocr_response.md")
-        chunk_size = 2048
-        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    def build_index(self, file_path):
+        """Embed the OCR chunks once and persist the FAISS index next to the document's pages"""
+        doc_id = self.doc_id(file_path)
+        with span("index.build") as trace:
+            text = self.store.read_text(doc_id)
+            chunks = [text[i:i + CHUNK_SIZE] for i in range(0, len(text), CHUNK_SIZE)]
+            trace.set(text_chars=len(text), chunks=len(chunks))
+            if not text.strip():
+                raise ValueError("OCR returned no text for this document: nothing to index "
+                                 "(blank or image-only pages?)")
+            
+            text_embeddings = np.array(self.get_text_embeddings(chunks), dtype="float32")
+            index = faiss.IndexFlatL2(text_embeddings.shape[1])
+            index.add(text_embeddings)
+            
+            with span("index.write"):
+                index_path = self.store.index_dir(doc_id)
+                os.makedirs(index_path, exist_ok=True)
+                faiss.write_index(index, os.path.join(index_path, "index.faiss"))
+                with open(os.path.join(index_path, "chunks.json"), "w", encoding="utf-8") as f:
+                    json.dump(chunks, f, ensure_ascii=False)
         
-        text_embeddings = []
-        for chunk in chunks:
-            embedding = self.get_text_embedding(chunk)
-            text_embeddings.append(embedding)
-            time.sleep(2)
-        
-        text_embeddings = np.array(text_embeddings)
-        question_embedding = np.array([self.get_text_embedding(question)])
+        self._indexes[doc_id] = (index, chunks)
+        return index, chunks
+    
+    def load_index(self, file_path):
+        """Return the document's (index, chunks) from memory, disk, or build it if missing"""
+        doc_id = self.doc_id(file_path)
+        if doc_id not in self._indexes:
+            index_path = self.store.index_dir(doc_id)
+            if not os.path.exists(os.path.join(index_path, "index.faiss")):
+                return self.build_index(file_path)
+            with span("index.load") as trace:
+                index = faiss.read_index(os.path.join(index_path, "index.faiss"))
+                with open(os.path.join(index_path, "chunks.json"), encoding="utf-8") as f:
+                    chunks = json.load(f)
+                trace.set(chunks=len(chunks))
+            self._indexes[doc_id] = (index, chunks)
+        return self._indexes[doc_id]
+    
+    def build_question_prompt(self, question, file_path):
+        index, chunks = self.load_index(file_path)
+        question_embedding = np.array([self.get_text_embedding(question)], dtype="float32")
         
-        d = text_embeddings.shape[1]
-        index = faiss.IndexFlatL2(d)
-        index.add(text_embeddings)
+        with span("vector.search", k=min(2, len(chunks)), chunks=len(chunks)) as trace:
+            D, I = index.search(question_embedding, k=min(2, len(chunks)))
+            retrieved_chunk = [chunks[i] for i in I.tolist()[0]]
+            trace.set(context_chars=sum(len(chunk) for chunk in retrieved_chunk))
         
-        D, I = index.search(question_embedding, k=2)
-        retrieved_chunk = [chunks[i] for i in I.tolist()[0]]
+        # Section summaries from an earlier map-reduce summary, if any: extra context at no LLM cost
+        section_context = self.summarizer.context_for(self.doc_id(file_path), [i * CHUNK_SIZE for i in I.tolist()[0]])
+        overview = ""
+        if section_context:
+            overview = "Summaries of the surrounding sections:\n" + "\n".join(section_context) + "\n-------------------"
         
-        prompt = f"""
+        return f"""
 Context information is below.
 -------------------
 {retrieved_chunk}
 -------------------
+{overview}
 Given the context information and not prior knowledge, answer the query.
 Query: {question}
 Answer:
 """
-        
-        return self.run_mistral(prompt)
\ No newline at end of file
+    
+    def process_question(self, question, file_path):
+        with span("question", question_chars=len(question)):
+            return self.run_mistral(self.build_question_prompt(question, file_path))
+    
+    def stream_question(self, question, file_path, cancel_event=None):
+        """Like `process_question`, yielding the answer incrementally"""
+        with span("question", question_chars=len(question), streamed=True) as trace:
+            prompt = self.build_question_prompt(question, file_path)
+        return self.stream_mistral(prompt, cancel_event=cancel_event, parent=trace)
\ No newline at end of file
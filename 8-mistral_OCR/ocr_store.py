@@ -0,0 +1,114 @@
+import base64
+import json
+import os
+import shutil
+import time
+
+STORE_DIR = "ocr_store"
+ENCODING = "utf-8"
+
+class OCRStore:
+    """Per-document OCR results, keyed by PDF content hash
+
+    Layout: <root>/<doc_id>/pages/00001.md ..., optional images/ and meta.json. Pages are always
+    written in UTF-8 and meta.json is written last, so a document is only
+    considered ready once all of its pages are on disk. Artefacts derived from the
+    pages (index/, <name>.json summaries) are dropped whenever the pages are rewritten.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+
+    def doc_dir(self, doc_id):
+        return os.path.join(self.root, doc_id)
+
+    def pages_dir(self, doc_id):
+        return os.path.join(self.doc_dir(doc_id), "pages")
+
+    def images_dir(self, doc_id):
+        return os.path.join(self.doc_dir(doc_id), "images")
+
+    def index_dir(self, doc_id):
+        return os.path.join(self.doc_dir(doc_id), "index")
+
+    def page_path(self, doc_id, page_number):
+        return os.path.join(self.pages_dir(doc_id), f"{page_number:05d}.md")
+
+    def has(self, doc_id):
+        return os.path.exists(os.path.join(self.doc_dir(doc_id), "meta.json"))
+
+    def meta(self, doc_id):
+        with open(os.path.join(self.doc_dir(doc_id), "meta.json"), encoding=ENCODING) as f:
+            return json.load(f)
+
+    def documents(self):
+        """Metadata of every document ready for Q&A"""
+        if not os.path.isdir(self.root):
+            return []
+        return [self.meta(doc_id) for doc_id in sorted(os.listdir(self.root)) if self.has(doc_id)]
+
+    def save_pages(self, doc_id, pages, source_name):
+        """Write pages (an iterable of markdown strings) one by one, then the metadata"""
+        meta_path = os.path.join(self.doc_dir(doc_id), "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for stale_dir in (self.pages_dir(doc_id), self.images_dir(doc_id), self.index_dir(doc_id)):
+            if os.path.isdir(stale_dir):
+                shutil.rmtree(stale_dir)
+        os.makedirs(self.pages_dir(doc_id))
+        # Derived JSON artefacts (section and document summaries) describe the old pages
+        for name in os.listdir(self.doc_dir(doc_id)):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.doc_dir(doc_id), name))
+
+        page_count = 0
+        for page_count, markdown in enumerate(pages, 1):
+            with open(self.page_path(doc_id, page_count), "w", encoding=ENCODING) as f:
+                f.write(markdown)
+
+        meta = {
+            "doc_id": doc_id,
+            "source": source_name,
+            "pages": page_count,
+            "encoding": ENCODING,
+            "created_at": time.time()
+        }
+        with open(meta_path + ".tmp", "w", encoding=ENCODING) as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + ".tmp", meta_path)
+        return meta
+
+    def save_image(self, doc_id, image_id, image_base64):
+        """Decode an OCR image payload (raw or data-URI base64) to images/<image_id>"""
+        if image_base64.startswith("data:"):
+            image_base64 = image_base64.split(",", 1)[1]
+        os.makedirs(self.images_dir(doc_id), exist_ok=True)
+        path = os.path.join(self.images_dir(doc_id), os.path.basename(image_id))
+        with open(path, "wb") as f:
+            f.write(base64.b64decode(image_base64))
+        return path
+
+    def read_json(self, doc_id, name):
+        """Derived artefact <doc>/<name>.json, or None if absent"""
+        path = os.path.join(self.doc_dir(doc_id), f"{name}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding=ENCODING) as f:
+            return json.load(f)
+
+    def write_json(self, doc_id, name, data):
+        path = os.path.join(self.doc_dir(doc_id), f"{name}.json")
+        with open(path + ".tmp", "w", encoding=ENCODING) as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def read_pages(self, doc_id):
+        meta = self.meta(doc_id)
+        pages = []
+        for page_number in range(1, meta["pages"] + 1):
+            with open(self.page_path(doc_id, page_number), encoding=meta["encoding"]) as f:
+                pages.append(f.read())
+        return pages
+
+    def read_text(self, doc_id):
+        return "\n".join(self.read_pages(doc_id))
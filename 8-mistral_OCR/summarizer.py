@@ -0,0 +1,209 @@
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Shared repo modules (common/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.llm_gateway import is_retryable, retry_after
+from common.tracing import bind, span
+
+SUMMARY_PROMPT_VERSION = "1"
+SECTION_CHARS = 24000  # page text per map call
+REDUCE_CHARS = 24000  # section summaries per reduce call
+
+MAP_PROMPT = """You are summarizing one section (pages {first}-{last}) of a longer legal document.
+List the parties, obligations, amounts, dates, deadlines and conditions it contains, citing article numbers when present.
+Be concise and factual.
+
+{text}"""
+
+REDUCE_PROMPT = """Below are summaries of consecutive sections of a legal document.
+Summarize this legal document clearly and concisely, keeping the key parties, obligations, amounts and dates.
+
+{text}"""
+
+def split_sections(pages, section_chars=SECTION_CHARS):
+    """
+    Group consecutive pages into sections of at most `section_chars` characters (a longer
+    page is a section on its own). Offsets refer to the pages joined with newlines, as
+    returned by `OCRStore.read_text`.
+    """
+    sections, current, size, offset = [], [], 0, 0
+    for number, page in enumerate(pages, 1):
+        if current and size + len(page) > section_chars:
+            sections.append(current)
+            current, size = [], 0
+        current.append((number, offset, page))
+        size += len(page) + 1
+        offset += len(page) + 1
+    if current:
+        sections.append(current)
+    return [
+        {
+            "first_page": section[0][0],
+            "last_page": section[-1][0],
+            "start": section[0][1],
+            "end": section[-1][1] + len(section[-1][2]),
+            "text": "\n".join(page for _, _, page in section)
+        }
+        for section in sections
+    ]
+
+def group_texts(texts, max_chars=REDUCE_CHARS):
+    groups, current, size = [], [], 0
+    for text in texts:
+        if current and size + len(text) > max_chars:
+            groups.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += len(text)
+    if current:
+        groups.append(current)
+    return groups
+
+class Summarizer:
+    """
+    Map-reduce summaries of OCR'd documents: page sections are summarized concurrently,
+    then the section summaries are reduced (recursively if needed) into one summary.
+    Section summaries and the final summary are cached in the document's store folder.
+    """
+
+    def __init__(self, service, model="mistral-large-latest", section_chars=SECTION_CHARS,
+                 reduce_chars=REDUCE_CHARS, max_workers=4, max_retries=3, base_delay=2.0):
+        self.service = service
+        self.store = service.store
+        self.model = model
+        self.section_chars = section_chars
+        self.reduce_chars = reduce_chars
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._lock = threading.Lock()
+
+    def cache_key(self, doc_id):
+        """Cached summaries are only reused for the same OCR run, prompts, model and section size"""
+        return [doc_id, self.store.meta(doc_id)["created_at"], SUMMARY_PROMPT_VERSION, self.model, self.section_chars]
+
+    def _complete(self, prompt):
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                # Retries are handled by this loop only: the gateway is asked not to retry as well
+                return self.service.run_mistral(prompt, model=self.model, max_retries=0)
+            except Exception as e:
+                if attempt > self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.base_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                time.sleep(max(retry_after(e) or 0, delay))
+
+    def cached_sections(self, doc_id):
+        """Section summaries already computed for this document (no LLM call), possibly partial"""
+        cached = self.store.read_json(doc_id, "sections")
+        if not cached or cached["key"] != self.cache_key(doc_id):
+            return []
+        return [section for section in cached["sections"] if section.get("summary")]
+
+    def section_summaries(self, doc_id, on_section=None):
+        """
+        Summaries of every section, computing only the missing ones, `max_workers` at a time.
+        Progress is saved as sections complete, so an interrupted run resumes where it stopped.
+        `on_section(done, total)` is called after each section.
+        """
+        key = self.cache_key(doc_id)
+        sections = split_sections(self.store.read_pages(doc_id), self.section_chars)
+        done = {(s["first_page"], s["last_page"]): s["summary"] for s in self.cached_sections(doc_id)}
+        results = [{k: v for k, v in s.items() if k != "text"} for s in sections]
+        for result in results:
+            result["summary"] = done.get((result["first_page"], result["last_page"]))
+
+        def save():
+            with self._lock:
+                self.store.write_json(doc_id, "sections", {"key": key, "sections": results})
+
+        missing = [i for i, result in enumerate(results) if result["summary"] is None]
+        completed = len(results) - len(missing)
+        if on_section:
+            on_section(completed, len(results))
+        with span("summary.map", sections=len(results), cached=completed), \
+                ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            complete = bind(self._complete)
+            futures = {
+                executor.submit(complete, MAP_PROMPT.format(
+                    first=sections[i]["first_page"], last=sections[i]["last_page"], text=sections[i]["text"]
+                )): i
+                for i in missing
+            }
+            for future in as_completed(futures):
+                results[futures[future]]["summary"] = future.result()
+                completed += 1
+                save()
+                if on_section:
+                    on_section(completed, len(results))
+        return results
+
+    def final_prompt(self, doc_id, on_section=None):
+        """Prompt producing the final summary: the whole text if short, else the (reduced) section summaries"""
+        text = self.store.read_text(doc_id)
+        if len(text) <= self.section_chars:
+            return f"Summarize this legal document clearly and concisely:\n\n{text}"
+
+        sections = self.section_summaries(doc_id, on_section)
+        texts = [f"Pages {s['first_page']}-{s['last_page']}:\n{s['summary']}" for s in sections]
+        while len(texts) > 1 and sum(len(t) for t in texts) > self.reduce_chars:
+            groups = group_texts(texts, self.reduce_chars)
+            if len(groups) == len(texts):
+                break
+            with span("summary.reduce", inputs=len(texts), groups=len(groups)), \
+                    ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+                complete = bind(self._complete)
+                texts = list(executor.map(lambda group: complete(REDUCE_PROMPT.format(text="\n\n".join(group))), groups))
+        return REDUCE_PROMPT.format(text="\n\n".join(texts))
+
+    def cached_summary(self, doc_id):
+        cached = self.store.read_json(doc_id, "summary")
+        if cached and cached["key"] == self.cache_key(doc_id):
+            return cached["summary"]
+        return None
+
+    def summarize(self, doc_id, on_section=None):
+        """Final summary of the document, from cache if this exact summary was already produced"""
+        with span("summary", cache_hit=False) as trace:
+            summary = self.cached_summary(doc_id)
+            if summary is None:
+                summary = self._complete(self.final_prompt(doc_id, on_section))
+                self.store.write_json(doc_id, "summary", {"key": self.cache_key(doc_id), "summary": summary})
+            else:
+                trace.set(cache_hit=True)
+        return summary
+
+    def stream_summary(self, doc_id, on_section=None, cancel_event=None):
+        """
+        Like `summarize`, but the final step is streamed: section summaries are computed
+        first, then the summary text is yielded as it is generated. Only a summary
+        streamed to completion is cached.
+        """
+        with span("summary", cache_hit=False, streamed=True) as trace:
+            summary = self.cached_summary(doc_id)
+            if summary is None:
+                prompt = self.final_prompt(doc_id, on_section)
+            else:
+                trace.set(cache_hit=True)
+        if summary is not None:
+            yield summary
+            return
+        parts = []
+        for part in self.service.stream_mistral(prompt, model=self.model, cancel_event=cancel_event, parent=trace):
+            parts.append(part)
+            yield part
+        if cancel_event is None or not cancel_event.is_set():
+            self.store.write_json(doc_id, "summary", {"key": self.cache_key(doc_id), "summary": "".join(parts)})
+
+    def context_for(self, doc_id, offsets):
+        """Cached summaries of the sections containing the given character offsets, in document order"""
+        return [
+            f"Pages {s['first_page']}-{s['last_page']}: {s['summary']}"
+            for s in self.cached_sections(doc_id)
+            if any(s["start"] <= offset <= s["end"] for offset in offsets)
+        ]
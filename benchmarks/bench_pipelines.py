@@ -0,0 +1,348 @@
+"""
+Benchmark hors ligne des pipelines de bout en bout, sur les vrais chemins de code des
+applications, avec des substituts locaux de chaque service (voir `standins.py`).
+Rapporte en JSON, par scénario : débit, latences p50/p95/p99 et pic mémoire (tracemalloc,
+mesuré dans une seconde passe pour ne pas fausser les latences).
+
+Usage : python benchmarks/bench_pipelines.py [--only SCENARIO ...] [--iterations N] [--concurrency C]
+                                             [--latency-ms MS] [--rate-limit RPS]
+                                             [--output resultats.json] [--compare reference.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FOLDERS = ["2-assembyai", "3-Graphiti", "4-FireCrawl_PDFparsing", "5-FireCrawl_Scrape", "7-UQLM", "8-mistral_OCR"]
+sys.path[:0] = [ROOT, os.path.dirname(os.path.abspath(__file__))] + [os.path.join(ROOT, f) for f in APP_FOLDERS]
+
+# Les modules vérifient leurs clés au chargement ; les substituts n'en ont pas besoin
+for variable in ("OPENAI_API_KEY", "MISTRAL_API_KEY", "FIRECRAWL_API_KEY", "ASSEMBLY_API_KEY",
+                 "AIRTABLE_API_KEY", "AIRTABLE_BASE_ID", "AIRTABLE_TABLE_ID", "NEO4J_PASSWORD"):
+    os.environ.setdefault(variable, "standin")
+
+from standins import (AirtableStandIn, FakeAssemblyAI, FakeBlackBoxUQ, FakeFirecrawl,
+                      FakeMistral, FakeNeo4jDriver, FakeOpenAI)
+
+def percentile(sorted_values, q):
+    """Percentile par rang le plus proche, sur des valeurs triées"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q * len(sorted_values) / 100))
+    return sorted_values[rank - 1]
+
+def run_ops(op, indices, concurrency, is_async):
+    """Exécute `op(i)` pour chaque indice (au plus `concurrency` à la fois) ; retourne latences, erreurs et durée"""
+    latencies, errors = [], []
+
+    def timed(i):
+        start = time.perf_counter()
+        try:
+            op(i)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        latencies.append(time.perf_counter() - start)
+
+    async def atimed(i, semaphore):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await op(i)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+            latencies.append(time.perf_counter() - start)
+
+    async def arun():
+        semaphore = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(atimed(i, semaphore) for i in indices))
+
+    start = time.perf_counter()
+    if is_async:
+        asyncio.run(arun())
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed, indices))
+    return latencies, errors, time.perf_counter() - start
+
+class Scenario:
+    """Un pipeline mesuré : `setup(config)` prépare l'état et retourne `(op, services, teardown)`"""
+
+    def __init__(self, name, description, setup, is_async=False, iterations=None):
+        self.name = name
+        self.description = description
+        self.setup = setup
+        self.is_async = is_async
+        self.iterations = iterations
+
+    def run(self, config):
+        iterations = self.iterations or config.iterations
+        try:
+            op, services, teardown = self.setup(config)
+        except ImportError as e:
+            return {"description": self.description, "skipped": f"dépendance manquante : {e}"}
+        except Exception as e:
+            return {"description": self.description, "setup_error": f"{type(e).__name__}: {e}"}
+        try:
+            latencies, errors, wall = run_ops(op, range(iterations), config.concurrency, self.is_async)
+            # Seconde passe, sur d'autres entrées (pas de cache chaud), pour le pic mémoire
+            tracemalloc.start()
+            run_ops(op, range(iterations, 2 * iterations), config.concurrency, self.is_async)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        finally:
+            if teardown:
+                teardown()
+
+        latencies.sort()
+        return {
+            "description": self.description,
+            "operations": iterations,
+            "errors": len(errors),
+            "first_error": errors[0] if errors else None,
+            "wall_s": round(wall, 4),
+            "throughput_ops_s": round(iterations / wall, 2) if wall else None,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50) * 1000, 2),
+                "p95": round(percentile(latencies, 95) * 1000, 2),
+                "p99": round(percentile(latencies, 99) * 1000, 2),
+                "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2),
+            },
+            "peak_memory_mb": round(peak / 1e6, 2),
+            "services": {service.name: service.stats() for service in services},
+        }
+
+def standin_kwargs(config, seed=0):
+    return {"latency": config.latency_ms / 1000, "jitter": config.jitter_ms / 1000,
+            "rate_limit": config.rate_limit, "seed": seed}
+
+def reset_gateway(config):
+    """Passerelle LLM neuve (cache vide), limitée comme les substituts"""
+    from common.llm_gateway import LLMGateway, ProviderLimits
+    import common.llm_gateway as llm_gateway
+    rps = config.rate_limit or 1e6
+    limits = ProviderLimits(max_concurrency=config.concurrency, requests_per_second=rps, burst=max(1, int(min(rps, 1e3))))
+    llm_gateway._gateway = LLMGateway(limits={"openai": limits, "mistral": limits}, base_delay=0.05)
+    return llm_gateway._gateway
+
+# 📄 Scénarios
+def setup_pdf_extract(config):
+    import pdf_analyzer
+    firecrawl = FakeFirecrawl(**standin_kwargs(config))
+    pdf_analyzer._firecrawl = firecrawl
+
+    def op(i):
+        text, error = pdf_analyzer.extract_pdf_content(f"https://standin.example/rapport-{i}.pdf")
+        if error:
+            raise RuntimeError(error)
+    return op, [firecrawl], None
+
+def setup_scrape_parse(config):
+    import scraping
+    firecrawl = FakeFirecrawl(**standin_kwargs(config))
+    scraping._firecrawl = firecrawl
+
+    def op(i):
+        if not scraping.scrape_and_parse(f"https://standin.example/annonces?page={i}"):
+            raise RuntimeError("aucune annonce extraite")
+    return op, [firecrawl], None
+
+def setup_airtable_upsert(config):
+    import scraping
+    from airtable import AirtableWriter
+    from standins import listing_page_html
+    from bs4 import BeautifulSoup
+    from parsing import simple_parse
+    airtable = AirtableStandIn(**standin_kwargs(config))
+    scraping._airtable_writer = AirtableWriter("standin", "base", "table", api_url=airtable.url,
+                                               requests_per_second=0, base_delay=0.05, pool_size=config.concurrency)
+    pages = {}
+
+    def op(i):
+        if i not in pages:
+            pages[i] = simple_parse(BeautifulSoup(listing_page_html(i), "html.parser").get_text())
+        result = scraping.save_all_to_airtable(pages[i])
+        if not result.ok:
+            raise RuntimeError(result.errors[0])
+
+    def teardown():
+        scraping._airtable_writer.close()
+        scraping._airtable_writer = None
+        airtable.close()
+    return op, [airtable], teardown
+
+def setup_ocr_question(config):
+    from legal_copilot import OCRService
+    from embedding_client import BatchEmbedder
+    from ocr_store import OCRStore
+    from summarizer import Summarizer
+    reset_gateway(config)
+    mistral = FakeMistral(page_count=config.ocr_pages, **standin_kwargs(config))
+    workdir = tempfile.TemporaryDirectory(prefix="bench_ocr_")
+    file_path = os.path.join(workdir.name, "contrat.pdf")
+    with open(file_path, "wb") as f:
+        f.write(b"%PDF-1.7 standin")
+
+    service = OCRService()
+    service.client = mistral
+    service.embedder = BatchEmbedder(mistral, base_delay=0.05)
+    service.store = OCRStore(os.path.join(workdir.name, "ocr_store"))
+    service.summarizer = Summarizer(service)
+    service.ocr_to_store(file_path, page_count=config.ocr_pages)
+    service.build_index(file_path)
+    mistral.calls = mistral.rate_limited = 0
+
+    def op(i):
+        service.process_question(f"Quel est le délai de résiliation prévu à l'article {i} ?", file_path)
+    return op, [mistral], workdir.cleanup
+
+def setup_fitness_queries(config):
+    import grahp_caracts_custumers as fitness
+    logging.getLogger(fitness.__name__).setLevel(logging.WARNING)
+    driver = FakeNeo4jDriver(**standin_kwargs(config))
+    tracker = fitness.FitnessTracker()
+    tracker.driver = driver
+    users = [f"user_{u}" for u in range(20)]
+    types = ["running", "cycling", "strength_training", "swimming"]
+
+    async def seed():
+        for n in range(config.activities):
+            await tracker.add_activity({
+                "user": users[n % len(users)],
+                "activity_id": f"activity_{n}",
+                "activity_type": types[n % len(types)],
+                "distance_km": float(n % 15),
+                "duration_min": 20 + n % 60,
+                "timestamp": fitness.iso_timestamp_days_ago(n % 30),
+            })
+    asyncio.run(seed())
+    driver.calls = driver.rate_limited = 0
+
+    async def op(i):
+        user = users[i % len(users)]
+        queries = [
+            lambda: tracker.query_recent_activities(user, days=7),
+            lambda: tracker.query_running_over_distance(user, min_distance=5, days=30),
+            lambda: tracker.query_by_activity_type(user, types[i % len(types)], days=30),
+        ]
+        await queries[i % len(queries)]()
+    return op, [driver], None
+
+def setup_uqlm_scoring(config):
+    from execution import executer_par_lots
+    from incertitude import calculer_incertitude_colonnes
+    from decision import Seuils, decider
+    import pandas as pd
+    bbuq = FakeBlackBoxUQ(**standin_kwargs(config))
+    workdir = tempfile.TemporaryDirectory(prefix="bench_uqlm_")
+
+    async def op(i):
+        prompts = [f"Tom a {i} pommes et en achète {k} de plus. Combien en a-t-il ?" for k in range(config.uq_prompts)]
+        df = await executer_par_lots(bbuq, prompts, dossier_checkpoints=workdir.name, taille_lot=25,
+                                     max_concurrence=2, num_responses=5, delai_base=0.05)
+        df = pd.concat([df, calculer_incertitude_colonnes(df)], axis=1)
+        decider(df, Seuils())
+    return op, [bbuq], workdir.cleanup
+
+def setup_speech_gpt(config):
+    import speech_to_text
+    reset_gateway(config)
+    assemblyai = FakeAssemblyAI(**standin_kwargs(config))
+    openai = FakeOpenAI(**standin_kwargs(config, seed=1))
+    speech_to_text.aai.Transcriber = assemblyai.transcriber
+    agent = speech_to_text.AudioAgent()
+    agent.client = openai
+
+    def op(i):
+        transcript = agent.transcribe_audio(f"audio_{i}.mp3")
+        agent.process_with_gpt(transcript.text, "🔍 Summarize")
+    return op, [assemblyai, openai], None
+
+SCENARIOS = [
+    Scenario("pdf_extract", "pdf_analyzer.extract_pdf_content (Firecrawl → nettoyage markdown)", setup_pdf_extract),
+    Scenario("scrape_parse", "scraping.scrape_and_parse (Firecrawl → BeautifulSoup → simple_parse)", setup_scrape_parse),
+    Scenario("airtable_upsert", "scraping.save_all_to_airtable (upsert par lots de 10, HTTP local)", setup_airtable_upsert),
+    Scenario("ocr_question", "OCRService.process_question (embedding → FAISS → Mistral via la passerelle)", setup_ocr_question),
+    Scenario("fitness_queries", "FitnessTracker.query_* (Neo4j asynchrone)", setup_fitness_queries, is_async=True),
+    Scenario("uqlm_scoring", "executer_par_lots + calculer_incertitude_colonnes + decider", setup_uqlm_scoring, is_async=True),
+    Scenario("speech_gpt", "AudioAgent.transcribe_audio + process_with_gpt", setup_speech_gpt),
+]
+
+# 📊 Comparaison avec un rapport de référence
+def compare(report, reference, max_regression):
+    """Affiche les écarts de p50 et de débit ; retourne les scénarios en régression"""
+    regressions = []
+    print(f"\n{'scénario':<18} | {'p50 réf.':>10} | {'p50':>10} | {'débit réf.':>10} | {'débit':>10}", file=sys.stderr)
+    for name, result in report["scenarios"].items():
+        before = reference.get("scenarios", {}).get(name)
+        if "latency_ms" not in result or not before or "latency_ms" not in before:
+            continue
+        p50, p50_before = result["latency_ms"]["p50"], before["latency_ms"]["p50"]
+        throughput, throughput_before = result["throughput_ops_s"], before["throughput_ops_s"]
+        flag = ""
+        if p50 > p50_before * (1 + max_regression) or throughput < throughput_before * (1 - max_regression):
+            regressions.append(name)
+            flag = "  ⚠️ régression"
+        print(f"{name:<18} | {p50_before:>8.1f}ms | {p50:>8.1f}ms | {throughput_before:>10.1f} | {throughput:>10.1f}{flag}",
+              file=sys.stderr)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=[s.name for s in SCENARIOS], help="scénarios à exécuter")
+    parser.add_argument("--iterations", type=int, default=50, help="opérations par scénario")
+    parser.add_argument("--concurrency", type=int, default=4, help="opérations simultanées")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latence simulée de chaque service")
+    parser.add_argument("--jitter-ms", type=float, default=5.0, help="gigue de latence (déterministe)")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requêtes/s par service avant 429 (0 = illimité)")
+    parser.add_argument("--ocr-pages", type=int, default=40, help="pages du document OCR")
+    parser.add_argument("--activities", type=int, default=2000, help="activités chargées dans Neo4j")
+    parser.add_argument("--uq-prompts", type=int, default=100, help="prompts par run UQLM")
+    parser.add_argument("--output", help="fichier JSON de sortie (défaut : stdout)")
+    parser.add_argument("--compare", help="rapport JSON de référence")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="écart toléré face à la référence")
+    config = parser.parse_args()
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(config).items() if k not in ("output", "compare")},
+        "scenarios": {},
+    }
+    for scenario in SCENARIOS:
+        if config.only and scenario.name not in config.only:
+            continue
+        print(f"▶ {scenario.name}", file=sys.stderr)
+        # Les prints de debug des modules ne doivent pas se mêler au JSON
+        with contextlib.redirect_stdout(io.StringIO()):
+            report["scenarios"][scenario.name] = scenario.run(config)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if config.output:
+        with open(config.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"📁 Rapport écrit dans {config.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if config.compare:
+        with open(config.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), config.max_regression)
+        if regressions:
+            sys.exit(f"Régressions : {', '.join(regressions)}")
+
+if __name__ == "__main__":
+    main()
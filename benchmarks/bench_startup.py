@@ -0,0 +1,163 @@
+"""
+Benchmark du démarrage à froid : temps d'import de chaque module applicatif, puis coût
+de la première initialisation des ressources paresseuses et de leurs appels suivants.
+Chaque mesure tourne dans un interpréteur neuf.
+
+Pour les apps Streamlit qui construisent leur service dans app.py (OCR, speech-to-text),
+l'appel suivant est celui que paie chaque rerun : via st.cache_resource dans l'arbre
+courant, une nouvelle construction dans les arbres qui ne le mettaient pas en cache.
+
+Usage : python benchmarks/bench_startup.py [--baseline REF] [--standins] [--json]
+  --baseline REF  mesure aussi l'arbre git REF (ex. une version antérieure)
+  --standins      sans accès au réseau : embeddings déterministes à la place des poids
+                  de SentenceTransformer (l'import de la bibliothèque reste réel) et PDF
+                  synthétique si celui de 1-Agno est absent
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+KNOWLEDGE_PDF = os.path.join("1-Agno", "PDF", "pwc-ai-analysis.pdf")
+
+# (dossier, module, initialisation paresseuse, construite par app.py à chaque rerun ?)
+TARGETS = [
+    ("1-Agno", "knowledge_base", "m.get_index(); m.get_agent()", False),
+    ("4-FireCrawl_PDFparsing", "pdf_analyzer", "m.get_pdf_agent(); m.get_firecrawl()", False),
+    ("5-FireCrawl_Scrape", "scraping", "m.get_listing_agent(); m.get_firecrawl()", False),
+    ("8-mistral_OCR", "legal_copilot", "m.OCRService()", True),
+    ("2-assembyai", "speech_to_text", "m.AudioAgent()", True),
+]
+
+# Avant l'initialisation paresseuse, tout était fait à l'import ; seules les apps construisaient un service
+BASELINE_INIT = {"legal_copilot": "m.OCRService()", "speech_to_text": "m.AudioAgent()"}
+
+# Les modules vérifient leurs clés au chargement ; aucune requête n'est envoyée
+API_KEYS = ("OPENAI_API_KEY", "MISTRAL_API_KEY", "FIRECRAWL_API_KEY", "ASSEMBLY_API_KEY")
+
+STANDINS = """
+sys.path.insert(0, {bench_dir!r})
+import standins
+standins.patch_on_import("sentence_transformers",
+                         lambda st: setattr(st, "SentenceTransformer", standins.OfflineSentenceTransformer))
+"""
+
+PROBE = """
+import json, sys, time
+{standins}
+sys.path.insert(0, {folder!r})
+result = {{}}
+start = time.perf_counter()
+try:
+    import {module} as m
+except BaseException as e:
+    result["error"] = f"import: {{type(e).__name__}}: {{e}}"
+result["import"] = time.perf_counter() - start
+init = {init!r}
+if "error" not in result and init and {app_cached!r}:
+    import streamlit as st
+    get = st.cache_resource(lambda build=init: eval(build))
+    init = "get()"
+if "error" not in result and init:
+    for label in ("first_init", "next_init"):
+        start = time.perf_counter()
+        try:
+            exec(init)
+        except Exception as e:
+            result["error"] = f"{{label}}: {{type(e).__name__}}: {{e}}"
+            break
+        result[label] = time.perf_counter() - start
+print("\\nBENCH " + json.dumps(result))  # sur sa propre ligne, même après un prompt sans retour à la ligne
+"""
+
+def probe(root, folder, module, init="", app_cached=False, standins=False, timeout=600):
+    """Mesure dans un sous-processus lancé depuis `root` (chemins relatifs des scripts)"""
+    code = PROBE.format(
+        standins=STANDINS.format(bench_dir=BENCH_DIR) if standins else "",
+        folder=os.path.join(root, folder), module=module, init=init, app_cached=app_cached
+    )
+    env = dict(os.environ)
+    for variable in API_KEYS:
+        env.setdefault(variable, "standin")
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=root, env=env, stdin=subprocess.DEVNULL,
+        capture_output=True, text=True, timeout=timeout
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("BENCH "):
+            return json.loads(line[len("BENCH "):])
+    return {"error": (completed.stderr.strip().splitlines() or ["pas de résultat"])[-1]}
+
+def probe_tree(root, baseline=False, standins=False):
+    """Mesure toutes les cibles d'un arbre, avec un PDF synthétique le temps des mesures si demandé"""
+    pdf_path = os.path.join(root, KNOWLEDGE_PDF)
+    pdf_dir = os.path.dirname(pdf_path)
+    created = standins and not os.path.exists(pdf_path)
+    created_dir = created and not os.path.isdir(pdf_dir)
+    if created:
+        sys.path.insert(0, BENCH_DIR)
+        from standins import sample_pdf
+        os.makedirs(pdf_dir, exist_ok=True)
+        sample_pdf(pdf_path)
+    try:
+        results = {}
+        for folder, module, init, app_cached in TARGETS:
+            if baseline:
+                init, app_cached = BASELINE_INIT.get(module, ""), False
+            results[module] = probe(root, folder, module, init, app_cached, standins)
+        return results
+    finally:
+        if created:
+            os.remove(pdf_path)
+        if created_dir:
+            os.rmdir(pdf_dir)
+
+def extract_ref(ref, destination):
+    """Copie de l'arbre git `ref` (sans historique) dans `destination`"""
+    archive = os.path.join(destination, "tree.tar")
+    subprocess.run(["git", "archive", "--format=tar", "-o", archive, ref], cwd=ROOT, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(destination)
+    os.remove(archive)
+    return destination
+
+def fmt(value):
+    return f"{value * 1000:.1f} ms" if isinstance(value, float) else "-"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", help="référence git à comparer")
+    parser.add_argument("--standins", action="store_true", help="substituts hors ligne (embeddings, PDF)")
+    parser.add_argument("--json", action="store_true", help="sortie JSON")
+    args = parser.parse_args()
+
+    results = probe_tree(ROOT, standins=args.standins)
+    if args.baseline:
+        with tempfile.TemporaryDirectory(prefix="bench_startup_") as tmp:
+            baseline = probe_tree(extract_ref(args.baseline, tmp), baseline=True, standins=args.standins)
+        for module, result in baseline.items():
+            results[module]["baseline"] = result
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+
+    print(f"{'module':<16} | {'import':>10} | {'1re init':>10} | {'init suiv.':>10} | "
+          f"{'import base':>11} | {'init suiv. base':>15}")
+    for module, result in results.items():
+        baseline = result.get("baseline", {})
+        print(f"{module:<16} | {fmt(result.get('import')):>10} | {fmt(result.get('first_init')):>10} | "
+              f"{fmt(result.get('next_init')):>10} | {fmt(baseline.get('import')):>11} | "
+              f"{fmt(baseline.get('next_init')):>15}")
+        for label, error in (("", result.get("error")), ("base : ", baseline.get("error"))):
+            if error:
+                print(f"{'':<16}   ⚠️ {label}{error}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+Substituts locaux et déterministes des services externes (Firecrawl, OpenAI, Mistral,
+AssemblyAI, Airtable, Neo4j, BlackBoxUQ) pour mesurer les pipelines sans compte ni réseau.
+Chaque substitut a une latence configurable (avec gigue déterministe) et une limite de
+débit optionnelle : au-delà, il répond comme le vrai service (erreur 429 + Retry-After).
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+def stable_seed(*parts):
+    return int(hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()[:16], 16)
+
+class StandInRateLimitError(Exception):
+    """Erreur 429 au format attendu par les clients du dépôt (`status_code`, `response.headers`)"""
+
+    def __init__(self, service, retry_after):
+        super().__init__(f"429 Too Many Requests ({service})")
+        self.status_code = 429
+        self.response = SimpleNamespace(status_code=429, headers={"Retry-After": f"{retry_after:.3f}"})
+
+class StandIn:
+    """Latence `latency` (s) ± `jitter` et au plus `rate_limit` requêtes par seconde (0 = illimité)"""
+
+    name = "service"
+
+    def __init__(self, latency=0.02, jitter=0.0, rate_limit=0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.rate_limited = 0
+        self._window = deque()
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        """Compte l'appel, applique la limite de débit et retourne la latence à simuler"""
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            if self.rate_limit:
+                while self._window and now - self._window[0] >= 1.0:
+                    self._window.popleft()
+                if len(self._window) >= self.rate_limit:
+                    self.rate_limited += 1
+                    raise StandInRateLimitError(self.name, 1.0 - (now - self._window[0]))
+                self._window.append(now)
+            return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def hit(self, extra=0.0):
+        time.sleep(self._admit() + extra)
+
+    async def ahit(self, extra=0.0):
+        await asyncio.sleep(self._admit() + extra)
+
+    def stats(self):
+        return {"calls": self.calls, "rate_limited": self.rate_limited}
+
+# 🔥 Firecrawl
+QUARTIERS = ["Gambetta", "Pelleport", "Convention", "Vaugirard", "Bastille", "Montmartre"]
+
+def listing_page_html(seed, n_listings=60):
+    """Page de résultats d'annonces, structurée comme celles que parse `scraping.py`"""
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(n_listings):
+        arrondissement = rng.randint(1, 20)
+        price = f"{rng.randint(150, 2500) * 1000:,}".replace(",", " ")
+        lines = [
+            f"<p>Ref : {seed % 100000 * 1000 + i}</p>",
+            "<p>Appartement</p>",
+            f"<p>PARIS {arrondissement}E (750{arrondissement:02d})</p>",
+            f"<p>{rng.randint(1, 5)} pièces - {rng.randint(18, 140)},{rng.randint(0, 9)} m²</p>",
+            f"<p>{price} €</p>",
+            f"<p>Quartier {rng.choice(QUARTIERS)}, proche métro, {rng.randint(1, 7)}e étage.</p>",
+            f"<a href='/annonce/{i}'>Voir le détail du bien</a>",
+        ]
+        blocks.append("<div class='listing'>\n" + "\n".join(lines) + "\n</div>")
+    pagination = "\n".join(f"<a href='?page={p}'>{p}</a>" for p in range(1, 6))
+    return f"<html><body>\n<h1>Achat appartement Paris</h1>\n{chr(10).join(blocks)}\n{pagination}\n</body></html>"
+
+def pdf_markdown(seed, n_sections=40):
+    """Markdown d'un rapport PDF tel que le renvoie Firecrawl (titres, images, paragraphes)"""
+    rng = random.Random(seed)
+    parts = []
+    for s in range(n_sections):
+        parts.append(f"## Section {s + 1}\n\n![figure {s}](https://example.org/fig{s}.png)\n")
+        parts.extend(
+            f"L'intelligence artificielle pourrait contribuer à hauteur de {rng.randint(1, 15)} % "
+            f"du PIB de la région {rng.randint(1, 9)} d'ici 2030, selon le scénario {rng.randint(1, 4)}.\n"
+            for _ in range(rng.randint(4, 10))
+        )
+        parts.append("\n\n\n")
+    return "\n".join(parts)
+
+class FakeFirecrawl(StandIn):
+    """`scrape` : markdown de rapport pour une URL .pdf, page d'annonces HTML sinon"""
+
+    name = "firecrawl"
+
+    def scrape(self, url=None, formats=None, **kwargs):
+        self.hit()
+        seed = stable_seed(url)
+        if url and url.lower().endswith(".pdf"):
+            return SimpleNamespace(markdown=pdf_markdown(seed))
+        html = listing_page_html(seed)
+        return SimpleNamespace(html=html, markdown=None)
+
+    scrape_url = scrape
+
+# 🧠 LLM (OpenAI / Mistral)
+def fake_answer(messages, words=60):
+    """Réponse déterministe dérivée des messages"""
+    rng = random.Random(stable_seed(messages))
+    vocabulary = ["clause", "partie", "obligation", "délai", "montant", "article", "contrat", "résiliation"]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+def chat_completion(text, messages):
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(text) // 4)
+    )
+
+class FakeOpenAI(StandIn):
+    """Sous-ensemble du client OpenAI : `chat.completions.create`"""
+
+    name = "openai"
+
+    def __init__(self, per_token=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.per_token = per_token
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        text = fake_answer(messages)
+        self.hit(self.per_token * len(text) // 4)
+        return chat_completion(text, messages)
+
+class _FakeChatStream:
+    def __init__(self, text, delay):
+        self.words = text.split(" ")
+        self.delay = delay
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        for i, word in enumerate(self.words):
+            time.sleep(self.delay)
+            delta = SimpleNamespace(content=word if i == 0 else " " + word)
+            yield SimpleNamespace(data=SimpleNamespace(choices=[SimpleNamespace(delta=delta)]))
+
+class FakeMistral(StandIn):
+    """
+    Sous-ensemble du client Mistral : fichiers, OCR par plages de pages, embeddings
+    (vecteurs déterministes de dimension `dimension`) et chat (complet ou streamé).
+    """
+
+    name = "mistral"
+
+    def __init__(self, dimension=256, page_count=40, per_token=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.dimension = dimension
+        self.page_count = page_count
+        self.per_token = per_token
+        self.files = SimpleNamespace(
+            upload=lambda file, purpose: SimpleNamespace(id="file-standin"),
+            get_signed_url=lambda file_id: SimpleNamespace(url=f"https://standin/{file_id}.pdf")
+        )
+        self.ocr = SimpleNamespace(process=self._ocr)
+        self.embeddings = SimpleNamespace(create=self._embed)
+        self.chat = SimpleNamespace(complete=self._complete, stream=self._stream)
+
+    def _ocr(self, model, document, pages=None, include_image_base64=False, **kwargs):
+        pages = list(range(self.page_count)) if pages is None else pages
+        self.hit()
+        return SimpleNamespace(pages=[
+            SimpleNamespace(index=n, images=[], markdown="\n".join(
+                f"Article {n * 10 + k}. " + fake_answer([n, k], words=40) for k in range(8)
+            ))
+            for n in pages
+        ])
+
+    def vector(self, text):
+        rng = random.Random(stable_seed(text))
+        return [rng.gauss(0.0, 1.0) for _ in range(self.dimension)]
+
+    def _embed(self, model, inputs, **kwargs):
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs)
+        self.hit()
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=self.vector(text)) for i, text in enumerate(inputs)
+        ])
+
+    def _complete(self, model, messages, **kwargs):
+        text = fake_answer(messages)
+        self.hit(self.per_token * len(text) // 4)
+        return chat_completion(text, messages)
+
+    def _stream(self, model, messages, **kwargs):
+        self.hit()
+        return _FakeChatStream(fake_answer(messages), self.per_token)
+
+# 🎤 AssemblyAI
+class FakeAssemblyAI(StandIn):
+    """Remplaçant de `assemblyai.Transcriber` : `transcriber(config=...).transcribe(path)`"""
+
+    name = "assemblyai"
+
+    def __init__(self, words=800, **kwargs):
+        super().__init__(**kwargs)
+        self.words = words
+
+    def transcriber(self, config=None):
+        standin = self
+
+        class _Transcriber:
+            def transcribe(self, audio_file_path):
+                standin.hit()
+                text = fake_answer([audio_file_path], words=standin.words)
+                return SimpleNamespace(status="completed", text=text, error=None)
+
+        return _Transcriber()
+
+# 📋 Airtable
+class AirtableStandIn(StandIn):
+    """Serveur HTTP local imitant l'API Airtable (PATCH upsert sur `ref`, 429 + Retry-After)"""
+
+    name = "airtable"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.records = {}
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_PATCH(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                try:
+                    standin.hit()
+                except StandInRateLimitError as e:
+                    self.send_response(429)
+                    self.send_header("Retry-After", e.response.headers["Retry-After"])
+                    self.end_headers()
+                    return
+                records, created = [], []
+                with standin._lock:
+                    for item in body["records"]:
+                        ref = item["fields"]["ref"]
+                        if ref not in standin.records:
+                            created.append(f"rec{len(standin.records)}")
+                            standin.records[ref] = created[-1]
+                        records.append({"id": standin.records[ref], "fields": item["fields"]})
+                payload = json.dumps({"records": records, "createdRecords": created}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/v0"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# 🕸️ Neo4j
+class _FakeNeo4jResult:
+    def __init__(self, records):
+        self.records = records
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self.records:
+            yield record
+
+class _FakeNeo4jSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, query, parameters=None, **kwargs):
+        await self.driver.ahit()
+        return _FakeNeo4jResult(self.driver.execute(query, dict(parameters or {}, **kwargs)))
+
+class FakeNeo4jDriver(StandIn):
+    """
+    Pilote asynchrone en mémoire pour les requêtes de `FitnessTracker` : MERGE sur
+    `activity_id`, filtres utilisateur / type / distance / date, tri par date décroissante.
+    """
+
+    name = "neo4j"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.activities = {}
+
+    def session(self, **kwargs):
+        return _FakeNeo4jSession(self)
+
+    async def close(self):
+        pass
+
+    def execute(self, query, params):
+        if "activity_id" in params:
+            self.activities[params["activity_id"]] = dict(params)
+            return []
+        if "user" not in params:
+            return []  # RETURN 1, contraintes et index
+        rows = [
+            a for a in self.activities.values()
+            if a["user"] == params["user"] and a["timestamp"] >= params.get("since_time", "")
+            and ("activity_type" not in params or a["activity_type"] == params["activity_type"])
+            and ("min_distance" not in params or (a["activity_type"] == "running" and a["distance_km"] >= params["min_distance"]))
+        ]
+        return sorted(rows, key=lambda a: a["timestamp"], reverse=True)
+
+# 🎯 BlackBoxUQ
+class _FakeUQResult:
+    def __init__(self, data):
+        self.data = data
+
+    def to_df(self):
+        import pandas as pd
+        return pd.DataFrame(self.data)
+
+class FakeBlackBoxUQ(StandIn):
+    """`generate_and_score` déterministe : réponses, échantillons et scores dans [0, 1]"""
+
+    name = "blackboxuq"
+    scorers = ["exact_match", "cosine_sim", "semantic_negentropy", "noncontradiction"]
+
+    async def generate_and_score(self, prompts, num_responses=5):
+        await self.ahit()
+        data = {name: [] for name in ["prompt", "response", "sampled_responses", *self.scorers]}
+        for prompt in prompts:
+            rng = random.Random(stable_seed(prompt))
+            answer = str(rng.randint(0, 50))
+            samples = [answer if rng.random() < 0.7 else str(rng.randint(0, 50)) for _ in range(num_responses)]
+            agreement = samples.count(answer) / num_responses
+            data["prompt"].append(prompt)
+            data["response"].append(answer)
+            data["sampled_responses"].append(samples)
+            data["exact_match"].append(agreement)
+            data["cosine_sim"].append(min(1.0, 0.5 + agreement / 2 + rng.uniform(-0.05, 0.05)))
+            data["semantic_negentropy"].append(max(0.0, agreement - rng.uniform(0, 0.2)))
+            data["noncontradiction"].append(min(1.0, agreement + rng.uniform(0, 0.2)))
+        return _FakeUQResult(data)
+
+# 🚀 Démarrage (bench_startup.py)
+class OfflineSentenceTransformer:
+    """
+    Remplace `SentenceTransformer` quand les poids du modèle ne sont pas téléchargeables :
+    vecteurs déterministes de même dimension que all-MiniLM-L6-v2. L'import de la
+    bibliothèque (torch compris) reste réel, seul le chargement des poids est évité.
+    """
+
+    dimension = 384
+
+    def __init__(self, model_name_or_path=None, *args, **kwargs):
+        self.model_name = model_name_or_path
+
+    def encode(self, sentences, convert_to_numpy=True, **kwargs):
+        import numpy as np
+        single = isinstance(sentences, str)
+        rows = [np.random.default_rng(stable_seed(text)).standard_normal(self.dimension)
+                for text in ([sentences] if single else sentences)]
+        vectors = np.asarray(rows, dtype="float32").reshape(-1, self.dimension)
+        return vectors[0] if single else vectors
+
+def patch_on_import(module_name, patch):
+    """Applique `patch(module)` juste après le premier import réel de `module_name`"""
+    import importlib.abc
+    import importlib.util
+    import sys
+
+    class Finder(importlib.abc.MetaPathFinder):
+        def find_spec(self, name, path, target=None):
+            if name != module_name:
+                return None
+            sys.meta_path.remove(self)
+            spec = importlib.util.find_spec(name)
+            if spec is None or spec.loader is None:
+                return spec
+            exec_module = spec.loader.exec_module
+
+            def exec_and_patch(module):
+                exec_module(module)
+                patch(module)
+            spec.loader.exec_module = exec_and_patch
+            return spec
+
+    sys.meta_path.insert(0, Finder())
+
+def sample_pdf(path, seed=0, n_pages=30):
+    """Rapport PDF synthétique (paragraphes de plus de 50 caractères) pour les modules qui lisent un PDF local"""
+    from fpdf import FPDF
+    rng = random.Random(seed)
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=10)
+    for p in range(n_pages):
+        pdf.add_page()
+        pdf.multi_cell(0, 6, "\n".join(
+            f"AI could add {rng.randint(1, 15)} percent to the GDP of region {rng.randint(1, 9)} "
+            f"by 2030 under scenario {rng.randint(1, 4)} (page {p + 1})."
+            for _ in range(rng.randint(12, 20))
+        ))
+    pdf.output(path)
+    return path
@@ -0,0 +1,15 @@
+"""Briques partagées par les applications du dépôt"""
+
+from common.llm_gateway import (
+    LLMGateway,
+    LLMResponse,
+    ProviderLimits,
+    ResponseCache,
+    get_gateway,
+)
+from common.tracing import (
+    bind,
+    collector,
+    span,
+    streamlit_debug_panel,
+)
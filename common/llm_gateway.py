@@ -0,0 +1,437 @@
+"""
+Passerelle commune vers les LLM (OpenAI, Mistral, agents Agno) pour toutes les applications :
+cache des réponses, concurrence bornée et débit limité par fournisseur, réessais avec
+backoff sur 429/5xx, métriques de latence et de tokens par appel (et un span "llm" par appel,
+cf. common/tracing.py).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from common.tracing import span
+
+@dataclass(frozen=True)
+class ProviderLimits:
+    """Limites appliquées à un fournisseur : appels simultanés et débit (jeton par requête)"""
+    max_concurrency: int = 4
+    requests_per_second: float = 5.0
+    burst: int = 5
+
+    def __post_init__(self):
+        if self.requests_per_second <= 0:
+            raise ValueError(f"requests_per_second doit être > 0 (reçu {self.requests_per_second})")
+
+def limits_from_env(provider, default):
+    """Surcharge possible par variables d'environnement, ex. LLM_OPENAI_CONCURRENCY / LLM_OPENAI_RPS"""
+    prefix = f"LLM_{provider.upper()}_"
+    return ProviderLimits(
+        max_concurrency=int(os.getenv(prefix + "CONCURRENCY", default.max_concurrency)),
+        requests_per_second=float(os.getenv(prefix + "RPS", default.requests_per_second)),
+        burst=int(os.getenv(prefix + "BURST", default.burst))
+    )
+
+DEFAULT_LIMITS = {
+    "openai": ProviderLimits(max_concurrency=8, requests_per_second=8.0, burst=8),
+    "mistral": ProviderLimits(max_concurrency=4, requests_per_second=5.0, burst=5),
+}
+
+@dataclass
+class LLMResponse:
+    """Réponse normalisée d'un fournisseur"""
+    text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+@dataclass
+class CallMetric:
+    provider: str
+    model: str
+    latency: float
+    attempts: int
+    cached: bool
+    input_tokens: int = 0
+    output_tokens: int = 0
+    error: str = None
+
+def error_status(error):
+    """Code HTTP porté par l'exception d'un client (OpenAI, Mistral, Firecrawl…), s'il existe"""
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def _mentions_rate_limit(error):
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "rate_limit" in message
+
+def is_rate_limit_error(error):
+    """Limite de débit (HTTP 429), d'après le code de l'erreur ou, à défaut, son message"""
+    status = error_status(error)
+    return status == 429 if status is not None else _mentions_rate_limit(error)
+
+def is_retryable(error):
+    """429 et erreurs serveur (5xx) : réessayables ; le reste est remonté tel quel"""
+    status = error_status(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return _mentions_rate_limit(error)
+
+def retry_after(error):
+    """Délai Retry-After (s) annoncé par la réponse en erreur, s'il existe"""
+    response = getattr(error, "response", None) or getattr(error, "raw_response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+class RateLimiter:
+    """
+    Limiteur partagé par les workers d'un lot : espace les appels pour ne pas dépasser
+    `calls_per_minute` (0 = pas d'espacement) et, après un 429, `pause()` suspend tous
+    les workers jusqu'à la fin du backoff.
+    """
+
+    def __init__(self, calls_per_minute=0):
+        self.interval = 60.0 / calls_per_minute if calls_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+def prompt_chars(messages):
+    """Taille du prompt envoyé (somme des contenus des messages), pour les traces"""
+    return sum(len(str(message.get("content") or "")) for message in messages if isinstance(message, dict))
+
+def usage_tokens(response):
+    """(tokens en entrée, tokens en sortie) d'une réponse OpenAI, Mistral ou Agno"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+    metrics = getattr(response, "metrics", None)
+    if metrics is None:
+        return 0, 0
+    get = metrics.get if isinstance(metrics, dict) else lambda name, default=0: getattr(metrics, name, default)
+    tokens = []
+    for name in ("input_tokens", "output_tokens"):
+        value = get(name, 0) or 0
+        tokens.append(sum(value) if isinstance(value, (list, tuple)) else value)
+    return tuple(tokens)
+
+class TokenBucket:
+    """Seau à jetons thread-safe : `reserve()` retourne l'attente nécessaire avant d'envoyer"""
+
+    def __init__(self, rate, capacity):
+        if rate <= 0:
+            raise ValueError(f"Le débit du seau doit être > 0 (reçu {rate})")
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class ResponseCache:
+    """
+    Cache des réponses indexé par fournisseur, modèle et messages.
+    En mémoire (LRU) par défaut ; persistant en SQLite si `path` est fourni.
+    """
+
+    def __init__(self, path=None, max_entries=2048):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self.conn = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            with self.conn:
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT, created_at REAL)"
+                )
+
+    @staticmethod
+    def key(provider, model, messages):
+        content = json.dumps([provider, model, messages], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _remember(self, key, response):
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            if self.conn is not None:
+                row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row:
+                    # Remonté en mémoire : les lectures suivantes évitent SQLite
+                    response = LLMResponse(**json.loads(row[0]))
+                    self._remember(key, response)
+                    return response
+        return None
+
+    def put(self, key, response):
+        with self._lock:
+            self._remember(key, response)
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                        (key, json.dumps(response.__dict__, ensure_ascii=False), time.time())
+                    )
+
+class GatewayMetrics:
+    """Métriques des derniers appels (fenêtre bornée) et agrégats par fournisseur"""
+
+    def __init__(self, max_calls=10000):
+        self.calls = deque(maxlen=max_calls)
+        self._lock = threading.Lock()
+
+    def record(self, metric):
+        with self._lock:
+            self.calls.append(metric)
+
+    def summary(self):
+        with self._lock:
+            calls = list(self.calls)
+        resume = {}
+        for provider in sorted({c.provider for c in calls}):
+            subset = [c for c in calls if c.provider == provider]
+            latencies = sorted(c.latency for c in subset if not c.cached)
+            resume[provider] = {
+                "calls": len(subset),
+                "cache_hits": sum(c.cached for c in subset),
+                "errors": sum(c.error is not None for c in subset),
+                "retries": sum(max(0, c.attempts - 1) for c in subset),
+                "input_tokens": sum(c.input_tokens for c in subset),
+                "output_tokens": sum(c.output_tokens for c in subset),
+                "p50_latency": latencies[len(latencies) // 2] if latencies else 0.0,
+                "p95_latency": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+            }
+        return resume
+
+class LLMGateway:
+    """
+    Point de passage unique des appels LLM. `call` / `acall` prennent une fonction d'envoi
+    qui retourne une `LLMResponse` ; les adaptateurs (`chat_openai`, `chat_mistral`,
+    `run_agent`, `arun_agent`) couvrent les clients utilisés dans le dépôt.
+    Le cache des réponses est opt-in (`cache=True`) : la clé ne contient que fournisseur,
+    modèle et messages, il ne convient qu'aux appels déterministes (température 0, sans outils).
+    """
+
+    def __init__(self, cache=None, limits=None, max_retries=4, base_delay=1.0, max_delay=30.0):
+        self.cache = cache if cache is not None else ResponseCache()
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = GatewayMetrics()
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._buckets = {}
+        self._async_semaphores = weakref.WeakKeyDictionary()
+
+    def _provider_state(self, provider):
+        with self._lock:
+            if provider not in self._semaphores:
+                limits = limits_from_env(provider, self.limits.get(provider, ProviderLimits()))
+                self._semaphores[provider] = threading.BoundedSemaphore(max(1, limits.max_concurrency))
+                self._buckets[provider] = TokenBucket(limits.requests_per_second, max(1, limits.burst))
+            return self._semaphores[provider], self._buckets[provider]
+
+    def _async_semaphore(self, provider):
+        """
+        Sémaphore asyncio du fournisseur, un par boucle d'événements : l'attente n'occupe
+        aucun thread et une tâche annulée pendant l'attente ne garde pas de créneau.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._async_semaphores.setdefault(loop, {})
+            if provider not in semaphores:
+                limits = limits_from_env(provider, self.limits.get(provider, ProviderLimits()))
+                semaphores[provider] = asyncio.Semaphore(max(1, limits.max_concurrency))
+            return semaphores[provider]
+
+    def _backoff(self, attempt, error):
+        advertised = retry_after(error)
+        if advertised is not None:
+            return min(self.max_delay, advertised)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    @contextmanager
+    def limited(self, provider):
+        """Créneau de concurrence + jeton de débit, pour les appels hors `call` (ex. streaming)"""
+        semaphore, bucket = self._provider_state(provider)
+        with semaphore:
+            delay = bucket.reserve()
+            if delay:
+                time.sleep(delay)
+            yield
+
+    def call(self, provider, model, messages, send, cache=False, max_retries=None):
+        """
+        Appel synchrone : cache, concurrence, débit et réessais autour de `send()`.
+        `max_retries=0` laisse les réessais à l'appelant (qui a alors sa propre boucle).
+        """
+        max_retries = self.max_retries if max_retries is None else max_retries
+        with span("llm", provider=provider, model=model, prompt_chars=prompt_chars(messages)) as trace:
+            key = self.cache.key(provider, model, messages) if cache else None
+            if key is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.metrics.record(CallMetric(provider, model, 0.0, 0, True))
+                    trace.set(cache_hit=True, response_chars=len(cached.text or ""))
+                    return cached.text
+
+            start = time.perf_counter()
+            for attempt in range(1, max_retries + 2):
+                try:
+                    with self.limited(provider):
+                        response = send()
+                    break
+                except Exception as e:
+                    if attempt > max_retries or not is_retryable(e):
+                        self.metrics.record(CallMetric(provider, model, time.perf_counter() - start, attempt, False, error=str(e)))
+                        trace.set(cache_hit=False, attempts=attempt)
+                        raise
+                    time.sleep(self._backoff(attempt, e))
+
+            self.metrics.record(CallMetric(provider, model, time.perf_counter() - start, attempt, False,
+                                           response.input_tokens, response.output_tokens))
+            trace.set(cache_hit=False, attempts=attempt, input_tokens=response.input_tokens,
+                      output_tokens=response.output_tokens, response_chars=len(response.text or ""))
+            if key is not None:
+                self.cache.put(key, response)
+            return response.text
+
+    async def acall(self, provider, model, messages, send, cache=False, max_retries=None):
+        """Variante asynchrone : `send()` retourne une coroutine ; les attentes ne bloquent pas la boucle"""
+        max_retries = self.max_retries if max_retries is None else max_retries
+        with span("llm", provider=provider, model=model, prompt_chars=prompt_chars(messages)) as trace:
+            key = self.cache.key(provider, model, messages) if cache else None
+            if key is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.metrics.record(CallMetric(provider, model, 0.0, 0, True))
+                    trace.set(cache_hit=True, response_chars=len(cached.text or ""))
+                    return cached.text
+
+            # Le débit (seau à jetons) est partagé avec les appels synchrones ; la concurrence est bornée par boucle
+            semaphore = self._async_semaphore(provider)
+            _, bucket = self._provider_state(provider)
+            start = time.perf_counter()
+            for attempt in range(1, max_retries + 2):
+                try:
+                    async with semaphore:
+                        delay = bucket.reserve()
+                        if delay:
+                            await asyncio.sleep(delay)
+                        response = await send()
+                    break
+                except Exception as e:
+                    if attempt > max_retries or not is_retryable(e):
+                        self.metrics.record(CallMetric(provider, model, time.perf_counter() - start, attempt, False, error=str(e)))
+                        trace.set(cache_hit=False, attempts=attempt)
+                        raise
+                    error = e
+                await asyncio.sleep(self._backoff(attempt, error))
+
+            self.metrics.record(CallMetric(provider, model, time.perf_counter() - start, attempt, False,
+                                           response.input_tokens, response.output_tokens))
+            trace.set(cache_hit=False, attempts=attempt, input_tokens=response.input_tokens,
+                      output_tokens=response.output_tokens, response_chars=len(response.text or ""))
+            if key is not None:
+                self.cache.put(key, response)
+            return response.text
+
+    # 🔌 Adaptateurs
+    def chat_openai(self, client, model, messages, cache=False, max_retries=None, **kwargs):
+        def send():
+            response = client.chat.completions.create(model=model, messages=messages, **kwargs)
+            return LLMResponse(response.choices[0].message.content, *usage_tokens(response))
+        return self.call("openai", model, messages, send, cache=cache, max_retries=max_retries)
+
+    def chat_mistral(self, client, model, messages, cache=False, max_retries=None, **kwargs):
+        def send():
+            response = client.chat.complete(model=model, messages=messages, **kwargs)
+            return LLMResponse(response.choices[0].message.content, *usage_tokens(response))
+        return self.call("mistral", model, messages, send, cache=cache, max_retries=max_retries)
+
+    @staticmethod
+    def agent_messages(agent, prompt):
+        """Clé de cache d'un agent Agno : nom, description, instructions, température et prompt"""
+        return [
+            {"role": "system", "content": [getattr(agent, "name", None), getattr(agent, "description", None),
+                                           getattr(agent, "instructions", None),
+                                           getattr(getattr(agent, "model", None), "temperature", None)]},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def agent_model(agent):
+        model = getattr(agent, "model", None)
+        return getattr(model, "id", None) or type(model).__name__
+
+    @staticmethod
+    def agent_provider(agent):
+        return "mistral" if "mistral" in type(getattr(agent, "model", None)).__name__.lower() else "openai"
+
+    def run_agent(self, agent, prompt, cache=False, max_retries=None):
+        """Exécute un agent Agno et retourne le texte de sa réponse"""
+        def send():
+            response = agent.run(prompt)
+            return LLMResponse(response.content, *usage_tokens(response))
+        return self.call(self.agent_provider(agent), self.agent_model(agent), self.agent_messages(agent, prompt), send,
+                         cache=cache, max_retries=max_retries)
+
+    async def arun_agent(self, agent, prompt, cache=False, max_retries=None):
+        async def send():
+            response = await agent.arun(prompt)
+            content = response.content if hasattr(response, "content") else str(response)
+            return LLMResponse(content, *usage_tokens(response))
+        return await self.acall(self.agent_provider(agent), self.agent_model(agent), self.agent_messages(agent, prompt), send,
+                                cache=cache, max_retries=max_retries)
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_gateway():
+    """Passerelle partagée par le processus (créée au premier appel) ; LLM_CACHE_PATH la rend persistante"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway(cache=ResponseCache(os.getenv("LLM_CACHE_PATH") or None))
+    return _gateway
@@ -0,0 +1,283 @@
+"""
+Traçage léger des étapes des pipelines : chaque étape est un span (durée, tailles des
+données, tokens, hits de cache), imbriqué dans son parent via contextvars. Les spans
+terminés partent vers des exportateurs : collecteur en mémoire (toujours actif, pour le
+panneau de debug Streamlit), logs structurés JSON, ou fichier JSON lines. Chaque trace
+porte la session Streamlit qui l'a ouverte, pour que le panneau n'affiche que les siennes.
+
+Configuration : TRACE_EXPORT=log (défaut, logger "tracing" au niveau DEBUG) | json | off,
+TRACE_FILE=traces.jsonl pour l'export fichier.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+logger = logging.getLogger("tracing")
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str = None
+    session_id: str = None
+    start: float = 0.0
+    duration: float = None
+    attributes: dict = field(default_factory=dict)
+    error: str = None
+
+    def set(self, **attributes):
+        """Ajoute des attributs (tailles, tokens, cache_hit…) au span"""
+        self.attributes.update(attributes)
+        return self
+
+    def add(self, **counters):
+        """Incrémente des compteurs (ex. `cache_hits=1`), y compris depuis plusieurs threads"""
+        with _counter_lock:
+            for name, value in counters.items():
+                self.attributes[name] = self.attributes.get(name, 0) + value
+        return self
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "session_id": self.session_id,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+_counter_lock = threading.Lock()
+_current = contextvars.ContextVar("current_span", default=None)
+
+def current_session():
+    """Session Streamlit du script en cours d'exécution, ou None hors Streamlit"""
+    if "streamlit" not in sys.modules:
+        return None
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return None
+    return ctx.session_id if ctx is not None else None
+
+# 📤 Exportateurs
+@dataclass
+class TraceRecord:
+    session_id: str = None
+    spans: list = field(default_factory=list)
+    dropped: int = 0
+
+class InMemoryCollector:
+    """
+    Derniers spans regroupés par trace (une trace = une requête), en mémoire bornée :
+    au plus `max_traces` traces et `max_spans` spans par trace (les suivants sont comptés, pas gardés).
+    """
+
+    def __init__(self, max_traces=50, max_spans=500):
+        self.max_traces = max_traces
+        self.max_spans = max_spans
+        self.traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        with self._lock:
+            record = self.traces.setdefault(span.trace_id, TraceRecord(span.session_id))
+            if len(record.spans) < self.max_spans:
+                record.spans.append(span)
+            else:
+                record.dropped += 1
+            self.traces.move_to_end(span.trace_id)
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+
+    def recent(self, limit=10, session_id=None):
+        """
+        Traces `(trace_id, spans, spans ignorés)` les plus récentes d'abord, spans dans l'ordre
+        de démarrage ; avec `session_id`, seulement celles de cette session.
+        """
+        with self._lock:
+            traces = [(trace_id, list(record.spans), record.dropped) for trace_id, record in self.traces.items()
+                      if session_id is None or record.session_id == session_id][-limit:]
+        return [(trace_id, sorted(spans, key=lambda s: s.start), dropped) for trace_id, spans, dropped in reversed(traces)]
+
+    def clear(self, session_id=None):
+        with self._lock:
+            if session_id is None:
+                self.traces.clear()
+            else:
+                for trace_id in [t for t, record in self.traces.items() if record.session_id == session_id]:
+                    del self.traces[trace_id]
+
+class LoggingExporter:
+    """Un log structuré (JSON) par span terminé"""
+
+    def __init__(self, level=logging.DEBUG):
+        self.level = level
+
+    def export(self, span):
+        if logger.isEnabledFor(self.level):
+            logger.log(self.level, json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+
+class JSONLinesExporter:
+    """Spans ajoutés à un fichier JSON lines, pour analyse hors ligne"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+collector = InMemoryCollector()
+
+def default_exporters():
+    mode = os.getenv("TRACE_EXPORT", "log").lower()
+    if mode == "off":
+        return []
+    if mode == "json":
+        return [collector, JSONLinesExporter(os.getenv("TRACE_FILE", "traces.jsonl"))]
+    return [collector, LoggingExporter()]
+
+_exporters = default_exporters()
+
+def set_exporters(exporters):
+    """Remplace les exportateurs (ex. `[collector]` dans les benchmarks)"""
+    global _exporters
+    _exporters = list(exporters)
+
+def _export(span):
+    for exporter in _exporters:
+        try:
+            exporter.export(span)
+        except Exception as e:
+            logger.warning(f"Export de span impossible ({type(exporter).__name__}) : {e}")
+
+# 🧭 API
+@contextmanager
+def span(name, activate=True, parent=None, **attributes):
+    """
+    Mesure une étape. Les spans ouverts à l'intérieur deviennent ses enfants ; hors de
+    tout span, une nouvelle trace commence. `activate=False` n'en fait pas le parent des
+    spans suivants (utile dans un générateur, dont le code appelant s'exécute entre deux `yield`) ;
+    `parent` rattache explicitement le span à un autre que le span courant.
+    """
+    parent = parent or _current.get()
+    current = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else uuid.uuid4().hex[:16],
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        session_id=parent.session_id if parent else current_session(),
+        start=time.time(),
+        attributes=dict(attributes),
+    )
+    token = _current.set(current) if activate else None
+    start = time.perf_counter()
+    try:
+        yield current
+    except GeneratorExit:
+        # Générateur abandonné par son consommateur : ce n'est pas une erreur de l'étape
+        raise
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        if token is not None:
+            _current.reset(token)
+        _export(current)
+
+def traced(name=None):
+    """Décorateur : la fonction entière est un span"""
+    def decorator(fn):
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__qualname__):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return decorator
+
+def current_span():
+    return _current.get()
+
+def annotate(**attributes):
+    """Ajoute des attributs au span courant, s'il existe"""
+    current = _current.get()
+    if current is not None:
+        current.set(**attributes)
+
+def bind(fn, parent=None):
+    """
+    Rattache les spans ouverts par `fn` au span courant (ou à `parent`), même exécutée dans
+    un autre thread (les pools de threads ne propagent pas les contextvars).
+    """
+    parent = parent or _current.get()
+
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+# 🐞 Panneau de debug Streamlit
+def render_trace_breakdown(spans):
+    """Lignes (étape indentée, durée, attributs) d'une trace, parents avant enfants"""
+    children = {}
+    for s in spans:
+        children.setdefault(s.parent_id, []).append(s)
+    ids = {s.span_id for s in spans}
+    roots = [s for s in spans if s.parent_id not in ids]
+    rows = []
+
+    def walk(s, depth):
+        rows.append({
+            "étape": "  " * depth + s.name,
+            "durée (ms)": round((s.duration or 0) * 1000, 1),
+            "attributs": json.dumps(s.attributes, ensure_ascii=False, default=str),
+            "erreur": s.error or "",
+        })
+        for child in children.get(s.span_id, []):
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+    return rows
+
+def streamlit_debug_panel(limit=5, expanded=False, title="🐞 Debug : traces des dernières requêtes"):
+    """Panneau repliable listant les dernières traces de la session et la durée de chaque étape"""
+    import streamlit as st
+    session_id = current_session()
+    with st.expander(title, expanded=expanded):
+        traces = collector.recent(limit, session_id=session_id)
+        if not traces:
+            st.caption("Aucune trace pour l'instant.")
+        for trace_id, spans, dropped in traces:
+            roots = [s for s in spans if s.parent_id is None]
+            # Durée de bout en bout : les spans de streaming peuvent finir après leur parent
+            total = max(s.start + (s.duration or 0) for s in spans) - min(s.start for s in spans)
+            st.markdown(f"**{', '.join(s.name for s in roots) or trace_id}** · {total * 1000:.0f} ms · `{trace_id}`")
+            st.dataframe(render_trace_breakdown(spans), hide_index=True, use_container_width=True)
+            if dropped:
+                st.caption(f"{dropped} spans supplémentaires non conservés")
+        if traces and st.button("🧹 Vider les traces"):
+            collector.clear(session_id)